@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Compare per-job overhead of the subprocess and in-process yt-dlp engines
+
+Runs the same metadata-only job N times through each backend (no media is downloaded),
+so the difference is the fixed startup cost paid per URL.
+
+    python benchmarks/bench_backends.py [-n 5] [URL]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import yt_backends
+from yt_backends import InProcessBackend, SubprocessBackend
+
+# Simulated jobs download nothing, so keep them off the segmented downloader
+yt_backends.CONNECTIONS = 0
+
+DEFAULT_URL = "https://www.youtube.com/watch?v=jNQXAC9IVRw"
+
+
+class SimulateSubprocess(SubprocessBackend):
+    def build_cmd(self, url, output_dir, info_file=None, rate_limit=None):
+        return super().build_cmd(url, output_dir)[:-1] + ['--simulate', url]
+
+
+class SimulateInProcess(InProcessBackend):
+    def build_opts(self, output_dir):
+        opts = super().build_opts(output_dir)
+        opts['simulate'] = True
+        return opts
+
+
+def run(backend, url, n, output_dir):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        result = backend.download(url, output_dir)
+        times.append(time.perf_counter() - start)
+        if not result.ok:
+            print(f"  [-] {backend.name}: {result.error}")
+    return times
+
+
+def report(name, times):
+    first, rest = times[0], times[1:] or times
+    print(f"{name:12s} first={first * 1000:8.1f}ms  "
+          f"steady={sum(rest) / len(rest) * 1000:8.1f}ms/job  total={sum(times):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('url', nargs='?', default=DEFAULT_URL)
+    parser.add_argument('-n', type=int, default=5, help="jobs per backend")
+    args = parser.parse_args()
+
+    yt_dlp_path = shutil.which('yt-dlp') or shutil.which('yt-dlp.exe')
+    output_dir = Path(tempfile.mkdtemp(prefix="yt_bench_"))
+
+    results = {}
+    if yt_dlp_path:
+        results['subprocess'] = run(SimulateSubprocess(yt_dlp_path), args.url, args.n, output_dir)
+    else:
+        print("[!] yt-dlp executable not on PATH, skipping subprocess mode")
+    try:
+        backend = SimulateInProcess()
+    except ImportError:
+        print("[!] yt_dlp module not importable, skipping in-process mode")
+    else:
+        results['in-process'] = run(backend, args.url, args.n, output_dir)
+        backend.close()
+
+    for name, times in results.items():
+        report(name, times)
+    if len(results) == 2:
+        sub = sum(results['subprocess']) / args.n
+        inp = sum(results['in-process']) / args.n
+        print(f"per-job overhead saved: {(sub - inp) * 1000:.1f}ms ({sub / inp:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
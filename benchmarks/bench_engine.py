@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Offline throughput/latency benchmark of the queue and worker machinery
+
+Every run is a fresh interpreter with HOME pointed at a scratch dir (no real history,
+caches or downloads are touched) driving the real DownloadEngine - or the real Tk
+window with --gui - against the fake yt-dlp in benchmarks/fake_yt_dlp.py. Nothing
+goes to YouTube. Transcoding is disabled so only the download pipeline is measured.
+
+    python benchmarks/bench_engine.py [--jobs 40] [--workers 1 2 4 8] [--backend exe|stub]
+                                      [--size 2000000] [--rate 4000000] [--fail 0.1]
+                                      [--arrival 0] [--gui] [--json]
+
+Reported per worker count: jobs/minute, enqueue-to-start latency (p50/p95), CPU time
+per job (this process + yt-dlp children), RSS growth and UI-thread stall (p99/max
+lateness of a 10ms heartbeat; on the Tk event loop with --gui, a plain thread otherwise).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FAKE = Path(__file__).resolve().parent / "fake_yt_dlp.py"
+
+HEARTBEAT = 0.01
+
+
+def rss_mb():
+    """Current resident set size (Linux), else peak RSS"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def fake_executable(folder):
+    """Wrap fake_yt_dlp.py in something Popen can run as 'yt-dlp'"""
+    if os.name == 'nt':
+        path = folder / "yt-dlp.bat"
+        path.write_text(f'@"{sys.executable}" "{FAKE}" %*\n')
+    else:
+        path = folder / "yt-dlp"
+        path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE}" "$@"\n')
+        path.chmod(0o755)
+    return str(path)
+
+
+class Recorder:
+    """Engine listener: timestamps per job"""
+
+    def __init__(self, total):
+        self.queued = {}
+        self.latencies = []
+        self.done = 0
+        self.failed = 0
+        self.total = total
+        self.finished = threading.Event()
+
+    def __call__(self, event):
+        kind = event['event']
+        now = time.perf_counter()
+        if kind == 'queued':
+            self.queued[event['key']] = now
+        elif kind == 'started' and event['key'] in self.queued:
+            self.latencies.append(now - self.queued[event['key']])
+        elif kind in ('done', 'failed'):
+            if kind == 'done':
+                self.done += 1
+            else:
+                self.failed += 1
+            if self.done + self.failed >= self.total:
+                self.finished.set()
+
+
+class Heartbeat:
+    """Lateness of a periodic tick: how long the UI thread could not get a turn"""
+
+    def __init__(self, root=None):
+        self.root = root
+        self.lateness = []
+        self.running = True
+
+    def start(self):
+        if self.root:
+            self._due = time.perf_counter() + HEARTBEAT
+            self.root.after(int(HEARTBEAT * 1000), self._tick)
+        else:
+            threading.Thread(target=self._loop, daemon=True).start()
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.lateness.append(max(0.0, now - self._due))
+        if self.running:
+            self._due = now + HEARTBEAT
+            self.root.after(int(HEARTBEAT * 1000), self._tick)
+
+    def _loop(self):
+        while self.running:
+            due = time.perf_counter() + HEARTBEAT
+            time.sleep(HEARTBEAT)
+            self.lateness.append(max(0.0, time.perf_counter() - due))
+
+
+def child(args):
+    """One benchmark run in this (fresh) interpreter; prints the metrics as JSON"""
+    sys.path.insert(0, str(ROOT))
+    sys.path.insert(0, str(FAKE.parent))
+    from fake_yt_dlp import StubBackend
+    from yt_backends import SubprocessBackend
+    from yt_scheduler import Scheduler
+
+    rss_before = rss_mb()
+    root = app = None
+    if args.gui:
+        import tkinter
+        import yt_gui
+        root = tkinter.Tk()
+        app = yt_gui.YTDownloader(root)
+        engine = app.engine
+    else:
+        import yt_engine
+        engine = yt_engine.DownloadEngine(resume=False)
+
+    # The swap points: fake yt-dlp, fixed worker count, no ffmpeg
+    if args.backend == 'stub':
+        engine.backend = StubBackend()
+    else:
+        engine.backend = SubprocessBackend(fake_executable(Path(os.environ['HOME'])))
+    engine.scheduler = Scheduler(engine.download, workers=args.workers,
+                                 max_workers=args.workers, log=engine.log)
+    engine.transcoder.ffmpeg = None
+
+    recorder = Recorder(args.jobs)
+    engine.subscribe(recorder)
+    links = [(f"https://www.youtube.com/watch?v={n:011d}", f"video:{n:011d}")
+             for n in range(args.jobs)]
+
+    heartbeat = Heartbeat(root)
+    heartbeat.start()
+    cpu_start = cpu_seconds()
+    start = time.perf_counter()
+    engine.start(clipboard=False)
+
+    def feed():
+        for link in links:
+            engine.enqueue([link])
+            if args.arrival:
+                time.sleep(1 / args.arrival)
+
+    if args.arrival:
+        threading.Thread(target=feed, daemon=True).start()
+    else:
+        engine.enqueue(links)
+
+    if root:
+        def check():
+            if recorder.finished.is_set():
+                root.quit()
+            else:
+                root.after(50, check)
+        root.after(50, check)
+        root.mainloop()
+    else:
+        recorder.finished.wait()
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_start
+    heartbeat.running = False
+    rss_after = rss_mb()
+    engine.stop()
+    if root:
+        root.destroy()
+
+    jobs = recorder.done + recorder.failed
+    print(json.dumps({
+        'workers': args.workers,
+        'jobs_per_min': jobs / elapsed * 60,
+        'start_p50_ms': percentile(recorder.latencies, 0.5) * 1000,
+        'start_p95_ms': percentile(recorder.latencies, 0.95) * 1000,
+        'cpu_ms_per_job': cpu / max(jobs, 1) * 1000,
+        'rss_growth_mb': rss_after - rss_before,
+        'stall_p99_ms': percentile(heartbeat.lateness, 0.99) * 1000,
+        'stall_max_ms': max(heartbeat.lateness, default=0) * 1000,
+        'failed': recorder.failed,
+        'elapsed_s': elapsed,
+    }))
+
+
+def run(args, workers):
+    home = Path(tempfile.mkdtemp(prefix="yt_bench_engine_"))
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home),
+               FAKE_YTDLP_SIZE=str(args.size), FAKE_YTDLP_RATE=str(args.rate),
+               FAKE_YTDLP_LATENCY=str(args.latency), FAKE_YTDLP_FAIL=str(args.fail))
+    cmd = [sys.executable, __file__, '--child', '--workers', str(workers),
+           '--jobs', str(args.jobs), '--backend', args.backend, '--arrival', str(args.arrival)]
+    if args.gui:
+        cmd.append('--gui')
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().split('\n')[-1])
+    return json.loads(out.stdout.strip().split('\n')[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--jobs', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--backend', choices=['exe', 'stub'], default='exe',
+                        help="fake yt-dlp executable (subprocess engine) or in-process stub")
+    parser.add_argument('--size', type=int, default=2_000_000, help="bytes per fake file")
+    parser.add_argument('--rate', type=float, default=4_000_000, help="bytes/s per download")
+    parser.add_argument('--latency', type=float, default=0.2, help="extraction seconds")
+    parser.add_argument('--fail', type=float, default=0.0, help="failure rate 0..1")
+    parser.add_argument('--arrival', type=float, default=0,
+                        help="links per second (default: all queued at once)")
+    parser.add_argument('--gui', action='store_true', help="drive the Tk window (needs a display)")
+    parser.add_argument('--json', action='store_true', help="print raw results as JSON")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        args.workers = args.workers[0]
+        return child(args)
+
+    results = [run(args, workers) for workers in args.workers]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{args.jobs} jobs, {args.backend} backend, {args.size / 1e6:.1f} MB at "
+          f"{args.rate / 1e6:.1f} MB/s, {args.fail:.0%} failing"
+          f"{', Tk window' if args.gui else ''}")
+    print(f"{'workers':>7s} {'jobs/min':>9s} {'start p50':>10s} {'p95':>8s} {'cpu/job':>8s} "
+          f"{'rss +MB':>8s} {'stall p99':>10s} {'max':>7s} {'failed':>6s}")
+    for r in results:
+        print(f"{r['workers']:7d} {r['jobs_per_min']:9.1f} {r['start_p50_ms']:8.0f}ms "
+              f"{r['start_p95_ms']:6.0f}ms {r['cpu_ms_per_job']:6.1f}ms {r['rss_growth_mb']:8.1f} "
+              f"{r['stall_p99_ms']:8.1f}ms {r['stall_max_ms']:5.1f}ms {r['failed']:6d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
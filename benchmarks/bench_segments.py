@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Segmented downloader benchmark against a local, per-connection throttled range server
+
+Downloads one large stream with 1 connection (what a plain download gets) and with each
+--connections count, verifies every byte, and reports throughput. --drop cuts off that
+fraction of responses mid-way to exercise per-segment retries; --resume stops the first
+run halfway and checks that the second one only fetches the missing ranges.
+
+    python benchmarks/bench_segments.py [--size 64M] [--rate 2M] [--connections 1 4 8]
+
+Exits non-zero if any download comes back with wrong bytes.
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from range_server import RangeServer, pattern
+from yt_scheduler import parse_rate
+from yt_segments import SegmentedDownloader, SegmentError, SEGMENT_SIZE
+
+VERIFY_BLOCK = 4 * 1024 * 1024
+
+
+def verify(path, size):
+    """True if path holds exactly size bytes of the server's pattern"""
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            block = f.read(VERIFY_BLOCK)
+            if not block:
+                return offset == size
+            if block != pattern(offset, len(block)):
+                return False
+            offset += len(block)
+
+
+def run(server, folder, size, connections, segment_size):
+    path = Path(folder) / f"stream-{connections}.webm"
+    downloader = SegmentedDownloader(connections, segment_size, min_size=0)
+    before = server.requests
+    start = time.perf_counter()
+    downloader.fetch(f"{server.url}/stream?size={size}", path)
+    elapsed = time.perf_counter() - start
+    ok = verify(path, size)
+    path.unlink()
+    downloader.close()
+    return elapsed, server.requests - before, ok
+
+
+def resume(server, folder, size, segment_size):
+    """Cancel a download halfway, then finish it; returns (requests on resume, ok)"""
+    path = Path(folder) / "resumed.webm"
+    downloader = SegmentedDownloader(4, segment_size, min_size=0)
+    cancel = threading.Event()
+    url = f"{server.url}/stream?size={size}"
+
+    def on_progress(done, total, speed, eta):
+        if done >= total // 2:
+            cancel.set()
+
+    try:
+        downloader.fetch(url, path, on_progress=on_progress, cancel=cancel)
+    except SegmentError:
+        pass
+    before = server.requests
+    downloader.fetch(url, path)
+    ok = verify(path, size)
+    path.unlink()
+    downloader.close()
+    return server.requests - before, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size', type=parse_rate, default=64 * 1024 * 1024,
+                        help="stream size, e.g. 64M")
+    parser.add_argument('--rate', type=parse_rate, default=2 * 1024 * 1024,
+                        help="server speed per connection, e.g. 2M (bytes/s)")
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--segment-size', type=parse_rate, default=SEGMENT_SIZE)
+    parser.add_argument('--drop', type=float, default=0.0,
+                        help="fraction of responses cut off mid-way")
+    parser.add_argument('--resume', action='store_true')
+    args = parser.parse_args()
+    size, segment = int(args.size), int(args.segment_size)
+
+    server = RangeServer(rate=args.rate, drop=args.drop).start()
+    failed = False
+    print(f"{size / 2 ** 20:.0f} MB stream, {args.rate / 2 ** 20:.1f} MB/s per connection, "
+          f"{segment / 2 ** 20:.0f} MB segments, {args.drop:.0%} responses dropped")
+    print(f"{'connections':>11}  {'seconds':>8}  {'MB/s':>6}  {'requests':>8}  ok")
+    with tempfile.TemporaryDirectory() as folder:
+        for connections in args.connections:
+            elapsed, requests, ok = run(server, folder, size, connections, segment)
+            failed |= not ok
+            print(f"{connections:>11}  {elapsed:8.2f}  {size / 2 ** 20 / elapsed:6.1f}  "
+                  f"{requests:>8}  {'yes' if ok else 'NO'}")
+        if args.resume:
+            requests, ok = resume(server, folder, size, segment)
+            failed |= not ok
+            print(f"resume: {requests} requests for the second half "
+                  f"({-(-size // segment)} segments in all), ok: {'yes' if ok else 'NO'}")
+    server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
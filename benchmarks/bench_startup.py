@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark, broken down by phase
+
+Each run is a fresh interpreter (HOME points at a scratch dir, so nothing touches real
+history or caches). Run 1 is a cold start; later runs hit the icon and tool caches.
+
+    python benchmarks/bench_startup.py [-n 5] [--budget-ms 1500]
+
+Exits non-zero when the median warm total exceeds --budget-ms, to catch regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def child():
+    """Time each startup phase in this (fresh) interpreter; print them as JSON"""
+    phases = {}
+    mark = time.perf_counter()
+
+    def phase(name):
+        nonlocal mark
+        now = time.perf_counter()
+        phases[name] = (now - mark) * 1000
+        mark = now
+
+    sys.path.insert(0, str(ROOT))
+    import yt_engine
+    phase("import engine")
+    from yt_tools import missing_dependencies, find_tool
+    missing_dependencies()
+    phase("dependency check")
+    find_tool('yt-dlp')
+    find_tool('ffmpeg')
+    phase("tool discovery")
+    engine = yt_engine.DownloadEngine(Path(os.environ['HOME']) / "out")
+    phase("engine init")
+    engine.history.have("video:xxxxxxxxxxx")
+    phase("first history lookup")
+
+    if os.environ.get('DISPLAY') or sys.platform in ('win32', 'darwin'):
+        import tkinter
+        import yt_gui
+        phase("import tkinter + gui")
+        yt_gui.icon_path()
+        phase("icon")
+        root = tkinter.Tk()
+        yt_gui.YTDownloader(root)
+        root.update()
+        phase("build window")
+        root.destroy()
+    print(json.dumps(phases))
+
+
+def run_once(home):
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, __file__, '--child'], env=env, capture_output=True,
+                         text=True, check=True).stdout
+    total = (time.perf_counter() - start) * 1000
+    phases = json.loads(out.strip().split('\n')[-1])
+    phases["interpreter + rest"] = total - sum(phases.values())
+    phases["TOTAL"] = total
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', type=int, default=5, help="runs (first one is cold)")
+    parser.add_argument('--budget-ms', type=float, default=None)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    home = Path(tempfile.mkdtemp(prefix="yt_startup_"))
+    runs = [run_once(home) for _ in range(max(args.n, 2))]
+    cold, warm = runs[0], runs[1:]
+
+    print(f"{'phase':24s} {'cold ms':>9s} {'warm ms':>9s}")
+    for name in cold:
+        median = statistics.median(r.get(name, 0) for r in warm)
+        print(f"{name:24s} {cold[name]:9.1f} {median:9.1f}")
+
+    warm_total = statistics.median(r["TOTAL"] for r in warm)
+    if args.budget_ms is not None and warm_total > args.budget_ms:
+        print(f"[-] Startup regression: {warm_total:.0f}ms > budget {args.budget_ms:.0f}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
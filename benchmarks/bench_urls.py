@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""URL normalizer benchmark and corpus check
+
+Builds a corpus of every supported link form (watch, youtu.be, shorts, live, embed,
+m./music. hosts, any case, v= after other parameters or &amp;, tracking parameters,
+playlists) plus lookalikes that must not match, checks that each one maps to its
+expected key, then
+times the three ways links are parsed: one URL at a time (canonical_key), line by line
+with dedup (iter_unique_urls, file imports) and one big pasted blob (extract_urls).
+
+    python benchmarks/bench_urls.py [-n 1000000] [--min-rate 500000]
+
+Exits non-zero if any corpus entry maps to the wrong key, or when --min-rate is given
+and canonical_key handles fewer URLs per second.
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from yt_urls import canonical_key, extract_urls, iter_unique_urls
+
+ID_CHARS = string.ascii_letters + string.digits + '-_'
+
+# (template, kind); {id} is an 11-character video ID or a playlist ID
+FORMS = [
+    ("https://www.youtube.com/watch?v={id}", 'video'),
+    ("https://www.youtube.com/watch?v={id}&t=42s&si=Xk3pQ9aZ", 'video'),
+    ("http://youtube.com/watch?v={id}&list=PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf", 'video'),
+    ("https://m.youtube.com/watch?feature=share&v={id}", 'video'),
+    ("https://music.youtube.com/watch?v={id}&pp=ygUEdGVzdA%3D%3D", 'video'),
+    ("www.youtube.com/watch?app=desktop&feature=youtu.be&v={id}", 'video'),
+    ("https://www.youtube.com/watch?feature=share&amp;v={id}&amp;t=5", 'video'),
+    ("HTTPS://WWW.YouTube.com/watch?v={id}", 'video'),
+    ("https://YOUTU.BE/{id}", 'video'),
+    ("https://youtu.be/{id}", 'video'),
+    ("https://youtu.be/{id}?si=AbCdEfGhIjKlMnOp&t=10", 'video'),
+    ("https://www.youtube.com/shorts/{id}?feature=share", 'video'),
+    ("https://youtube.com/live/{id}", 'video'),
+    ("https://www.youtube.com/embed/{id}?rel=0", 'video'),
+    ("https://www.youtube-nocookie.com/embed/{id}", 'video'),
+    ("https://www.youtube.com/v/{id}", 'video'),
+    ("https://www.youtube.com/playlist?list=PL{id}", 'playlist'),
+    ("https://music.youtube.com/playlist?si=Xk3pQ9aZ&list=OLAK5uy_{id}", 'playlist'),
+    ("https://www.youtube.com/playlist?si=Xk3pQ9aZ&amp;list=PL{id}", 'playlist'),
+]
+
+# Must not produce a key
+LOOKALIKES = [
+    "https://notyoutube.com/watch?v={id}",
+    "https://www.youtube.com.example.net/watch?v={id}",
+    "https://www.youtube.com/watch?v={id}x",
+    "https://www.youtube.com/watch?xv={id}",
+    "https://youtu.be/{short}",
+    "https://www.youtube.com/channel/{id}",
+]
+
+
+def random_id(rng, n=11):
+    return ''.join(rng.choices(ID_CHARS, k=n))
+
+
+def build_corpus(n, seed=1):
+    """n (url, expected key) pairs, a tenth of them lookalikes (expected None)"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        vid = random_id(rng)
+        if i % 10 == 9:
+            template = rng.choice(LOOKALIKES)
+            corpus.append((template.format(id=vid, short=vid[:10]), None))
+            continue
+        template, kind = rng.choice(FORMS)
+        url = template.format(id=vid)
+        value = url.split('list=')[1].split('&')[0] if kind == 'playlist' else vid
+        corpus.append((url, f"{kind}:{value}"))
+    return corpus
+
+
+def check(corpus):
+    """Entries whose key differs from the expected one"""
+    return [(url, expected, canonical_key(url)) for url, expected in corpus
+            if canonical_key(url) != expected]
+
+
+def rate(count, fn):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', type=int, default=1000000, help="corpus size")
+    parser.add_argument('--min-rate', type=float, default=None,
+                        help="fail below this many canonical_key calls per second")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.n)
+    wrong = check(corpus)
+    for url, expected, got in wrong[:10]:
+        print(f"MISMATCH {url}: expected {expected}, got {got}")
+    print(f"corpus: {len(corpus)} URLs ({len(FORMS)} forms, {len(LOOKALIKES)} lookalikes), "
+          f"{len(wrong)} mismatches")
+
+    urls = [url for url, expected in corpus]
+    # Imports repeat links: the same corpus twice over, shuffled
+    lines = urls * 2
+    random.Random(2).shuffle(lines)
+    blob = "\n".join(urls)
+    results = {
+        'canonical_key': rate(len(urls), lambda: [canonical_key(url) for url in urls]),
+        'iter_unique_urls': rate(len(lines), lambda: sum(1 for _ in iter_unique_urls(lines))),
+        'extract_urls': rate(len(urls), lambda: extract_urls(blob)),
+    }
+    for name, per_second in results.items():
+        print(f"{name:>18}: {per_second / 1e6:6.2f} M URLs/s")
+
+    if wrong:
+        return 1
+    if args.min_rate and results['canonical_key'] < args.min_rate:
+        print(f"canonical_key below {args.min_rate:.0f} URLs/s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
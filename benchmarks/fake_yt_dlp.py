@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Offline stand-in for yt-dlp: a fake executable and an in-process stub backend
+
+Both go through the same simulation: extraction latency, a throttled download written
+in chunks to a .part file (renamed when done), realistic --newline progress output and
+failures at a configurable rate. Configured through environment variables so the
+executable picks them up from whatever launched it:
+
+    FAKE_YTDLP_SIZE     bytes per file (default 4 MiB)
+    FAKE_YTDLP_RATE     download speed in bytes/s (default 8 MiB/s, 0 = unthrottled)
+    FAKE_YTDLP_LATENCY  extraction time in seconds (default 0.2)
+    FAKE_YTDLP_FAIL     fraction of videos that fail, picked by ID hash (default 0)
+    FAKE_YTDLP_PLAYLIST entries in every playlist (default 20)
+    FAKE_YTDLP_STREAM   base URL of a range server (range_server.py) the extracted
+                        stream URLs point to, for the segmented downloader
+
+    python benchmarks/fake_yt_dlp.py [yt-dlp options] URL
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from yt_backends import DownloadResult, OUTPUT_TEMPLATE
+from yt_progress import ProgressParser
+from yt_urls import canonical_key
+
+CHUNK = 64 * 1024
+PROGRESS_EVERY = 0.1
+
+# yt-dlp options that take a value (everything else is a flag or the URL)
+VALUE_OPTIONS = {'-f', '-o', '--progress-template', '--print', '--load-info-json',
+                 '--socket-timeout', '--format', '--output', '--limit-rate', '-r'}
+
+FIELD = re.compile(r'%\(([^)]+)\)s')
+
+
+class FakeError(Exception):
+    pass
+
+
+def config():
+    env = os.environ.get
+    return {
+        'size': int(env('FAKE_YTDLP_SIZE', 4 * 1024 * 1024)),
+        'rate': float(env('FAKE_YTDLP_RATE', 8 * 1024 * 1024)),
+        'latency': float(env('FAKE_YTDLP_LATENCY', 0.2)),
+        'fail': float(env('FAKE_YTDLP_FAIL', 0)),
+        'playlist': int(env('FAKE_YTDLP_PLAYLIST', 20)),
+        'stream': env('FAKE_YTDLP_STREAM', ''),
+    }
+
+
+def fill(template, fields):
+    """Expand %(a,b)s fields the way yt-dlp does (first non-missing alternative, else NA)"""
+    def field(match):
+        for name in match.group(1).split(','):
+            value = fields.get(name)
+            if value is not None:
+                return str(value)
+        return "NA"
+    return FIELD.sub(field, template)
+
+
+def video_id(url):
+    key = canonical_key(url) or ''
+    return key.split(':', 1)[1] if key.startswith('video:') else None
+
+
+def fails(vid, rate):
+    """Deterministic per ID, so runs with the same inputs fail the same jobs"""
+    return int(hashlib.md5(vid.encode()).hexdigest()[:8], 16) / 0xffffffff < rate
+
+
+def playlist_ids(url, count):
+    return [f"{int(hashlib.md5(f'{url}#{n}'.encode()).hexdigest()[:12], 16) % 10 ** 11:011d}"
+            for n in range(count)]
+
+
+def make_info(vid, cfg):
+    expire = int(time.time()) + 6 * 3600
+    if cfg['stream']:
+        url = f"{cfg['stream']}/{vid}?size={cfg['size']}&expire={expire}"
+    else:
+        url = f"https://fake.invalid/{vid}?expire={expire}"
+    # Like yt-dlp -J -f bestaudio: the selected format's fields are merged into the top level
+    return {
+        'id': vid, 'title': f"Fake video {vid}", 'ext': 'webm', 'extractor': 'youtube',
+        'webpage_url': f"https://www.youtube.com/watch?v={vid}", 'duration': 240,
+        'filesize': cfg['size'], 'format_id': '251', 'url': url,
+        'protocol': url.split(':', 1)[0],
+        'formats': [{'format_id': '251', 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus',
+                     'url': url}],
+    }
+
+
+def extract(url, cfg, out=None):
+    vid = video_id(url)
+    if out:
+        out(f"[youtube] Extracting URL: {url}")
+        out(f"[youtube] {vid}: Downloading webpage")
+    time.sleep(cfg['latency'])
+    if not vid or fails(vid, cfg['fail']):
+        raise FakeError(f"[youtube] {vid}: Video unavailable")
+    return make_info(vid, cfg)
+
+
+def simulate(info, output_template, cfg, on_progress, out=None):
+    """Write info's fake audio in throttled chunks; returns the final path"""
+    fields = dict(info)
+    path = Path(fill(output_template, fields))
+    part = Path(str(path) + '.part')
+    total = cfg['size']
+    if out:
+        out(f"[info] {info['id']}: Downloading 1 format(s): 251")
+    if path.exists():
+        if out:
+            out(f"[download] {path} has already been downloaded")
+        return path
+    if out:
+        out(f"[download] Destination: {path}")
+    start = time.monotonic()
+    last = 0
+    done = part.stat().st_size if part.exists() else 0
+    with open(part, 'ab') as f:
+        while done < total:
+            n = min(CHUNK, total - done)
+            f.write(b'\0' * n)
+            done += n
+            if cfg['rate']:
+                ahead = done / cfg['rate'] - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+            now = time.monotonic()
+            if now - last >= PROGRESS_EVERY or done == total:
+                last = now
+                speed = done / max(now - start, 1e-6)
+                on_progress(done, total, speed, (total - done) / speed)
+    part.replace(path)
+    return path
+
+
+def main(argv=None):
+    """Executable mode: the subset of yt-dlp's CLI the downloader uses"""
+    argv = sys.argv[1:] if argv is None else argv
+    opts, urls, i = {}, [], 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in VALUE_OPTIONS:
+            opts.setdefault(arg, []).append(argv[i + 1])
+            i += 2
+            continue
+        if arg.startswith('-'):
+            opts[arg] = True
+        else:
+            urls.append(arg)
+        i += 1
+
+    cfg = config()
+    if '--limit-rate' in opts:
+        limit = float(opts['--limit-rate'][0])
+        cfg['rate'] = min(cfg['rate'], limit) if cfg['rate'] else limit
+
+    def out(line):
+        print(line, flush=True)
+
+    try:
+        if '--flat-playlist' in opts:
+            for vid in playlist_ids(urls[0], cfg['playlist']):
+                out(vid)
+            return 0
+        if '--load-info-json' in opts:
+            with open(opts['--load-info-json'][0], encoding='utf-8') as f:
+                info = json.load(f)
+        else:
+            info = extract(urls[0], cfg, None if '-J' in opts else out)
+        if '-J' in opts:
+            out(json.dumps(info))
+            return 0
+
+        template = (opts.get('-o') or [OUTPUT_TEMPLATE])[0]
+        progress = [t.split(':', 1)[1] for t in opts.get('--progress-template', [])
+                    if t.startswith('download:')]
+        prints = [t.split(':', 1)[1] for t in opts.get('--print', [])
+                  if t.startswith('after_move:')]
+
+        def on_progress(done, total, speed, eta):
+            fields = {'progress.downloaded_bytes': done, 'progress.total_bytes': total,
+                      'progress.speed': speed, 'progress.eta': int(eta)}
+            if progress:
+                out(fill(progress[0], fields))
+            else:
+                out(f"[download] {done * 100 / total:5.1f}% of {total} at {speed:.0f}B/s")
+
+        path = simulate(info, template, cfg, on_progress, out)
+        for template in prints:
+            out(fill(template, dict(info, filepath=str(path))))
+        return 0
+    except FakeError as e:
+        print(f"ERROR: {e}", file=sys.stderr, flush=True)
+        return 1
+
+
+class StubBackend:
+    """In-process stand-in with the backend interface, for benchmarks and smoke runs"""
+    name = "stub"
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg or config()
+
+    def extract(self, url):
+        try:
+            return extract(url, self.cfg)
+        except FakeError as e:
+            raise RuntimeError(str(e))
+
+    def expected_path(self, info, output_dir):
+        return None
+
+    def download(self, url, output_dir, on_progress=None, info=None, rate_limit=None,
+                 cancel=None):
+        parser = ProgressParser(on_progress)
+        fresh = info is None
+        try:
+            if fresh:
+                info = extract(url, self.cfg)
+            path = simulate(info, str(Path(output_dir) / OUTPUT_TEMPLATE), self.cfg,
+                            lambda done, total, speed, eta: parser.hook(
+                                {'status': 'downloading', 'downloaded_bytes': done,
+                                 'total_bytes': total, 'speed': speed, 'eta': eta}))
+        except FakeError as e:
+            return DownloadResult(False, str(e)[:70])
+        return DownloadResult(True, filepath=path, downloaded=parser.downloaded,
+                              info=info if fresh else None)
+
+    def list_playlist(self, url):
+        return playlist_ids(url, self.cfg['playlist'])
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Local HTTP server with Range support, standing in for a media CDN
+
+GET /<anything>?size=N serves N bytes of a deterministic pattern (the byte at offset i
+is i % 251, so a range written to the wrong place is caught). Like YouTube, each
+response can be throttled (per connection, not per client) and connections can be
+dropped at random mid-response (range bodies only, never the one-byte probe).
+Keep-alive HTTP/1.1.
+
+    python benchmarks/range_server.py [--port 8900] [--rate 1M] [--drop 0.05]
+"""
+import argparse
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from yt_scheduler import parse_rate
+
+PERIOD = 251
+BLOCK = bytes(i % PERIOD for i in range(PERIOD * 1024))
+CHUNK = 64 * 1024
+RANGE = re.compile(r'bytes=(\d+)-(\d*)$')
+
+
+def pattern(start, length):
+    """length bytes of the pattern starting at offset start"""
+    out = bytearray()
+    offset = start % PERIOD
+    while len(out) < length:
+        piece = BLOCK[offset:offset + length - len(out)]
+        out += piece
+        offset = 0
+    return bytes(out)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlsplit(self.path).query)
+        size = int(query.get('size', [server.default_size])[0])
+        start, end, status = 0, size - 1, 200
+        match = RANGE.match(self.headers.get('Range') or '')
+        if match and server.ranges:
+            # A misbehaving CDN (skew) answers a later range than the one asked for
+            start = int(match.group(1)) + (server.skew if int(match.group(1)) else 0)
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+        with server.lock:
+            server.requests += 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'audio/webm')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+        sent, began = 0, time.monotonic()
+        drop_at = None
+        # The one-byte probe is never cut, so a downloader always gets to its ranges
+        if server.drop and end > start and random.random() < server.drop:
+            drop_at = random.randint(0, end - start)
+        while start + sent <= end:
+            n = min(CHUNK, end - start + 1 - sent)
+            if drop_at is not None and sent + n > drop_at:
+                self.close_connection = True
+                return
+            self.wfile.write(pattern(start + sent, n))
+            sent += n
+            if server.rate:
+                ahead = sent / server.rate - (time.monotonic() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+class RangeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, rate=None, drop=0.0, ranges=True, default_size=64 * 1024 * 1024,
+                 skew=0):
+        super().__init__(('127.0.0.1', port), Handler)
+        self.rate = rate
+        self.drop = drop
+        self.ranges = ranges
+        self.skew = skew
+        self.default_size = default_size
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (cancelled or finished ranges)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--rate', type=parse_rate, default=None,
+                        help="per-connection speed, e.g. 1M (bytes/s)")
+    parser.add_argument('--drop', type=float, default=0.0,
+                        help="fraction of responses cut off mid-way")
+    parser.add_argument('--no-ranges', action='store_true', help="ignore Range headers")
+    args = parser.parse_args()
+    server = RangeServer(args.port, args.rate, args.drop, not args.no_ranges)
+    print(f"Serving ranges on {server.url}/stream?size=N", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Flat top-level modules, plus the local servers the benchmarks use
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+# The stores default to ~/.cache/yt_downloader: keep the tests out of the real one
+os.environ['HOME'] = tempfile.mkdtemp(prefix="yt_tests_")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A stopped DownloadEngine on tmp_path, with the in-process fake yt-dlp (64 KiB
+    files, no extraction delay) and no ffmpeg"""
+    from fake_yt_dlp import StubBackend, config
+    from yt_engine import DownloadEngine
+    from yt_history import DownloadHistory
+    from yt_metadata import MetadataCache
+
+    engine = DownloadEngine(output_dir=tmp_path / "out", resume=False, workers=2,
+                            max_workers=4, history=DownloadHistory(tmp_path / "history.db"),
+                            metadata=MetadataCache(tmp_path / "metadata.db"))
+    engine.backend = StubBackend(dict(config(), size=64 * 1024, latency=0))
+    engine.transcoder.ffmpeg = None
+    yield engine
+    engine.stop(timeout=5)
+    engine.transcoder.close(5)
+    engine.library.close()
+    engine.history.close()
+    engine.metadata.close()
@@ -0,0 +1,55 @@
+import http.client
+import json
+
+import pytest
+
+from yt_api import ApiServer
+
+EXTENSION = "chrome-extension://abcdefghijklmnop"
+
+
+@pytest.fixture
+def api(engine):
+    server = ApiServer(engine, port=0, log=lambda msg: None)
+    assert server.start()
+    yield server
+    server.stop()
+
+
+def request(api, method, path, body=None, origin=EXTENSION):
+    conn = http.client.HTTPConnection(api.host, api.port, timeout=5)
+    headers = {'Origin': origin} if origin else {}
+    if body is not None:
+        headers['Content-Type'] = 'application/json'
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response, json.loads(data) if data else None
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('GET', '/jobs/video:dQw4w9WgXcQ', None, 404),
+    ('DELETE', '/jobs/video:dQw4w9WgXcQ', None, 409),
+    ('POST', '/jobs', '{not json', 400),
+    ('POST', '/jobs', '{"url": "https://example.com/"}', 400),
+    ('PUT', '/jobs', None, 405),
+    ('GET', '/nowhere', None, 404),
+])
+def test_errors_carry_cors_headers_for_allowed_origins(api, method, path, body, status):
+    response, data = request(api, method, path, body)
+    assert response.status == status
+    assert response.getheader('Access-Control-Allow-Origin') == EXTENSION
+    assert data['error']
+
+
+def test_foreign_origin_is_refused_without_cors_headers(api):
+    response, data = request(api, 'GET', '/jobs', origin="https://evil.example")
+    assert response.status == 403
+    assert response.getheader('Access-Control-Allow-Origin') is None
+
+
+def test_requests_without_origin_get_no_cors_headers(api):
+    response, data = request(api, 'GET', '/jobs/video:dQw4w9WgXcQ', origin=None)
+    assert response.status == 404
+    assert response.getheader('Access-Control-Allow-Origin') is None
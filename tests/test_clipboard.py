@@ -0,0 +1,137 @@
+import ctypes
+import ctypes.util
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+import yt_clipboard
+from yt_clipboard import PollingWatcher, XFixesWatcher
+
+
+class Clipboard:
+    """Clipboard stand-in: contents plus a count of reads"""
+
+    def __init__(self, text=''):
+        self.text = text
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.text
+
+
+def watch(watcher):
+    """Run watcher in a thread; returns (changes, stop)"""
+    changes = []
+    running = threading.Event()
+    running.set()
+    thread = threading.Thread(target=watcher.run, args=(changes.append, running.is_set),
+                              daemon=True)
+    thread.start()
+
+    def stop():
+        running.clear()
+        thread.join(5)
+        assert not thread.is_alive()
+    return changes, stop
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_polling_reports_each_new_text_once(monkeypatch):
+    monkeypatch.setattr(yt_clipboard, 'POLL_MAX', 0.1)
+    clip = Clipboard('first')
+    changes, stop = watch(PollingWatcher(clip, log=lambda msg: None))
+    assert wait_for(lambda: changes == ['first'])
+    clip.text = 'second'
+    assert wait_for(lambda: changes == ['first', 'second'])
+    clip.text = ''
+    time.sleep(0.3)
+    stop()
+    assert changes == ['first', 'second']
+
+
+@pytest.fixture
+def xvfb():
+    """A private X server on a free display; skips where Xvfb isn't installed"""
+    if not shutil.which('Xvfb'):
+        pytest.skip("Xvfb not installed")
+    if not ctypes.util.find_library('X11') or not ctypes.util.find_library('Xfixes'):
+        pytest.skip("libX11/libXfixes not installed")
+    number = next(n for n in range(90, 200) if not os.path.exists(f'/tmp/.X{n}-lock'))
+    server = subprocess.Popen(['Xvfb', f':{number}', '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for(lambda: os.path.exists(f'/tmp/.X11-unix/X{number}')):
+        server.kill()
+        pytest.skip("Xvfb did not start")
+    yield f':{number}'
+    server.terminate()
+    server.wait(5)
+
+
+class Owner:
+    """Another X client that can take ownership of CLIPBOARD, as a copy in an app does"""
+
+    def __init__(self, display_name):
+        xlib = ctypes.CDLL(ctypes.util.find_library('X11'))
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XCreateSimpleWindow.restype = ctypes.c_ulong
+        xlib.XCreateSimpleWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int,
+                                             ctypes.c_int, ctypes.c_uint, ctypes.c_uint,
+                                             ctypes.c_uint, ctypes.c_ulong, ctypes.c_ulong]
+        xlib.XInternAtom.restype = ctypes.c_ulong
+        xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        xlib.XSetSelectionOwner.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong,
+                                            ctypes.c_ulong]
+        xlib.XFlush.argtypes = [ctypes.c_void_p]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xlib = xlib
+        self.display = xlib.XOpenDisplay(display_name.encode())
+        assert self.display
+        self.window = xlib.XCreateSimpleWindow(self.display, xlib.XDefaultRootWindow(self.display),
+                                               0, 0, 1, 1, 0, 0, 0)
+        self.clipboard = xlib.XInternAtom(self.display, b"CLIPBOARD", 0)
+
+    def copy(self):
+        # CurrentTime (0) as the timestamp
+        self.xlib.XSetSelectionOwner(self.display, self.clipboard, self.window, 0)
+        self.xlib.XFlush(self.display)
+
+    def close(self):
+        self.xlib.XCloseDisplay(self.display)
+
+
+def test_xfixes_reads_only_when_the_owner_changes(xvfb):
+    clip = Clipboard('first')
+    watcher = XFixesWatcher(clip, log=lambda msg: None, display_name=xvfb)
+    owner = Owner(xvfb)
+    try:
+        changes, stop = watch(watcher)
+        # The initial contents are picked up without any notification
+        assert wait_for(lambda: changes == ['first'])
+        time.sleep(2 * yt_clipboard.STOP_CHECK)
+        assert clip.reads == 1
+
+        clip.text = 'second'
+        owner.copy()
+        assert wait_for(lambda: changes == ['first', 'second'])
+        assert clip.reads == 2
+        stop()
+    finally:
+        owner.close()
+    # run() closes the display on the way out
+    assert watcher._display is None
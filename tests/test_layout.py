@@ -0,0 +1,127 @@
+import errno
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+import yt_layout
+from yt_layout import OutputLayout, PUBLISH_SUFFIX, parse_layout
+
+NAME = "Song [dQw4w9WgXcQ].mp3"
+
+
+@pytest.fixture
+def staged(tmp_path):
+    """A finished file in staging, and the folder it is published to"""
+    src = tmp_path / "staging" / NAME
+    src.parent.mkdir()
+    src.write_bytes(b'new audio')
+    os.utime(src, (1000000000, 1000000000))
+    return src, tmp_path / "out" / "3f"
+
+
+def test_publish_moves_the_file_into_its_folder(staged):
+    src, folder = staged
+    path = OutputLayout().publish(src, folder)
+    assert path == folder / NAME
+    assert path.read_bytes() == b'new audio'
+    assert not src.exists()
+
+
+def test_taken_names_get_a_number_before_the_id(staged):
+    src, folder = staged
+    folder.mkdir(parents=True)
+    (folder / NAME).write_bytes(b'old audio')
+    (folder / "Song (2) [dQw4w9WgXcQ].mp3").write_bytes(b'old audio')
+    path = OutputLayout().publish(src, folder)
+    assert path.name == "Song (3) [dQw4w9WgXcQ].mp3"
+    assert path.read_bytes() == b'new audio'
+    assert (folder / NAME).read_bytes() == b'old audio'
+
+
+def test_names_without_an_id_are_numbered_at_the_end(staged):
+    src, folder = staged
+    src = src.rename(src.with_name("Song.mp3"))
+    folder.mkdir(parents=True)
+    (folder / "Song.mp3").write_bytes(b'old audio')
+    assert OutputLayout().publish(src, folder).name == "Song (2).mp3"
+
+
+def test_publish_gives_up_after_max_collisions(staged, monkeypatch):
+    monkeypatch.setattr(yt_layout, 'MAX_COLLISIONS', 2)
+    src, folder = staged
+    folder.mkdir(parents=True)
+    for name in (NAME, "Song (2) [dQw4w9WgXcQ].mp3"):
+        (folder / name).write_bytes(b'old audio')
+    with pytest.raises(FileExistsError):
+        OutputLayout().publish(src, folder)
+    assert src.exists()
+
+
+@pytest.fixture
+def cross_device(monkeypatch):
+    """Make staging look like another filesystem: links out of it fail with EXDEV"""
+    link = os.link
+
+    def fake_link(src, dst):
+        if Path(src).parent != Path(dst).parent:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        link(src, dst)
+
+    monkeypatch.setattr(os, 'link', fake_link)
+
+
+def test_other_filesystem_is_copied_next_to_the_target_first(staged, cross_device):
+    src, folder = staged
+    folder.mkdir(parents=True)
+    (folder / NAME).write_bytes(b'old audio')
+    path = OutputLayout().publish(src, folder)
+    assert path.name == "Song (2) [dQw4w9WgXcQ].mp3"
+    assert path.read_bytes() == b'new audio'
+    assert path.stat().st_mtime == 1000000000
+    assert not src.exists()
+    assert set(os.listdir(folder)) == {NAME, path.name}
+
+
+def test_failed_copy_leaves_no_temp_file_and_keeps_the_source(staged, cross_device,
+                                                              monkeypatch):
+    src, folder = staged
+
+    def broken_copy(src, dst):
+        Path(dst).write_bytes(b'half')
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(shutil, 'copyfile', broken_copy)
+    with pytest.raises(OSError):
+        OutputLayout().publish(src, folder)
+    assert src.read_bytes() == b'new audio'
+    assert not (folder / f".{NAME}{PUBLISH_SUFFIX}").exists()
+    assert os.listdir(folder) == []
+
+
+def test_without_hard_links_the_file_is_renamed(staged, monkeypatch):
+    def no_links(src, dst):
+        raise PermissionError(errno.EPERM, "Operation not permitted")
+
+    monkeypatch.setattr(os, 'link', no_links)
+    src, folder = staged
+    folder.mkdir(parents=True)
+    (folder / NAME).write_bytes(b'old audio')
+    path = OutputLayout().publish(src, folder)
+    assert path.name == "Song (2) [dQw4w9WgXcQ].mp3"
+    assert (folder / NAME).read_bytes() == b'old audio'
+    assert not src.exists()
+
+
+def test_layout_folders(tmp_path):
+    info = {'id': 'dQw4w9WgXcQ', 'uploader': 'AC/DC: Live?', 'upload_date': '20091025'}
+    assert OutputLayout('flat').folder(tmp_path, 'video:dQw4w9WgXcQ', info) == tmp_path
+    shard = OutputLayout('hash').folder(tmp_path, 'video:dQw4w9WgXcQ')
+    assert shard.parent == tmp_path and len(shard.name) == 2
+    assert OutputLayout('uploader').folder(tmp_path, 'video:dQw4w9WgXcQ', info) == \
+        tmp_path / "AC_DC_ Live_" / "2009"
+    assert OutputLayout('uploader').folder(tmp_path, 'video:dQw4w9WgXcQ') == \
+        tmp_path / "Unknown" / "Unknown"
+    with pytest.raises(ValueError):
+        parse_layout("{channel}")
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+import yt_leases
+from yt_history import CANCELLED, DONE, FAILED
+from yt_leases import JobLeases, LEASED
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    """Two instances sharing one output folder"""
+    a = JobLeases(tmp_path, log=lambda msg: None)
+    b = JobLeases(tmp_path, log=lambda msg: None)
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_claim_is_exclusive_until_finished(fleet):
+    a, b = fleet
+    assert a.claim('video:x', 'url') is None
+    assert b.claim('video:x', 'url') == LEASED
+    a.finish('video:x', DONE)
+    assert b.claim('video:x', 'url') == DONE
+
+
+def test_offer_reports_jobs_held_or_finished_elsewhere(fleet):
+    a, b = fleet
+    assert a.offer([('video:x', 'u1'), ('video:y', 'u2'), ('video:z', 'u3')]) == {}
+    a.claim('video:x', 'u1')
+    a.claim('video:y', 'u2')
+    a.finish('video:y', DONE)
+    assert b.offer([('video:x', 'u1'), ('video:y', 'u2'), ('video:z', 'u3')]) == {
+        'video:x': LEASED, 'video:y': DONE}
+
+
+def test_failed_or_cancelled_jobs_can_be_offered_again(fleet):
+    a, b = fleet
+    for key, state in (('video:f', FAILED), ('video:c', CANCELLED)):
+        a.claim(key, 'url')
+        a.finish(key, state)
+    assert b.offer([('video:f', 'url'), ('video:c', 'url')]) == {}
+    assert b.claim('video:f', 'url') is None
+
+
+def test_reclaim_takes_queued_work_from_other_instances(fleet):
+    a, b = fleet
+    a.offer([(f'video:{i}', f'u{i}') for i in range(3)])
+    assert b.reclaim(0) == []
+    claimed = b.reclaim(2)
+    assert len(claimed) == 2
+    for url, key in claimed:
+        assert a.claim(key, url) == LEASED
+    # a's own jobs are never reclaimed by a
+    assert [key for url, key in a.reclaim(5)] == []
+
+
+def test_expired_lease_is_reclaimed_and_reported_lost(fleet, monkeypatch):
+    a, b = fleet
+    lost = []
+    a.on_lost = lost.extend
+    monkeypatch.setattr(yt_leases, 'LEASE_TTL', 0.05)
+    a.claim('video:x', 'url')
+    time.sleep(0.1)
+    monkeypatch.setattr(yt_leases, 'LEASE_TTL', 90)
+    assert b.reclaim(5) == [('url', 'video:x')]
+    a.renew()
+    assert lost == ['video:x']
+    assert 'video:x' not in a.held
+
+
+def test_release_hands_the_job_back(fleet):
+    a, b = fleet
+    a.claim('video:x', 'url')
+    a.close()
+    assert b.reclaim(5) == [('url', 'video:x')]
+
+
+def test_disabled_table_acts_alone(tmp_path):
+    alone = JobLeases(tmp_path, enabled=False)
+    other = JobLeases(tmp_path, log=lambda msg: None)
+    assert other.claim('video:x', 'url') is None
+    assert alone.claim('video:x', 'url') is None
+    assert alone.offer([('video:x', 'url')]) == {}
+    other.close()
@@ -0,0 +1,85 @@
+import shutil
+import time
+
+import pytest
+
+import yt_library
+from yt_library import OutputIndex, is_temp, video_id_of
+
+
+@pytest.mark.parametrize('name', [
+    "Song [dQw4w9WgXcQ].webm.part",
+    "Song [dQw4w9WgXcQ].webm.ytdl",
+    "Song [dQw4w9WgXcQ].webm.part-Frag12",
+    "Song [dQw4w9WgXcQ].webm.part-Frag12.part",
+    "Song [dQw4w9WgXcQ].webm.seg.part",
+    "Song [dQw4w9WgXcQ].webm.seg.part.json",
+    ".Song [dQw4w9WgXcQ].mp3.publish.part",
+    "Song [dQw4w9WgXcQ].temp.mp3",
+])
+def test_work_files_are_temp(name):
+    assert is_temp(name)
+    assert video_id_of(name) is None
+
+
+@pytest.mark.parametrize('name', [
+    "Song.part 2 [dQw4w9WgXcQ].mp3",
+    "the.temp.mix [dQw4w9WgXcQ].mp3",
+    "Partial [dQw4w9WgXcQ].m4a",
+])
+def test_titles_that_only_contain_markers_are_audio(name):
+    assert not is_temp(name)
+    assert video_id_of(name) == 'dQw4w9WgXcQ'
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def polled(tmp_path, monkeypatch):
+    """A started OutputIndex on a two-shard tree, polling (no inotify), with the
+    folders it walks recorded"""
+    def no_inotify():
+        raise OSError("no inotify")
+
+    monkeypatch.setattr(yt_library, '_Inotify', no_inotify)
+    monkeypatch.setattr(yt_library, 'POLL_INTERVAL', 0.05)
+    for shard, video_id in (('aa', 'aaaaaaaaaaa'), ('bb', 'bbbbbbbbbbb')):
+        (tmp_path / shard).mkdir()
+        (tmp_path / shard / f"Song [{video_id}].mp3").write_bytes(b'audio')
+    index = OutputIndex(tmp_path, log=lambda msg: None)
+    walked = []
+    walk = index._walk
+    index._walk = lambda rel, ids, stems: (walked.append(rel), walk(rel, ids, stems))
+    index.start()
+    assert index.ready.wait(5)
+    walked.clear()
+    yield index, walked
+    index.close()
+
+
+def test_polling_relists_only_the_changed_shard(polled, tmp_path):
+    index, walked = polled
+    (tmp_path / "aa" / "New [ccccccccccc].mp3").write_bytes(b'audio')
+    assert wait_for(lambda: index.find('ccccccccccc'))
+    (tmp_path / "aa" / "Song [aaaaaaaaaaa].mp3").unlink()
+    assert wait_for(lambda: index.find('aaaaaaaaaaa') is None)
+    assert index.find('bbbbbbbbbbb') == tmp_path / "bb" / "Song [bbbbbbbbbbb].mp3"
+    assert walked == []
+
+
+def test_polling_picks_up_new_and_removed_shards(polled, tmp_path):
+    index, walked = polled
+    (tmp_path / "cc").mkdir()
+    (tmp_path / "cc" / "New [ccccccccccc].mp3").write_bytes(b'audio')
+    assert wait_for(lambda: index.find('ccccccccccc'))
+    assert walked[0] == 'cc'
+    shutil.rmtree(tmp_path / "bb")
+    assert wait_for(lambda: index.find('bbbbbbbbbbb') is None)
+    assert index.find('aaaaaaaaaaa')
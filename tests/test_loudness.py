@@ -0,0 +1,84 @@
+import math
+import subprocess
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from yt_loudness import RATE, STEP_FRAMES, analyze, gated_loudness
+from yt_transcode import find_ffmpeg
+
+
+def sine_powers(dbfs, seconds, channels=2, freq=997):
+    """Per-100 ms mean squares of a sine at dbfs peak in every channel, summed over
+    channels, as analyze() computes them (before K-weighting)"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    wave = 10 ** (dbfs / 20) * np.sin(2 * np.pi * freq * t)
+    steps = wave[:len(wave) // STEP_FRAMES * STEP_FRAMES].reshape(-1, STEP_FRAMES)
+    return channels * (steps ** 2).mean(axis=1)
+
+
+def test_steady_sine_reads_its_mean_square_level():
+    # Mean square of a sine is half its peak squared, i.e. peak - 3.01 dB per channel
+    lufs = gated_loudness(sine_powers(-20, 10, channels=1))
+    assert lufs == pytest.approx(-0.691 - 20 - 10 * math.log10(2), abs=0.01)
+    # Two channels add up their power: +3.01 dB
+    assert gated_loudness(sine_powers(-20, 10)) == pytest.approx(lufs + 10 * math.log10(2),
+                                                                 abs=0.01)
+
+
+def reference(powers):
+    """BS.1770-4 gating spelled out block by block"""
+    blocks = [sum(powers[i:i + 4]) / 4 for i in range(len(powers) - 3)]
+    level = [-0.691 + 10 * math.log10(b) if b > 0 else -math.inf for b in blocks]
+    kept = [b for b, l in zip(blocks, level) if l > -70]
+    gate = -0.691 + 10 * math.log10(sum(kept) / len(kept)) - 10
+    kept = [b for b, l in zip(blocks, level) if l > -70 and l > gate]
+    return -0.691 + 10 * math.log10(sum(kept) / len(kept))
+
+
+def test_silence_is_gated_out():
+    tone = sine_powers(-20, 10)
+    padded = np.concatenate((np.zeros(50), tone, np.full(50, 1e-12)))
+    assert gated_loudness(padded) == pytest.approx(reference(padded), abs=1e-9)
+    # Only the blocks straddling the edges of the tone lower it a little
+    assert gated_loudness(padded) == pytest.approx(gated_loudness(tone), abs=0.2)
+
+
+def test_relative_gate_drops_passages_10_lu_below_the_level():
+    loud = sine_powers(-10, 10)
+    # 30 dB down: under the relative gate, so it barely pulls the result down (ungated,
+    # the mean power would be 3 dB lower)
+    quiet = np.concatenate((loud, sine_powers(-40, 10)))
+    assert gated_loudness(quiet) == pytest.approx(reference(quiet), abs=1e-9)
+    assert gated_loudness(quiet) == pytest.approx(gated_loudness(loud), abs=0.1)
+    # 6 dB down is above the gate: it counts, and the result lands between the two
+    softer = np.concatenate((loud, sine_powers(-16, 10)))
+    expected = -0.691 + 10 * math.log10(softer.mean())
+    assert gated_loudness(softer) == pytest.approx(reference(softer), abs=1e-9)
+    assert gated_loudness(softer) == pytest.approx(expected, abs=0.05)
+
+
+def test_too_short_or_silent_has_no_loudness():
+    assert gated_loudness(sine_powers(-20, 0.3)) is None
+    assert gated_loudness(np.zeros(100)) is None
+
+
+@pytest.fixture
+def ffmpeg():
+    path = find_ffmpeg()
+    if not path:
+        pytest.skip("ffmpeg not installed")
+    return path
+
+
+def test_decoded_sine_measures_at_its_level(ffmpeg, tmp_path):
+    # A stereo 997 Hz sine at -20 dBFS is -20 LUFS: the K-weighting gain at 997 Hz
+    # cancels BS.1770's -0.691 offset
+    path = tmp_path / "sine.wav"
+    subprocess.run([ffmpeg, '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i',
+                    f"sine=frequency=997:sample_rate={RATE}:duration=10",
+                    '-af', 'volume=-1.94dB,pan=stereo|c0=c0|c1=c0', str(path)], check=True)
+    lufs, peak = analyze(ffmpeg, path)
+    assert lufs == pytest.approx(-20, abs=0.2)
+    assert 20 * math.log10(peak) == pytest.approx(-20, abs=0.1)
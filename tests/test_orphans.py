@@ -0,0 +1,52 @@
+import os
+import time
+
+import pytest
+
+import yt_engine
+
+DAY = 24 * 3600
+
+
+def touch(path, age):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'data')
+    then = time.time() - age
+    os.utime(path, (then, then))
+    return path
+
+
+@pytest.fixture
+def files(engine):
+    """Work files and finished audio from a previous session, in staging and in a shard"""
+    staging, shard = engine.staging_dir, engine.output_dir / "3f"
+    return {
+        'part': touch(staging / "A [aaaaaaaaaaa].webm.part", 60),
+        'fragment': touch(staging / "B [bbbbbbbbbbb].webm.part-Frag3", 60),
+        'segments': touch(staging / "C [ccccccccccc].webm.seg.part", 60),
+        'state': touch(staging / "C [ccccccccccc].webm.seg.part.json", 60),
+        'encode': touch(staging / "D [ddddddddddd].temp.mp3", 60),
+        'old': touch(staging / "E [eeeeeeeeeee].webm.part", yt_engine.ORPHAN_MAX_AGE + DAY),
+        'staged': touch(staging / "F [fffffffffff].mp3", 60),
+        'publish': touch(shard / ".G [ggggggggggg].mp3.publish.part", 60),
+        'audio': touch(shard / "H.part 2 [hhhhhhhhhhh].mp3", 60),
+    }
+
+
+def left(files):
+    return {name for name, path in files.items() if path.exists()}
+
+
+def test_nothing_to_resume_removes_every_work_file(engine, files):
+    engine.collect_orphans(time.time(), resuming=False)
+    assert left(files) == {'staged', 'audio'}
+
+
+def test_resuming_keeps_work_files_younger_than_the_limit(engine, files):
+    engine.collect_orphans(time.time(), resuming=True)
+    assert left(files) == set(files) - {'old'}
+
+
+def test_files_written_after_startup_are_kept(engine, files):
+    engine.collect_orphans(time.time() - 3600, resuming=False)
+    assert left(files) == set(files) - {'old'}
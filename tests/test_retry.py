@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from yt_retry import (CircuitBreaker, TokenBucket, backoff, classify, TRANSIENT, THROTTLED,
+                      UNAVAILABLE, EXTRACTOR, UNKNOWN)
+
+
+@pytest.mark.parametrize('error, kind', [
+    ("HTTP Error 429: Too Many Requests", THROTTLED),
+    ("Sign in to confirm you're not a bot", THROTTLED),
+    ("[youtube] abc: Video unavailable", UNAVAILABLE),
+    ("Private video. Sign in if you've been granted access", UNAVAILABLE),
+    ("Join this channel to get access to members-only content", UNAVAILABLE),
+    ("[youtube] abc: nsig extraction failed: Some formats may be missing", EXTRACTOR),
+    ("Unable to extract uploader id; please report this issue", EXTRACTOR),
+    ("<urlopen error [Errno 111] Connection refused>", TRANSIENT),
+    ("HTTP Error 503: Service Unavailable", TRANSIENT),
+    ("The read operation timed out", TRANSIENT),
+    ("Stalled (no progress for 60s)", TRANSIENT),
+    ("something nobody has seen before", UNKNOWN),
+    ("", UNKNOWN),
+    (None, UNKNOWN),
+])
+def test_classify(error, kind):
+    assert classify(error) == kind
+
+
+def test_throttling_wins_over_other_matches():
+    # A 403 while downloading is throttling, even though "unable to download" is transient
+    assert classify("Unable to download webpage: HTTP Error 403: Forbidden") == THROTTLED
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    for attempt in range(8):
+        delay = min(300, 5 * 2 ** attempt)
+        samples = [backoff(attempt) for _ in range(50)]
+        assert all(delay / 2 <= s <= delay for s in samples)
+        assert len(set(samples)) > 1
+
+
+def test_breaker_lets_one_probe_through_after_the_cooldown():
+    breaker = CircuitBreaker(cooldown=0.2, log=lambda msg: None)
+    assert breaker.wait(lambda: True)
+    breaker.trip()
+    generation = breaker.generation
+    began = time.monotonic()
+    assert breaker.wait(lambda: True)
+    assert time.monotonic() - began >= 0.2
+
+    # While the probe runs everyone else waits
+    others = []
+    waiter = threading.Thread(target=lambda: others.append(breaker.wait(lambda: True)))
+    waiter.start()
+    time.sleep(0.2)
+    assert others == []
+    breaker.report(None, generation)
+    waiter.join(2)
+    assert others == [True]
+    assert not breaker.paused
+
+
+def test_throttled_probe_doubles_the_cooldown():
+    breaker = CircuitBreaker(cooldown=0.1, max_cooldown=0.3, log=lambda msg: None)
+    breaker.trip()
+    assert breaker.wait(lambda: True)
+    breaker.report(THROTTLED, breaker.generation)
+    assert breaker.trips == 2
+    assert breaker.open_until - time.monotonic() == pytest.approx(0.2, abs=0.05)
+    assert breaker.wait(lambda: True)
+    breaker.report(THROTTLED, breaker.generation)
+    assert breaker.open_until - time.monotonic() == pytest.approx(0.3, abs=0.05)
+
+
+def test_success_from_before_the_trip_proves_nothing():
+    breaker = CircuitBreaker(cooldown=10, log=lambda msg: None)
+    old = breaker.generation
+    breaker.trip()
+    breaker.report(None, old)
+    assert breaker.paused
+
+
+def test_breaker_wait_gives_up_when_stopped():
+    breaker = CircuitBreaker(cooldown=10, log=lambda msg: None)
+    breaker.trip()
+    began = time.monotonic()
+    assert breaker.wait(lambda: False) is False
+    assert time.monotonic() - began < 0.1
+
+
+def test_token_bucket_allows_a_burst_then_paces_starts():
+    bucket = TokenBucket(rate=20, burst=3)
+    began = time.monotonic()
+    for _ in range(3):
+        assert bucket.take()
+    assert time.monotonic() - began < 0.05
+    for _ in range(4):
+        assert bucket.take()
+    # Four more tokens at 20 per second
+    assert time.monotonic() - began == pytest.approx(0.2, abs=0.08)
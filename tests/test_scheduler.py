@@ -0,0 +1,137 @@
+import threading
+import time
+
+from yt_scheduler import (AgingQueue, AIMDController, Scheduler, AGING, BULK, INTERACTIVE,
+                          NORMAL, SKIPPED)
+
+
+def entry(priority, enqueued, seq, item):
+    return (priority * AGING + enqueued, seq, item)
+
+
+def drain(queue):
+    items = []
+    while queue.qsize():
+        items.append(queue.get())
+        queue.task_done()
+    return items
+
+
+def test_aging_queue_runs_urgent_classes_first():
+    queue = AgingQueue()
+    queue.put(entry(BULK, 0, 0, 'bulk'))
+    queue.put(entry(NORMAL, 1, 1, 'normal'))
+    queue.put(entry(INTERACTIVE, 2, 2, 'interactive'))
+    assert drain(queue) == ['interactive', 'normal', 'bulk']
+
+
+def test_aging_queue_old_bulk_job_overtakes_new_interactive_one():
+    queue = AgingQueue()
+    queue.put(entry(BULK, 0, 0, 'old bulk'))
+    queue.put(entry(INTERACTIVE, 2 * AGING + 1, 1, 'new interactive'))
+    assert drain(queue) == ['old bulk', 'new interactive']
+
+
+def test_aging_queue_same_class_is_fifo():
+    queue = AgingQueue()
+    for seq, name in enumerate('abc'):
+        queue.put(entry(NORMAL, 5, seq, name))
+    assert drain(queue) == ['a', 'b', 'c']
+
+
+def test_aging_queue_remove_settles_join():
+    queue = AgingQueue()
+    for seq, name in enumerate(['keep', 'drop1', 'drop2']):
+        queue.put(entry(NORMAL, seq, seq, name))
+    assert sorted(queue.remove(lambda item: item.startswith('drop'))) == ['drop1', 'drop2']
+    assert queue.qsize() == 1
+    assert drain(queue) == ['keep']
+    joined = threading.Event()
+    threading.Thread(target=lambda: (queue.join(), joined.set()), daemon=True).start()
+    assert joined.wait(1)
+
+
+def test_aimd_halves_on_errors_and_respects_minimum():
+    controller = AIMDController(initial=4, minimum=1, maximum=8)
+    for _ in range(controller.window):
+        controller.record(False)
+    assert controller.limit == 2
+    for _ in range(10):
+        for _ in range(controller.window):
+            controller.record(False)
+    assert controller.limit == 1
+
+
+def test_aimd_grows_by_one_with_backlog_up_to_maximum():
+    controller = AIMDController(initial=2, minimum=1, maximum=3)
+    for _ in range(controller.window):
+        controller.record(True, backlog=True)
+    assert controller.limit == 3
+    for _ in range(controller.window):
+        controller.record(True, backlog=True)
+    assert controller.limit == 3
+
+
+def test_aimd_holds_without_backlog():
+    controller = AIMDController(initial=2, minimum=1, maximum=8)
+    for _ in range(controller.window):
+        controller.record(True, backlog=False)
+    assert controller.limit == 2
+
+
+def run_jobs(handler, count):
+    scheduler = Scheduler(handler, workers=4, max_workers=4, log=lambda msg: None)
+    scheduler.start()
+    for i in range(count):
+        scheduler.put(i)
+    assert scheduler.wait_idle(5)
+    scheduler.stop(5)
+    return scheduler
+
+
+def test_scheduler_skipped_jobs_do_not_lower_the_limit():
+    assert run_jobs(lambda item: SKIPPED, 100).limit == 4
+
+
+def test_scheduler_failed_jobs_lower_the_limit():
+    assert run_jobs(lambda item: None, 100).limit < 4
+
+
+def test_scheduler_discard_and_restart():
+    seen = []
+    scheduler = Scheduler(seen.append, workers=1, max_workers=1, log=lambda msg: None)
+    for i in range(5):
+        scheduler.put(i)
+    assert sorted(scheduler.discard(lambda item: item % 2)) == [1, 3]
+    scheduler.start()
+    assert scheduler.wait_idle(5)
+    assert scheduler.stop(5)
+    scheduler.start()
+    scheduler.put('again')
+    assert scheduler.wait_idle(5)
+    assert scheduler.stop(5)
+    assert 'again' in seen and 1 not in seen and 3 not in seen
+
+
+def test_scheduler_stop_times_out_on_a_busy_worker_and_restarts():
+    release = threading.Event()
+    done = []
+
+    def handler(item):
+        if item == 'slow':
+            release.wait(5)
+        done.append(item)
+
+    scheduler = Scheduler(handler, workers=1, max_workers=1, log=lambda msg: None)
+    scheduler.start()
+    scheduler.put('slow')
+    time.sleep(0.1)
+    started = time.monotonic()
+    assert scheduler.stop(0.2) is False
+    assert time.monotonic() - started < 1
+    scheduler.start()
+    scheduler.put('next')
+    release.set()
+    assert scheduler.wait_idle(5)
+    assert scheduler.stop(5)
+    assert done == ['slow', 'next']
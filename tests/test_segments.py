@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+import yt_segments
+from range_server import RangeServer, pattern
+from yt_segments import (SegmentedDownloader, SegmentError, RangesUnavailable, STATE_SUFFIX,
+                         TEMP_SUFFIX, stream_of)
+
+SIZE = 3 * 1024 * 1024 + 12345
+SEGMENT = 256 * 1024
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def make(**kwargs):
+        server = RangeServer(default_size=SIZE, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def stream(server):
+    return f"{server.url}/stream?size={SIZE}"
+
+
+def check(path):
+    assert path.read_bytes() == pattern(0, SIZE)
+    assert not path.with_name(path.name + TEMP_SUFFIX).exists()
+    assert not path.with_name(path.name + STATE_SUFFIX).exists()
+
+
+def test_parallel_ranges_reassemble_the_stream(server, tmp_path):
+    downloader = SegmentedDownloader(4, SEGMENT, min_size=0)
+    path = downloader.fetch(stream(server()), tmp_path / "a.webm")
+    downloader.close()
+    check(path)
+
+
+def test_dropped_connections_are_retried_per_range(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(yt_segments, 'RETRY_DELAY', 0.01)
+    monkeypatch.setattr(yt_segments, 'SEGMENT_RETRIES', 10)
+    srv = server(drop=0.3)
+    downloader = SegmentedDownloader(4, SEGMENT, min_size=0)
+    path = downloader.fetch(stream(srv), tmp_path / "a.webm")
+    downloader.close()
+    check(path)
+
+
+def test_cancelled_download_resumes_from_the_ranges_on_disk(server, tmp_path):
+    srv = server(rate=2 * 1024 * 1024)
+    path = tmp_path / "a.webm"
+    cancel = threading.Event()
+    progress = []
+
+    def on_progress(done, total, speed, eta):
+        progress.append(done)
+        if done >= total // 2:
+            cancel.set()
+
+    downloader = SegmentedDownloader(2, SEGMENT, min_size=0)
+    with pytest.raises(SegmentError):
+        downloader.fetch(stream(srv), path, on_progress=on_progress, cancel=cancel)
+    assert not path.exists()
+    assert path.with_name(path.name + STATE_SUFFIX).exists()
+
+    before = srv.requests
+    downloader.fetch(stream(srv), path)
+    downloader.close()
+    check(path)
+    segments = -(-SIZE // SEGMENT)
+    # The probe plus only the ranges that weren't finished
+    assert srv.requests - before < segments
+
+
+def test_server_without_ranges_is_refused_before_writing(server, tmp_path):
+    downloader = SegmentedDownloader(4, SEGMENT, min_size=0)
+    with pytest.raises(RangesUnavailable):
+        downloader.fetch(stream(server(ranges=False)), tmp_path / "a.webm")
+    downloader.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stale_state_starts_over(server, tmp_path):
+    path = tmp_path / "a.webm"
+    path.with_name(path.name + TEMP_SUFFIX).write_bytes(b'junk')
+    path.with_name(path.name + STATE_SUFFIX).write_text('{"total": 5, "segment": 1, "done": [0]}')
+    downloader = SegmentedDownloader(4, SEGMENT, min_size=0)
+    downloader.fetch(stream(server()), path)
+    downloader.close()
+    check(path)
+
+
+def test_range_from_the_wrong_offset_fails_the_download(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(yt_segments, 'RETRY_DELAY', 0.01)
+    downloader = SegmentedDownloader(4, SEGMENT, min_size=0)
+    with pytest.raises(SegmentError, match="wrong range"):
+        downloader.fetch(stream(server(skew=1)), tmp_path / "a.webm")
+    downloader.close()
+    assert not (tmp_path / "a.webm").exists()
+
+
+def test_streams_yt_dlp_fixes_up_are_left_to_it():
+    info = {'url': 'https://example.invalid/a', 'protocol': 'https', 'filesize': SIZE}
+    assert stream_of(dict(info, container='webm_dash'))
+    assert stream_of(dict(info, container='m4a_dash')) is None
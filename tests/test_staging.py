@@ -0,0 +1,76 @@
+import os
+import time
+
+import pytest
+
+import yt_engine
+from yt_engine import DownloadEngine
+from yt_history import DownloadHistory
+from yt_metadata import MetadataCache
+
+
+@pytest.fixture
+def other(engine, tmp_path):
+    """Make another instance writing to engine's output folder"""
+    made = []
+
+    def make(resume=False):
+        instance = DownloadEngine(output_dir=engine.output_dir, resume=resume,
+                                  history=DownloadHistory(tmp_path / f"history{len(made)}.db"),
+                                  metadata=MetadataCache(tmp_path / f"metadata{len(made)}.db"))
+        made.append(instance)
+        return instance
+
+    yield make
+    for instance in made:
+        instance.stop(timeout=5)
+        instance.transcoder.close(5)
+        instance.library.close()
+        instance.history.close()
+        instance.metadata.close()
+
+
+def touch(path, age=0):
+    path.write_bytes(b'partial')
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+    return path
+
+
+def test_each_instance_stages_in_its_own_folder(engine, other):
+    second = other()
+    assert engine.staging_dir != second.staging_dir
+    assert engine.staging_dir.parent == second.staging_dir.parent == engine.output_dir / ".staging"
+
+
+def test_orphans_of_a_running_instance_are_left_alone(engine, other):
+    engine.leases.renew()
+    fresh = touch(engine.staging_dir / "a [abc].webm.part", age=60)
+    stale = touch(engine.staging_dir / "b [abc].webm.part", age=yt_engine.ORPHAN_MAX_AGE + 60)
+    publish = touch(engine.output_dir / ".c.mp3.publish.part", age=60)
+    second = other()
+    second.collect_orphans(time.time(), resuming=False)
+    assert fresh.exists() and publish.exists()
+    assert not stale.exists()
+
+
+def test_own_orphans_are_collected(engine):
+    engine.leases.renew()
+    leftover = touch(engine.staging_dir / "a [abc].webm.part", age=60)
+    publish = touch(engine.output_dir / ".c.mp3.publish.part", age=60)
+    engine.collect_orphans(time.time(), resuming=False)
+    assert not leftover.exists() and not publish.exists()
+
+
+def test_stopped_instance_staging_is_taken_over(engine, other):
+    engine.leases.renew()
+    partial = touch(engine.staging_dir / "a [abc].webm.part")
+    folder = engine.staging_dir
+    engine.leases.close()
+    second = other(resume=True)
+    assert (second.staging_dir / partial.name).exists()
+    assert not folder.exists()
+    # Kept for the job that picks it up, though this instance had nothing to resume
+    time.sleep(0.2)
+    assert (second.staging_dir / partial.name).exists()
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from yt_engine import DownloadEngine
+from yt_history import DownloadHistory, QUEUED, DONE
+from yt_metadata import MetadataCache
+from yt_retry import TokenBucket
+from yt_scheduler import Scheduler
+
+
+def links(count):
+    return [(f"https://www.youtube.com/watch?v=stop{n:07d}", f"video:stop{n:07d}")
+            for n in range(count)]
+
+
+def record(engine, *names):
+    events = []
+    engine.subscribe(lambda event: events.append(event) if event['event'] in names else None)
+    return events
+
+
+def test_stop_interrupts_jobs_still_waiting_to_start(engine):
+    engine.scheduler = Scheduler(engine.download, workers=4, max_workers=4, log=engine.log)
+    # An empty start bucket holds every worker back before its download starts
+    engine.start_bucket = TokenBucket(rate=0.5, burst=1)
+    engine.start_bucket.tokens = 0
+    events = record(engine, 'started', 'done', 'interrupted')
+    engine.start(clipboard=False)
+    jobs = links(4)
+    engine.enqueue(jobs)
+    time.sleep(0.3)
+
+    began = time.monotonic()
+    assert engine.stop(timeout=2)
+    assert time.monotonic() - began < 1.5
+    time.sleep(1)
+    assert [event['event'] for event in events] == ['interrupted'] * 4
+    assert sorted(engine.history.unfinished()) == sorted((key, url) for url, key in jobs)
+    assert {engine.history.status(key) for url, key in jobs} == {QUEUED}
+
+
+def test_stopped_jobs_resume_on_the_next_start(engine):
+    engine.backend.cfg['rate'] = 256 * 1024
+    events = record(engine, 'started', 'interrupted', 'done')
+    engine.start(clipboard=False)
+    jobs = links(5)
+    engine.enqueue(jobs)
+    time.sleep(0.1)
+    assert engine.stop(timeout=2)
+    interrupted = [event['key'] for event in events if event['event'] == 'interrupted']
+    assert 1 <= len(interrupted) <= 2
+    assert sorted(engine.history.unfinished()) == sorted((key, url) for url, key in jobs)
+
+    events.clear()
+    engine.backend.cfg['rate'] = 0
+    engine.start(clipboard=False)
+    engine.wait_idle()
+    assert sorted(event['key'] for event in events if event['event'] == 'done') == \
+        sorted(key for url, key in jobs)
+    assert engine.history.unfinished() == []
+
+
+def test_next_session_resumes_the_journal_and_partial_downloads(engine, tmp_path):
+    engine.backend.cfg['rate'] = 256 * 1024
+    engine.start(clipboard=False)
+    jobs = links(3)
+    engine.enqueue(jobs)
+    time.sleep(0.1)
+    assert engine.stop(timeout=2)
+    partials = {p.name for p in engine.staging_dir.iterdir() if p.suffix == '.part'}
+    assert partials
+
+    later = DownloadEngine(output_dir=engine.output_dir, workers=2,
+                           history=DownloadHistory(tmp_path / "history.db"),
+                           metadata=MetadataCache(tmp_path / "metadata.db"))
+    try:
+        # The stopped session's .part files come along for yt-dlp --continue
+        assert partials <= {p.name for p in later.staging_dir.iterdir()}
+        later.backend = engine.backend
+        later.backend.cfg['rate'] = 0
+        later.transcoder.ffmpeg = None
+        events = record(later, 'done')
+        later.start(clipboard=False)
+        later.wait_idle()
+        assert sorted(event['key'] for event in events) == sorted(key for url, key in jobs)
+        assert later.history.unfinished() == []
+    finally:
+        later.stop(timeout=5)
+        later.transcoder.close(5)
+        later.library.close()
+        later.history.close()
+        later.metadata.close()
+
+
+def test_token_bucket_take_gives_up_when_stopped():
+    bucket = TokenBucket(rate=0.1, burst=1)
+    assert bucket.take(lambda: True)
+    began = time.monotonic()
+    assert bucket.take(lambda: False) is False
+    assert time.monotonic() - began < 0.1
+    # Nothing was consumed by the refused take
+    assert 0 <= bucket.tokens < 1
+
+
+def test_transcode_interrupted_by_stop_resumes_from_the_staged_download(engine):
+    transcode = engine.transcoder.transcode
+    transcoding = threading.Event()
+
+    def stuck(src):
+        # Runs until stop() kills it
+        transcoding.set()
+        while src not in engine.transcoder._killed:
+            time.sleep(0.01)
+        raise RuntimeError("Cancelled")
+
+    engine.transcoder.transcode = stuck
+    events = record(engine, 'interrupted', 'done')
+    engine.start(clipboard=False)
+    [(url, key)] = links(1)
+    engine.enqueue([(url, key)])
+    assert transcoding.wait(5)
+    assert engine.stop(timeout=0.5)
+    assert [event['event'] for event in events] == ['interrupted']
+    assert engine.history.status(key) == QUEUED
+    [staged] = [p for p in engine.staging_dir.iterdir() if p.suffix == '.webm']
+    # Dated back, to tell the kept download from a new one
+    os.utime(staged, (1000000000, 1000000000))
+
+    engine.transcoder.transcode = transcode
+    engine.start(clipboard=False)
+    engine.wait_idle()
+    assert events[-1]['event'] == 'done'
+    assert engine.history.status(key) == DONE
+    assert Path(events[-1]['path']).stat().st_mtime == 1000000000
@@ -0,0 +1,41 @@
+import pytest
+
+from yt_urls import canonical_key, extract_urls, key_url
+
+VID = 'dQw4w9WgXcQ'
+
+
+@pytest.mark.parametrize('url', [
+    f"https://www.youtube.com/watch?v={VID}",
+    f"https://WWW.YouTube.COM/watch?v={VID}",
+    f"https://YOUTU.BE/{VID}",
+    f"https://m.youtube.com/watch?feature=share&v={VID}",
+    f"https://www.youtube.com/watch?feature=share&amp;v={VID}&amp;t=5",
+    f"https://www.youtube.com/shorts/{VID}?feature=share",
+    f"https://www.youtube-nocookie.com/embed/{VID}",
+])
+def test_video_forms_share_one_key(url):
+    assert canonical_key(url) == f'video:{VID}'
+
+
+def test_playlist_after_escaped_separator():
+    assert canonical_key("https://www.youtube.com/playlist?si=x&amp;list=PLabc_-1") == \
+        'playlist:PLabc_-1'
+
+
+@pytest.mark.parametrize('url', [
+    f"https://notyoutube.com/watch?v={VID}",
+    f"https://www.youtube.com/watch?v={VID}x",
+    f"https://www.youtube.com/watch?xv={VID}",
+    f"https://youtu.be/{VID[:10]}",
+])
+def test_lookalikes_are_ignored(url):
+    assert canonical_key(url) is None
+
+
+def test_pasted_html_is_deduplicated_in_order():
+    html = (f'<a href="https://www.youtube.com/watch?feature=share&amp;v={VID}">x</a> '
+            f'<a href="https://youtu.be/{VID}">y</a> '
+            '<a href="https://www.youtube.com/watch?v=aaaaaaaaaaa">z</a>')
+    assert extract_urls(html) == [(key_url(f'video:{VID}'), f'video:{VID}'),
+                                  (key_url('video:aaaaaaaaaaa'), 'video:aaaaaaaaaaa')]
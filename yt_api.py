@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""Localhost HTTP API over the download engine (asyncio, one thread for every client)
+
+    POST   /jobs                  {"url": ...}, {"urls": [...]} or plain text containing links
+    GET    /jobs                  pending job IDs and live progress
+    GET    /jobs/<id>             one job: history record, progress, attempts
+    DELETE /jobs/<id>             cancel a queued or running job
+    GET    /events                progress as Server-Sent Events (?job=<id>, ?log=1)
+    GET    /events/poll           long-poll alternative (?after=<seq>&wait=<s>)
+    GET    /stats, /metrics       metrics snapshot as JSON / Prometheus text
+
+Job IDs are the canonical keys the engine dedups on (video:<id>, playlist:<id>); a bare
+11-character video ID or a URL works too. Submissions go through engine.enqueue exactly
+like clipboard links: a single link is queued as interactive, a bulk submission as bulk.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from yt_history import QUEUED
+from yt_scheduler import INTERACTIVE, NORMAL, BULK
+from yt_urls import canonical_key, iter_unique_urls
+
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+
+# Requests are refused above this body size (a 100k-link list is a few MB)
+MAX_BODY = 16 * 1024 * 1024
+# A client gets this long to send its request line and headers
+HEADER_TIMEOUT = 10
+
+# Recent events kept for /events/poll and for SSE clients reconnecting with Last-Event-ID
+EVENT_BUFFER = 2000
+# SSE comment sent on idle streams so proxies and clients don't time out
+KEEPALIVE = 15
+# Longest a long-poll request may wait
+MAX_WAIT = 60
+
+# Browsers send an Origin header; only the API's own pages and browser extensions may
+# call it, so an arbitrary website can't queue downloads through the user's browser
+ALLOWED_ORIGINS = ('chrome-extension://', 'moz-extension://', 'safari-web-extension://')
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+PRIORITIES = {'interactive': INTERACTIVE, 'normal': NORMAL, 'bulk': BULK}
+
+REASONS = {200: "OK", 202: "Accepted", 204: "No Content", 400: "Bad Request",
+           403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def job_key(job_id):
+    """Canonical key for a job ID from a URL path (key, bare video ID or URL)"""
+    job_id = unquote(job_id)
+    if job_id.startswith(("video:", "playlist:")):
+        return job_id
+    if len(job_id) == 11:
+        return f"video:{job_id}"
+    return canonical_key(job_id)
+
+
+class ApiServer:
+    """Serve the API on host:port from a private asyncio loop in one background thread
+
+    Engine events arrive on worker threads and are handed to the loop with
+    call_soon_threadsafe, numbered, and kept in a ring buffer that SSE streams and
+    long-polls read from.
+    """
+
+    def __init__(self, engine, host=API_HOST, port=API_PORT, log=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.log = log or engine.log
+        self.loop = None
+        self.events = deque(maxlen=EVENT_BUFFER)
+        self.seq = 0
+        self.ready = threading.Event()
+        self._thread = None
+        self._stopping = None
+        self._wakeup = None
+        self._clients = set()
+        engine.subscribe(self.on_event)
+
+    # ----- lifecycle (any thread) -----
+
+    def start(self):
+        """Start serving; returns True once listening, False if the port couldn't be bound"""
+        if self._thread and self._thread.is_alive():
+            return True
+        self.ready.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="http-api")
+        self._thread.start()
+        self.ready.wait(5)
+        return bool(self.loop and self.loop.is_running() and self._thread.is_alive())
+
+    def stop(self):
+        loop = self.loop
+        if loop and loop.is_running():
+            try:
+                loop.call_soon_threadsafe(self._shutdown)
+            except RuntimeError:
+                pass
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+    def on_event(self, event):
+        """Engine listener: forward the event to the loop"""
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._publish, event)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._serve())
+        finally:
+            self.loop.close()
+            self.loop = None
+            self.ready.set()
+
+    async def _serve(self):
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self.handle, self.host, self.port)
+        except OSError as e:
+            self.log(f"[!] HTTP API not started on {self.host}:{self.port}: {str(e)[:60]}")
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self.log(f"[+] HTTP API listening on http://{self.host}:{self.port}")
+        self.ready.set()
+        async with server:
+            await self._stopping.wait()
+        # Open streams see _stopping and end; give them a moment, then cut the rest off
+        if self._clients:
+            _, stuck = await asyncio.wait(self._clients, timeout=1)
+            for task in stuck:
+                task.cancel()
+
+    def _shutdown(self):
+        self._stopping.set()
+        self._notify()
+
+    # ----- event buffer (loop thread) -----
+
+    def _publish(self, event):
+        self.seq += 1
+        self.events.append((self.seq, event))
+        self._notify()
+
+    def _notify(self):
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    def _since(self, after, job=None, logs=False):
+        return [(seq, event) for seq, event in self.events
+                if seq > after and (logs or event['event'] != 'log')
+                and (job is None or event.get('key') == job)]
+
+    async def _wait(self, timeout):
+        """Wait for the next event (or shutdown); False on timeout"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    # ----- HTTP -----
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        # Error responses carry it too, so a browser client can read why it was refused
+        cors = None
+        try:
+            method, target, headers = await asyncio.wait_for(self.read_head(reader),
+                                                             HEADER_TIMEOUT)
+            cors = self.check_client(headers)
+            url = urlsplit(target)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if method == 'OPTIONS':
+                await self.respond(writer, 204, None, cors=cors, extra={
+                    'Access-Control-Allow-Methods': "GET, POST, DELETE",
+                    'Access-Control-Allow-Headers': "Content-Type, Last-Event-ID"})
+                return
+            body = await self.read_body(reader, headers)
+            await self.route(writer, method, url.path.rstrip('/') or '/', query, headers,
+                             body, cors)
+        except HttpError as e:
+            await self.respond(writer, e.status, {'error': str(e)}, cors=cors)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            pass
+        except ValueError as e:
+            # Bad Content-Length, query number or body encoding
+            await self.respond(writer, 400, {'error': str(e)[:200]}, cors=cors)
+        except Exception as e:
+            self.log(f"[!] HTTP API error: {str(e)[:60]}")
+            try:
+                await self.respond(writer, 500, {'error': str(e)}, cors=cors)
+            except ConnectionError:
+                pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    async def read_head(self, reader):
+        line = (await reader.readuntil(b'\n')).decode('latin-1').split()
+        if len(line) != 3 or not line[2].startswith('HTTP/'):
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        while True:
+            raw = await reader.readuntil(b'\n')
+            if raw in (b'\r\n', b'\n'):
+                break
+            name, sep, value = raw.decode('latin-1').partition(':')
+            if not sep or len(headers) > 100:
+                raise HttpError(400, "Malformed header")
+            headers[name.strip().lower()] = value.strip()
+        return line[0].upper(), line[1], headers
+
+    async def read_body(self, reader, headers):
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HttpError(411, "Chunked bodies are not supported, send Content-Length")
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY:
+            raise HttpError(413, f"Body larger than {MAX_BODY} bytes")
+        return await reader.readexactly(length) if length else b''
+
+    def check_client(self, headers):
+        """Refuse non-local Host names (DNS rebinding) and foreign Origins; returns the
+        Origin to allow in CORS headers, if any"""
+        host = headers.get('host', '')
+        name = host.rsplit(':', 1)[0] if not host.endswith(']') else host
+        if name.strip('[]') not in LOCAL_HOSTS:
+            raise HttpError(403, "Host not allowed")
+        origin = headers.get('origin')
+        if not origin:
+            return None
+        if origin.startswith(ALLOWED_ORIGINS) or origin == f"http://{host}":
+            return origin
+        raise HttpError(403, "Origin not allowed")
+
+    async def respond(self, writer, status, body, content_type='application/json', cors=None,
+                      extra=None):
+        if body is None:
+            data = b''
+        elif isinstance(body, (dict, list)):
+            data = json.dumps(body).encode()
+        else:
+            data = body.encode()
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                f"Content-Length: {len(data)}", "Connection: close",
+                "Cache-Control: no-store"]
+        if data:
+            head.append(f"Content-Type: {content_type}; charset=utf-8")
+        if cors:
+            head.append(f"Access-Control-Allow-Origin: {cors}")
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + data)
+        await writer.drain()
+
+    async def route(self, writer, method, path, query, headers, body, cors):
+        if path == '/jobs':
+            if method == 'POST':
+                status, result = await self.submit(headers, body)
+                return await self.respond(writer, status, result, cors=cors)
+            if method == 'GET':
+                return await self.respond(writer, 200, self.list_jobs(), cors=cors)
+            raise HttpError(405, "Use GET or POST")
+        if path.startswith('/jobs/'):
+            key = job_key(path[len('/jobs/'):])
+            if not key:
+                raise HttpError(404, "Not a job ID")
+            if method == 'GET':
+                status = await self.loop.run_in_executor(None, self.engine.job_status, key)
+                if status is None:
+                    raise HttpError(404, f"Unknown job {key}")
+                return await self.respond(writer, 200, status, cors=cors)
+            if method == 'DELETE':
+                # History and lease writes can wait on a busy (network) database
+                if not await self.loop.run_in_executor(None, self.engine.cancel, key):
+                    raise HttpError(409, f"{key} is not queued or running")
+                return await self.respond(writer, 202, {'id': key, 'cancelling': True},
+                                          cors=cors)
+            raise HttpError(405, "Use GET or DELETE")
+        if method != 'GET':
+            raise HttpError(405, "Use GET")
+        if path == '/events':
+            return await self.stream(writer, query, headers, cors)
+        if path == '/events/poll':
+            return await self.poll(writer, query, cors)
+        if path == '/stats':
+            return await self.respond(writer, 200, self.engine.metrics.snapshot(), cors=cors)
+        if path == '/metrics':
+            return await self.respond(writer, 200, self.engine.metrics.prometheus(),
+                                      content_type='text/plain; version=0.0.4', cors=cors)
+        raise HttpError(404, f"No such endpoint: {path}")
+
+    # ----- endpoints -----
+
+    async def submit(self, headers, body):
+        """Queue the links in a JSON or plain-text body; returns (status, response)"""
+        text = body.decode('utf-8')
+        priority = None
+        if 'json' in headers.get('content-type', ''):
+            try:
+                data = json.loads(text)
+            except ValueError:
+                raise HttpError(400, "Invalid JSON")
+            if isinstance(data, str):
+                data = {'url': data}
+            elif isinstance(data, list):
+                data = {'urls': data}
+            if not isinstance(data, dict):
+                raise HttpError(400, "Expected {\"url\": ...} or {\"urls\": [...]}")
+            lines = [data['url']] if data.get('url') else data.get('urls') or []
+            if not all(isinstance(line, str) for line in lines):
+                raise HttpError(400, "URLs must be strings")
+            priority = data.get('priority')
+            if priority is not None and priority not in PRIORITIES:
+                raise HttpError(400, f"priority must be one of {', '.join(PRIORITIES)}")
+        else:
+            lines = text.splitlines()
+        # Deduping and journaling thousands of links is blocking work: keep it off the loop
+        return await self.loop.run_in_executor(None, self._submit, lines, priority)
+
+    def _submit(self, lines, priority):
+        engine = self.engine
+        links = list(iter_unique_urls(lines))
+        if not links:
+            raise HttpError(400, "No YouTube links found")
+        if priority is None:
+            priority = 'interactive' if len(links) == 1 else 'bulk'
+        already = {key for url, key in links if key in engine.pending}
+        added = engine.enqueue(links, PRIORITIES[priority])
+        jobs = []
+        for url, key in links:
+            pending = key in engine.pending
+            jobs.append({'id': key, 'url': url,
+                         'status': QUEUED if pending else engine.history.status(key),
+                         'new': pending and key not in already})
+        return 202, {'queued': added, 'submitted': len(links), 'priority': priority,
+                     'jobs': jobs}
+
+    def list_jobs(self):
+        engine = self.engine
+        return {'pending': sorted(engine.pending),
+                'active': {key: {k: v for k, v in event.items() if k != 'emitted'}
+                           for key, event in list(engine.job_progress.items())},
+                'queued': engine.qsize()}
+
+    async def stream(self, writer, query, headers, cors):
+        """Server-Sent Events until the client goes away or the server stops"""
+        job = job_key(query['job']) if query.get('job') else None
+        logs = query.get('log') == '1'
+        after = int(headers.get('last-event-id') or query.get('after') or self.seq)
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream; charset=utf-8",
+                "Cache-Control: no-store", "Connection: close"]
+        if cors:
+            head.append(f"Access-Control-Allow-Origin: {cors}")
+        writer.write(("\r\n".join(head) + "\r\n\r\nretry: 2000\n\n").encode())
+        await writer.drain()
+        while not self._stopping.is_set():
+            events = self._since(after, job, logs)
+            if events:
+                after = events[-1][0]
+                writer.write("".join(f"id: {seq}\nevent: {event['event']}\n"
+                                     f"data: {json.dumps(event)}\n\n"
+                                     for seq, event in events).encode())
+                await writer.drain()
+            elif not await self._wait(KEEPALIVE):
+                writer.write(b": keepalive\n\n")
+                await writer.drain()
+
+    async def poll(self, writer, query, cors):
+        """Events after ?after=<seq>, waiting up to ?wait= seconds for the first one"""
+        job = job_key(query['job']) if query.get('job') else None
+        logs = query.get('log') == '1'
+        after = int(query.get('after', self.seq))
+        deadline = self.loop.time() + min(float(query.get('wait', 30)), MAX_WAIT)
+        events = self._since(after, job, logs)
+        while not events and not self._stopping.is_set():
+            remaining = deadline - self.loop.time()
+            if remaining <= 0 or not await self._wait(remaining):
+                break
+            events = self._since(after, job, logs)
+        await self.respond(writer, 200, {
+            'next': events[-1][0] if events else self.seq,
+            'events': [dict(event, seq=seq) for seq, event in events]}, cors=cors)
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""Download backends: in-process yt-dlp API with a subprocess fallback
+
+Backends only fetch the native bestaudio stream (opus/m4a); conversion happens in the
+separate transcode stage (yt_transcode.py).
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from yt_progress import (ProgressParser, PROGRESS_TEMPLATE, FILEPATH_TEMPLATE,
+                         STALL_TIMEOUT, DOWNLOADING)
+from yt_retry import classify, TRANSIENT, UNKNOWN
+from yt_segments import (SegmentedDownloader, SegmentError, RangesUnavailable, stream_of,
+                         CONNECTIONS)
+from yt_tools import has_module
+from yt_urls import VIDEO_ID
+
+# The video ID in the name lets the output folder be indexed without a history
+OUTPUT_TEMPLATE = '%(title)s [%(id)s].%(ext)s'
+LIST_TIMEOUT = 600
+SOCKET_TIMEOUT = 30
+
+# Asking the executable for a file name only renders the output template
+NAME_TIMEOUT = 60
+
+# Only the tail of stderr is kept for the error message
+STDERR_LINES = 50
+
+# Children get their own process group so the whole tree (yt-dlp + ffmpeg) can be killed
+if os.name == 'nt':
+    POPEN_GROUP = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    POPEN_GROUP = {'start_new_session': True}
+
+
+def kill_tree(proc):
+    """Kill a child started with POPEN_GROUP and everything it spawned"""
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        proc.kill()
+
+
+class DownloadResult:
+    """Outcome of one job: ok flag, error message and kind, and the final file if known"""
+
+    def __init__(self, ok, error=None, filepath=None, downloaded=None, info=None, kind=None):
+        self.ok = ok
+        self.error = error
+        self.kind = kind
+        self.filepath = filepath
+        self.downloaded = downloaded
+        self.info = info
+
+    @property
+    def size(self):
+        try:
+            return os.path.getsize(self.filepath) if self.filepath else None
+        except OSError:
+            return None
+
+
+def wants_segments(segments, info):
+    """True if info's stream is plain HTTP and big enough for the segmented downloader"""
+    stream = stream_of(info) if segments else None
+    return bool(stream) and stream[2] >= segments.min_size
+
+
+def download_segmented(segments, info, path, parser, rate_limit=None, cancel=None):
+    """Fetch info's stream to path (yt-dlp's own name for it) with the segmented
+    downloader if it is big enough
+
+    Returns a DownloadResult, or None to leave the download to yt-dlp (small stream,
+    fragmented format, or a server/URL that won't serve ranges). A file already at path
+    is complete (segments are written under a temp name) and is returned as it is.
+    """
+    if not wants_segments(segments, info):
+        return None
+    if os.path.exists(path):
+        # Downloaded before a stop interrupted its transcode
+        return DownloadResult(True, filepath=str(path), downloaded=0)
+    url, headers, size = stream_of(info)
+    try:
+        path = segments.fetch(url, path, headers,
+                              lambda *progress: parser.update(DOWNLOADING, *progress),
+                              rate_limit, cancel)
+    except RangesUnavailable:
+        return None
+    except SegmentError as e:
+        return DownloadResult(False, f"Segmented download failed: {e}",
+                              downloaded=parser.downloaded, kind=TRANSIENT)
+    return DownloadResult(True, filepath=str(path), downloaded=parser.downloaded)
+
+
+class SubprocessBackend:
+    """Run the yt-dlp executable once per job (used by the frozen EXE)"""
+    name = "subprocess"
+
+    def __init__(self, yt_dlp_path):
+        self.yt_dlp_path = yt_dlp_path
+        self.segments = SegmentedDownloader() if CONNECTIONS else None
+
+    def build_cmd(self, url, output_dir, info_file=None, rate_limit=None):
+        source = ['--load-info-json', info_file] if info_file else [url]
+        limit = ['--limit-rate', str(int(rate_limit))] if rate_limit else []
+        return [
+            self.yt_dlp_path,
+            '-f', 'bestaudio',
+            '--continue',
+            '--no-playlist',
+            '--no-warnings',
+            '--no-quiet',
+            '--progress',
+            '--newline',
+            '--progress-template', PROGRESS_TEMPLATE,
+            '--print', FILEPATH_TEMPLATE,
+            *limit,
+            '-o', str(output_dir / OUTPUT_TEMPLATE),
+            *source
+        ]
+
+    def extract(self, url):
+        """Extract video info without downloading; returns a JSON-safe dict"""
+        cmd = [self.yt_dlp_path, '-J', '-f', 'bestaudio', '--no-playlist', '--no-warnings', url]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=LIST_TIMEOUT)
+        if result.returncode != 0:
+            raise RuntimeError(self._error(result.stderr.splitlines()))
+        return json.loads(result.stdout)
+
+    def expected_path(self, info, output_dir):
+        """Final download path for info (unknown without the in-process templater)"""
+        return None
+
+    def download(self, url, output_dir, on_progress=None, info=None, rate_limit=None,
+                 cancel=None):
+        """Download one URL, streaming progress events to on_progress; returns a DownloadResult
+
+        With cached info the extraction step is skipped (--load-info-json); yt-dlp falls
+        back to the URL by itself if the cached stream URLs have expired. rate_limit
+        (bytes/s) is passed as --limit-rate, as the child can't be slowed down later.
+        Setting the cancel event kills the child's process tree within a second, even
+        while it is extracting or stuck without output. A large stream in the cached
+        info is fetched by the segmented downloader instead of the child, under the
+        name the child would have used.
+        """
+        info_file = None
+        if info:
+            with tempfile.NamedTemporaryFile('w', suffix='.info.json', delete=False,
+                                             encoding='utf-8') as f:
+                json.dump(info, f)
+                info_file = f.name
+        try:
+            if info_file and wants_segments(self.segments, info):
+                path = self._filename(info_file, output_dir)
+                result = path and download_segmented(self.segments, info, path,
+                                                     ProgressParser(on_progress), rate_limit,
+                                                     cancel)
+                if result:
+                    return result
+            return self._run(self.build_cmd(url, output_dir, info_file, rate_limit), on_progress,
+                             cancel)
+        finally:
+            if info_file:
+                os.unlink(info_file)
+
+    def _filename(self, info_file, output_dir):
+        """The path the executable would download info_file's stream to, so segmented
+        and child downloads share names (and resumable files); None if it can't say"""
+        cmd = [self.yt_dlp_path, '--load-info-json', info_file, '-f', 'bestaudio',
+               '--no-warnings', '-o', str(output_dir / OUTPUT_TEMPLATE), '--print', 'filename']
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, errors='replace',
+                                    stdin=subprocess.DEVNULL, timeout=NAME_TIMEOUT)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        lines = result.stdout.strip().splitlines()
+        return lines[-1] if result.returncode == 0 and lines else None
+
+    def _run(self, cmd, on_progress, cancel=None):
+        parser = ProgressParser(on_progress)
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                    text=True, errors='replace', bufsize=1, **POPEN_GROUP)
+        except OSError as e:
+            return DownloadResult(False, f"Error: {str(e)[:70]}", kind=UNKNOWN)
+
+        errors = deque(maxlen=STDERR_LINES)
+        stderr_thread = threading.Thread(target=errors.extend, args=(proc.stderr,), daemon=True)
+        stderr_thread.start()
+        stalled = threading.Event()
+        watchdog = threading.Thread(target=self._watch, args=(proc, parser, stalled, cancel),
+                                    daemon=True)
+        watchdog.start()
+
+        try:
+            for line in proc.stdout:
+                parser.feed(line)
+        except BaseException:
+            # on_progress aborted the job (cancelled): don't leave the child running
+            kill_tree(proc)
+            proc.wait()
+            raise
+        proc.wait()
+        stderr_thread.join()
+
+        if stalled.is_set():
+            return DownloadResult(False, f"Stalled (no progress for {STALL_TIMEOUT}s)",
+                                  downloaded=parser.downloaded, kind=TRANSIENT)
+        if proc.returncode == 0:
+            return DownloadResult(True, filepath=parser.filepath, downloaded=parser.downloaded)
+        return DownloadResult(False, self._error(errors), downloaded=parser.downloaded,
+                              kind=classify("\n".join(errors)))
+
+    def _watch(self, proc, parser, stalled, cancel=None):
+        """Kill the child once it stops making progress or the job is cancelled"""
+        while proc.poll() is None:
+            if parser.stalled():
+                stalled.set()
+                kill_tree(proc)
+                return
+            if cancel is None:
+                time.sleep(1)
+            elif cancel.wait(1):
+                kill_tree(proc)
+                return
+
+    def _error(self, errors):
+        """The ERROR: line (else the first line) of yt-dlp's stderr"""
+        for line in errors:
+            if line.startswith('ERROR:'):
+                return line[len('ERROR:'):].strip()
+        return errors[0].strip() if errors else "Unknown error"
+
+    def list_playlist(self, url):
+        """Return the video IDs of a playlist in order, without per-item metadata"""
+        cmd = [self.yt_dlp_path, '--flat-playlist', '--no-warnings', '--print', 'id', url]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=LIST_TIMEOUT)
+        if result.returncode != 0:
+            raise RuntimeError(self._error(result.stderr.splitlines()))
+        return [line for line in result.stdout.split('\n') if VIDEO_ID.fullmatch(line)]
+
+    def close(self):
+        """Close the segmented downloader's idle connections"""
+        if self.segments:
+            self.segments.close()
+
+
+class InProcessBackend:
+    """Run yt-dlp's YoutubeDL API in-process, one long-lived instance per worker thread
+
+    Reusing the instance keeps cookies, HTTP connection pools and the player/signature
+    cache warm between jobs instead of paying interpreter + extractor startup per URL.
+    """
+    name = "in-process"
+
+    def __init__(self):
+        # yt_dlp takes a few hundred ms to import: done on the first job, not at startup
+        self._yt_dlp = None
+        self.segments = SegmentedDownloader() if CONNECTIONS else None
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+
+    def build_opts(self, output_dir):
+        return {
+            'format': 'bestaudio',
+            'continuedl': True,
+            'noplaylist': True,
+            'no_warnings': True,
+            'quiet': True,
+            'noprogress': True,
+            'socket_timeout': SOCKET_TIMEOUT,
+            'progress_hooks': [self._progress_hook],
+            'postprocessor_hooks': [self._postprocessor_hook],
+            'outtmpl': str(output_dir / OUTPUT_TEMPLATE),
+        }
+
+    def build_flat_opts(self):
+        return {
+            'extract_flat': 'in_playlist',
+            'no_warnings': True,
+            'quiet': True,
+            'noprogress': True,
+        }
+
+    def _get_ydl(self, output_dir):
+        """Return this thread's YoutubeDL, rebuilding it if the output folder changed"""
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is not None and self._local.output_dir == output_dir:
+            return ydl
+        if ydl is not None:
+            self._discard(ydl)
+        ydl = self._new_ydl(self.build_opts(output_dir))
+        self._local.ydl = ydl
+        self._local.output_dir = output_dir
+        return ydl
+
+    def _get_extract_ydl(self):
+        """Return this thread's YoutubeDL for metadata-only extraction"""
+        ydl = getattr(self._local, 'extract_ydl', None)
+        if ydl is None:
+            opts = self.build_opts(Path('.'))
+            ydl = self._local.extract_ydl = self._new_ydl(opts)
+        return ydl
+
+    def _get_flat_ydl(self):
+        """Return this thread's YoutubeDL for flat playlist listing"""
+        ydl = getattr(self._local, 'flat_ydl', None)
+        if ydl is None:
+            ydl = self._local.flat_ydl = self._new_ydl(self.build_flat_opts())
+        return ydl
+
+    def _new_ydl(self, opts):
+        if self._yt_dlp is None:
+            import yt_dlp
+            self._yt_dlp = yt_dlp
+        ydl = self._yt_dlp.YoutubeDL(opts)
+        with self._lock:
+            self._instances.append(ydl)
+        return ydl
+
+    def _progress_hook(self, d):
+        parser = getattr(self._local, 'parser', None)
+        if parser:
+            parser.hook(d)
+
+    def _postprocessor_hook(self, d):
+        parser = getattr(self._local, 'parser', None)
+        if parser:
+            parser.postprocessor_hook(d)
+
+    def _discard(self, ydl):
+        with self._lock:
+            if ydl in self._instances:
+                self._instances.remove(ydl)
+        try:
+            ydl.close()
+        except Exception:
+            pass
+
+    def extract(self, url):
+        """Extract video info without downloading; returns a JSON-safe dict"""
+        ydl = self._get_extract_ydl()
+        try:
+            info = ydl.extract_info(url, download=False)
+        except self._yt_dlp.utils.DownloadError as e:
+            raise RuntimeError(str(e).replace('ERROR: ', '', 1).split('\n')[0])
+        return ydl.sanitize_info(info, remove_private_keys=True)
+
+    def expected_path(self, info, output_dir):
+        """Where yt-dlp will write info's audio, from the same output template"""
+        try:
+            return self._get_ydl(output_dir).prepare_filename(info)
+        except Exception:
+            return None
+
+    def download(self, url, output_dir, on_progress=None, info=None, rate_limit=None,
+                 cancel=None):
+        """Download one URL, sending progress events to on_progress; returns a DownloadResult
+
+        With cached info the extraction step is skipped; if its stream URLs turn out to
+        be stale the job falls back to a normal extraction from the URL. A stream of
+        SEGMENT_MIN_SIZE or more is fetched by the segmented downloader, which honours
+        rate_limit and cancel itself. Otherwise both are ignored: on_progress runs on the
+        download thread, so the caller throttles and cancels (by raising) there.
+        """
+        ydl = self._get_ydl(output_dir)
+        parser = self._local.parser = ProgressParser(on_progress)
+        fresh = info is None
+        try:
+            if self.segments:
+                if info is None:
+                    # Extract first to see whether the stream is worth segmenting
+                    info = ydl.sanitize_info(ydl.extract_info(url, download=False),
+                                             remove_private_keys=True)
+                result = download_segmented(self.segments, info,
+                                            ydl.prepare_filename(info), parser,
+                                            rate_limit, cancel)
+                if result:
+                    if result.ok and fresh:
+                        result.info = info
+                    return result
+            if info:
+                try:
+                    info = ydl.process_ie_result(dict(info), download=True)
+                except self._yt_dlp.utils.DownloadError:
+                    fresh = True
+                    info = ydl.extract_info(url, download=True)
+            else:
+                info = ydl.extract_info(url, download=True)
+        except self._yt_dlp.utils.DownloadError as e:
+            return DownloadResult(False, str(e).replace('ERROR: ', '', 1).split('\n')[0],
+                                  downloaded=parser.downloaded, kind=classify(str(e)))
+        except Exception as e:
+            # Unknown state: drop the instance so the next job starts clean
+            self._local.ydl = None
+            self._discard(ydl)
+            return DownloadResult(False, f"Error: {e}", kind=classify(str(e)))
+        finally:
+            self._local.parser = None
+
+        if not info:
+            return DownloadResult(False, "Unknown error")
+        downloads = info.get('requested_downloads') or [{}]
+        return DownloadResult(True, filepath=downloads[-1].get('filepath'),
+                              downloaded=parser.downloaded,
+                              info=ydl.sanitize_info(info, remove_private_keys=True) if fresh else None)
+
+    def list_playlist(self, url):
+        """Return the video IDs of a playlist in order, without per-item metadata"""
+        ydl = self._get_flat_ydl()
+        try:
+            info = ydl.extract_info(url, download=False)
+        except self._yt_dlp.utils.DownloadError as e:
+            raise RuntimeError(str(e).replace('ERROR: ', '', 1).split('\n')[0])
+        entries = (info or {}).get('entries') or []
+        return [entry['id'] for entry in entries
+                if entry and VIDEO_ID.fullmatch(entry.get('id') or '')]
+
+    def close(self):
+        """Close every per-worker YoutubeDL instance"""
+        if self.segments:
+            self.segments.close()
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+
+def make_backend(yt_dlp_path):
+    """Prefer the in-process engine; fall back to the executable when frozen or not importable"""
+    if not getattr(sys, 'frozen', False) and has_module('yt_dlp'):
+        return InProcessBackend()
+    if yt_dlp_path:
+        return SubprocessBackend(yt_dlp_path)
+    return None
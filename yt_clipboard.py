@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Clipboard watchers: X11 XFixes notifications with an adaptive polling fallback"""
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+from yt_common import STOP_CHECK
+
+# Adaptive polling: start fast, back off while the clipboard is idle
+POLL_MIN = 0.1
+POLL_MAX = 2.0
+POLL_BACKOFF = 1.5
+
+XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK = 1 << 0
+XFIXES_SELECTION_NOTIFY = 0
+
+
+def _paste():
+    import pyperclip
+    return pyperclip.paste()
+
+
+class _Watcher:
+    """Shared change detection: compare a hash of the contents, not the full string"""
+
+    def __init__(self, read=_paste, log=print):
+        self.read = read
+        self.log = log
+        self.last_hash = None
+
+    def _check(self, on_change):
+        """Read the clipboard and call on_change(text) if it differs; True if changed"""
+        try:
+            clip = self.read()
+        except Exception as e:
+            self.log(f"[!] Clipboard error: {str(e)[:60]}")
+            time.sleep(2)
+            return False
+
+        if not clip:
+            return False
+        clip_hash = hash(clip)
+        if clip_hash == self.last_hash:
+            return False
+        self.last_hash = clip_hash
+        on_change(clip)
+        return True
+
+
+class PollingWatcher(_Watcher):
+    """Poll the clipboard, backing off from POLL_MIN to POLL_MAX while nothing changes
+
+    On Windows the clipboard sequence number is checked first, so the (comparatively
+    expensive) read only happens when the contents actually changed.
+    """
+    name = "adaptive polling"
+
+    def __init__(self, read=_paste, log=print):
+        super().__init__(read, log)
+        self._seq = None
+        if sys.platform == 'win32':
+            try:
+                self._seq = ctypes.windll.user32.GetClipboardSequenceNumber
+            except Exception:
+                self._seq = None
+
+    def run(self, on_change, is_running):
+        interval = POLL_MIN
+        last_seq = None
+        while is_running():
+            changed = False
+            if self._seq is not None:
+                seq = self._seq()
+                if seq != last_seq:
+                    last_seq = seq
+                    changed = self._check(on_change)
+            else:
+                changed = self._check(on_change)
+
+            interval = POLL_MIN if changed else min(interval * POLL_BACKOFF, POLL_MAX)
+            time.sleep(interval)
+
+
+class _XEvent(ctypes.Union):
+    _fields_ = [('type', ctypes.c_int), ('pad', ctypes.c_long * 24)]
+
+
+class XFixesWatcher(_Watcher):
+    """Block on X11 XFixes selection-owner notifications for CLIPBOARD
+
+    The clipboard is only read when its owner changes, so an idle box does no
+    xclip/xsel forks and no wakeups beyond the STOP check.
+    """
+    name = "XFixes notifications"
+
+    def __init__(self, read=_paste, log=print, display_name=None):
+        super().__init__(read, log)
+        xlib_path = ctypes.util.find_library('X11')
+        xfixes_path = ctypes.util.find_library('Xfixes')
+        if not xlib_path or not xfixes_path:
+            raise OSError("libX11/libXfixes not found")
+        xlib = ctypes.CDLL(xlib_path)
+        xfixes = ctypes.CDLL(xfixes_path)
+
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XInternAtom.restype = ctypes.c_ulong
+        xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        xlib.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        xlib.XPending.argtypes = [ctypes.c_void_p]
+        xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XEvent)]
+        xlib.XFlush.argtypes = [ctypes.c_void_p]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xfixes.XFixesQueryExtension.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int),
+                                                ctypes.POINTER(ctypes.c_int)]
+        xfixes.XFixesSelectSelectionInput.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                                      ctypes.c_ulong, ctypes.c_ulong]
+
+        display_name = display_name or os.environ.get('DISPLAY')
+        if not display_name:
+            raise OSError("DISPLAY is not set")
+        display = xlib.XOpenDisplay(display_name.encode())
+        if not display:
+            raise OSError(f"Cannot open display {display_name}")
+
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        if not xfixes.XFixesQueryExtension(display, ctypes.byref(event_base),
+                                           ctypes.byref(error_base)):
+            xlib.XCloseDisplay(display)
+            raise OSError("XFixes extension not available")
+
+        self._xlib = xlib
+        self._display = display
+        self._notify_type = event_base.value + XFIXES_SELECTION_NOTIFY
+        clipboard = xlib.XInternAtom(display, b"CLIPBOARD", 0)
+        xfixes.XFixesSelectSelectionInput(display, xlib.XDefaultRootWindow(display), clipboard,
+                                          XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK)
+        xlib.XFlush(display)
+
+    def _drain(self):
+        """Consume queued X events; True if any was a selection-owner change"""
+        event = _XEvent()
+        changed = False
+        while self._xlib.XPending(self._display):
+            self._xlib.XNextEvent(self._display, ctypes.byref(event))
+            if event.type == self._notify_type:
+                changed = True
+        return changed
+
+    def run(self, on_change, is_running):
+        fd = self._xlib.XConnectionNumber(self._display)
+        # Pick up whatever is on the clipboard right now, like the polling loop would
+        self._check(on_change)
+        try:
+            while is_running():
+                if not self._drain():
+                    ready, _, _ = select.select([fd], [], [], STOP_CHECK)
+                    if not ready or not self._drain():
+                        continue
+                self._check(on_change)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._display:
+            self._xlib.XCloseDisplay(self._display)
+            self._display = None
+
+
+def make_clipboard_watcher(read=_paste, log=print):
+    """Use XFixes notifications where available, adaptive polling everywhere else"""
+    if sys.platform.startswith('linux') and os.environ.get('DISPLAY'):
+        try:
+            return XFixesWatcher(read, log)
+        except OSError:
+            pass
+    return PollingWatcher(read, log)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Pieces several modules share: the stop-check interval and lazily opened SQLite stores"""
+import sqlite3
+from pathlib import Path
+
+# Blocking waits in background threads are cut into steps this long; only bounds how fast
+# a stop is noticed
+STOP_CHECK = 0.5
+
+
+class Database:
+    """One SQLite connection per store, opened on first use: db() returns it
+
+    Connections are autocommit and shared by the store's threads, which serialise access
+    with their own lock. wal=True suits the per-user caches (readers never block the
+    writer, fsync only at checkpoints); wal=False keeps the rollback journal. timeout is
+    how long a write waits for another process's lock; setup(conn) runs once after the
+    schema, for migrations.
+    """
+
+    def __init__(self, path, schema, wal=True, timeout=5.0, setup=None):
+        self.path = Path(path)
+        self.schema = schema
+        self.wal = wal
+        self.timeout = timeout
+        self.setup = setup
+        self._conn = None
+
+    def __call__(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout,
+                                   check_same_thread=False, isolation_level=None)
+            if self.wal:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            else:
+                conn.execute("PRAGMA journal_mode=DELETE")
+            conn.executescript(self.schema)
+            if self.setup:
+                self.setup(conn)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,977 @@
+#!/usr/bin/env python3
+"""GUI-free download engine: queue, workers, dedup and downloads
+
+Front-ends (the Tk window, the CLI below) subscribe to engine events. Run headless with:
+
+    python -m yt_engine links.txt more.csv     # or pipe URLs on stdin
+    python -m yt_engine --daemon --clipboard   # keep running and watch the clipboard
+
+Events are reported on stdout as JSON lines. In daemon mode links can also be submitted
+over the localhost HTTP API (yt_api.py).
+"""
+import argparse
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from queue import Queue, Full, Empty
+
+from yt_api import ApiServer, API_PORT
+from yt_backends import make_backend, DownloadResult
+from yt_clipboard import make_clipboard_watcher
+from yt_history import DownloadHistory, QUEUED, DOWNLOADING, DONE, FAILED, CANCELLED
+from yt_layout import OutputLayout, parse_layout, safe_part, BY_HASH, STAGING_NAME
+from yt_leases import JobLeases
+from yt_loudness import OFF, TAG, APPLY
+from yt_library import OutputIndex, MAX_DEPTH, is_temp
+from yt_metadata import MetadataCache
+from yt_metrics import Metrics
+from yt_retry import (classify, backoff, CircuitBreaker, TokenBucket, RETRIES, THROTTLED,
+                      UNKNOWN)
+from yt_scheduler import (Scheduler, BandwidthBudget, parse_rate, parse_schedule,
+                          INTERACTIVE, NORMAL, BULK, SKIPPED)
+from yt_tools import find_tool
+from yt_transcode import Transcoder, MP3, NATIVE
+from yt_urls import canonical_key, iter_unique_urls, open_url_source, video_url
+
+OUTPUT_DIR = Path.home() / "Downloads" / "YouTube_Audio"
+
+# Downloads and transcodes run here; finished files are then published into the output
+# tree in one step. None = a .staging folder inside the output folder; a tmpfs or local
+# SSD path takes the churn off a network share (but a tmpfs loses .part files on reboot).
+# With SHARED_QUEUE each instance works in its own subfolder of it
+STAGING_DIR = None
+
+# Output subfolders: "flat", "hash" (256 folders by video ID hash), "uploader"
+# (uploader/year) or a template over {hash}, {uploader} and {year}
+LAYOUT = BY_HASH
+
+# "mp3" re-encodes every download; "native" keeps the original codec (remux only, no CPU cost)
+AUDIO_FORMAT = MP3
+
+# Loudness normalization (needs numpy): OFF, TAG writes ReplayGain tags, APPLY also
+# bakes the gain into MP3 encodes
+LOUDNESS = OFF
+
+# Bulk imports are deduped and queued this many links at a time
+INGEST_BATCH = 500
+
+# Parallel downloads: start with WORKERS, adapt between 1 and MAX_WORKERS
+WORKERS = 2
+MAX_WORKERS = 4
+
+# Bandwidth budget (bytes/s, None = unlimited), split evenly across active downloads.
+# The schedule overrides the total by time of day, e.g. "09:00-18:00=500K,01:00-07:00=none";
+# a rate of 0 pauses downloads in that window
+BANDWIDTH_LIMIT = None
+JOB_RATE_LIMIT = None
+BANDWIDTH_SCHEDULE = ""
+
+# Leftover yt-dlp/ffmpeg temp files in our staging folder, and interrupted publishes (or
+# downloads from before staging) in the output tree: removed at startup when nothing
+# will resume them, or when older than ORPHAN_MAX_AGE regardless (yt_library.is_temp
+# says which files those are). While other instances are running, only files older
+# than ORPHAN_MAX_AGE are removed from their staging folders and the output tree
+ORPHAN_MAX_AGE = 3 * 24 * 3600
+
+# Progress events per job are emitted at most this often (phase changes always go out)
+PROGRESS_INTERVAL = 0.5
+
+# Videos waiting for metadata pre-extraction; beyond this, jobs just extract when they run
+PREFETCH_QUEUE = 50
+
+# Coordinate with other instances (or hosts) writing to the same output folder through
+# job leases in a shared table there; idle workers check it for work this often
+SHARED_QUEUE = True
+SHARE_INTERVAL = 5
+
+# stop() returns within about this many seconds: running downloads are killed (they resume
+# from their .part files next start) and transcodes get until the deadline, then are killed
+STOP_TIMEOUT = 10
+KILL_GRACE = 2
+
+
+def find_yt_dlp():
+    """Find yt-dlp executable - check bundled first, then system (cached)"""
+    return find_tool('yt-dlp')
+
+
+def url_hash(url):
+    """Create unique hash for URL tracking"""
+    return hashlib.md5(url.encode()).hexdigest()[:8]
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback to abort its download"""
+
+
+class DownloadEngine:
+    """Everything between "a link was seen" and "the audio file is on disk"
+
+    on_event(event) receives dicts like {'event': 'done', 'url': ..., 'path': ...};
+    event names are log, queued, started, progress, downloaded, retry, done, failed, cancelled,
+    interrupted (stopped by stop(), resumes next start) and elsewhere (another instance has
+    the job). It is called from worker threads, so
+    front-ends must hand the data over to their own thread.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR, audio_format=AUDIO_FORMAT, workers=WORKERS,
+                 max_workers=MAX_WORKERS, history=None, on_event=None, resume=True,
+                 metadata=None, bandwidth=None, shared=SHARED_QUEUE, loudness=LOUDNESS,
+                 layout=LAYOUT, staging_dir=STAGING_DIR):
+        self.listeners = [on_event] if on_event else []
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.layout = OutputLayout(layout)
+        self.leases = JobLeases(self.output_dir, log=self.log, on_lost=self.on_leases_lost,
+                                enabled=shared)
+        self.staging_setting = staging_dir
+        self.staging_dir = self.staging_folder()
+        self.library = OutputIndex(self.output_dir, log=self.log)
+        self.library.start()
+        self.share_thread = None
+        self.running = False
+        self.history = history or DownloadHistory()
+        self.metadata = metadata or MetadataCache()
+        self.prefetch_queue = Queue(maxsize=PREFETCH_QUEUE)
+        self.prefetch_thread = None
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+        self.monitor_thread = None
+        self.job_progress = {}
+        self.attempts = {}
+        self.priority = {}
+        self.cancelled = set()
+        self.active_jobs = {}
+        self.transcoding = {}
+        self.aborting = False
+        self.stopped = False
+        self.download_count = 0
+        self.breaker = CircuitBreaker(log=self.log)
+        self.start_bucket = TokenBucket()
+        self.bandwidth = bandwidth or BandwidthBudget(BANDWIDTH_LIMIT, JOB_RATE_LIMIT,
+                                                      parse_schedule(BANDWIDTH_SCHEDULE))
+        self.transcoder = Transcoder(audio_format, log=self.log, loudness=loudness)
+        self.scheduler = Scheduler(self.download, workers=workers, max_workers=max_workers,
+                                   log=self.log)
+        self.metrics = Metrics(lambda: {'queued_jobs': self.qsize(),
+                                        'active_jobs': len(self.job_progress),
+                                        'worker_limit': self.scheduler.limit,
+                                        'transcode_backlog': self.transcoder.pending})
+        self.listeners.append(self.metrics.on_event)
+        self.yt_dlp_path = find_yt_dlp()
+        self.backend = make_backend(self.yt_dlp_path)
+        if resume:
+            self.resume()
+
+    def resume(self):
+        """Replay the journal: re-queue jobs that were queued or in flight when we last stopped
+
+        Interrupted downloads continue from their .part files in the staging folder
+        (yt-dlp --continue), since they are re-run with the same output template.
+        """
+        started = time.time()
+        # Registers this instance before it looks at the other staging folders
+        self.leases.renew()
+        adopted = self.adopt_staging()
+        jobs = self.history.unfinished()
+        if jobs:
+            added = self.enqueue([(url, key) for key, url in jobs], BULK)
+            self.log(f"[*] Resuming {added} unfinished jobs from the last session")
+        # Adopted files belong to jobs this or another instance will reclaim
+        threading.Thread(target=self.collect_orphans, args=(started, bool(jobs or adopted)),
+                         daemon=True).start()
+
+    def staging_base(self):
+        """The staging folder shared by every instance (ours is a subfolder of it)"""
+        return (Path(self.staging_setting) if self.staging_setting
+                else self.output_dir / STAGING_NAME)
+
+    def live_staging(self):
+        """Names of the staging subfolders of running instances (ours included); None if
+        that can't be told"""
+        owners = self.leases.live_owners()
+        return None if owners is None else {safe_part(owner) for owner in owners}
+
+    def adopt_staging(self):
+        """Move what stopped instances left in staging into our folder, so the jobs we
+        resume continue from their partial downloads; returns how many files moved"""
+        base = self.staging_base()
+        live = self.live_staging()
+        moved = 0
+        if self.staging_dir == base or live is None:
+            return moved
+        try:
+            with os.scandir(base) as entries:
+                # Loose files are from versions that staged straight into the base
+                stale = [entry for entry in entries if entry.name not in live
+                         and entry.path != str(self.staging_dir)]
+            for entry in stale:
+                if entry.is_dir(follow_symlinks=False):
+                    with os.scandir(entry.path) as files:
+                        paths = [f.path for f in files if f.is_file(follow_symlinks=False)]
+                elif entry.is_file(follow_symlinks=False):
+                    paths = [entry.path]
+                else:
+                    continue
+                for path in paths:
+                    target = self.staging_dir / os.path.basename(path)
+                    if not target.exists():
+                        try:
+                            os.replace(path, target)
+                            moved += 1
+                        except OSError:
+                            pass
+                if entry.is_dir(follow_symlinks=False):
+                    try:
+                        os.rmdir(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        if moved:
+            self.log(f"[*] Took over {moved} staged files from stopped instances")
+        return moved
+
+    def temp_candidates(self):
+        """(path, ours) for every file in staging and in the output tree (shard folders
+        included, for copies an interrupted publish left behind); ours is False for files
+        another running instance may still be writing"""
+        try:
+            with os.scandir(self.staging_dir) as entries:
+                yield from [(entry.path, True) for entry in entries if entry.is_file()]
+        except OSError:
+            pass
+        base = self.staging_base()
+        live = self.live_staging()
+        if self.staging_dir != base:
+            try:
+                with os.scandir(base) as entries:
+                    others = [entry.path for entry in entries
+                              if entry.is_dir(follow_symlinks=False)
+                              and entry.path != str(self.staging_dir)]
+            except OSError:
+                others = []
+            for folder in others:
+                try:
+                    with os.scandir(folder) as entries:
+                        yield from [(entry.path, False) for entry in entries if entry.is_file()]
+                except OSError:
+                    pass
+        alone = not self.leases.enabled or (live is not None
+                                            and live <= {self.staging_dir.name})
+        for root, dirs, files in os.walk(self.output_dir):
+            rel = Path(root).relative_to(self.output_dir)
+            # Dot folders (staging among them) hold no published files
+            dirs[:] = [d for d in dirs if not d.startswith('.')
+                       and len(rel.parts) < MAX_DEPTH]
+            yield from ((os.path.join(root, name), alone) for name in files)
+
+    def collect_orphans(self, before, resuming):
+        """Delete yt-dlp/ffmpeg/publish temp files nothing is going to resume"""
+        removed = 0
+        try:
+            for path, ours in self.temp_candidates():
+                if not is_temp(os.path.basename(path)):
+                    continue
+                try:
+                    age = before - os.stat(path).st_mtime
+                    if age > ORPHAN_MAX_AGE or (ours and age > 0 and not resuming):
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    pass
+        except OSError:
+            pass
+        if removed:
+            self.log(f"[*] Removed {removed} orphaned temp files")
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, event, **data):
+        data['event'] = event
+        for listener in self.listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                print(f"Listener error: {e}", file=sys.stderr)
+
+    def log(self, msg):
+        self.emit('log', msg=msg)
+
+    def qsize(self):
+        return self.scheduler.qsize()
+
+    def download(self, url):
+        url_id = url_hash(url)
+        key = canonical_key(url) or url
+        handed_off = False
+        try:
+            if not self.backend:
+                self.log(f"[-] yt-dlp not available")
+                return None
+
+            if key.startswith("playlist:"):
+                return self.expand_playlist(url, key)
+
+            video_id = key[len("video:"):] if key.startswith("video:") else None
+            info, fresh = self.metadata.lookup(video_id) if video_id else (None, False)
+            title = info.get('title') if info else None
+
+            if video_id and self.already_on_disk(url, key, video_id, info, title):
+                return DownloadResult(True)
+            output_dir = self.output_dir
+
+            if not (self.breaker.wait(lambda: self.running) and
+                    self.bandwidth.wait_allowed(lambda: self.running)):
+                # Stopped while throttled or paused: the job stays queued in the journal
+                return SKIPPED
+            if key in self.cancelled:
+                self.drop(url, key)
+                return SKIPPED
+            taken = self.leases.claim(key, url)
+            if taken:
+                self.elsewhere(url, key, taken)
+                return SKIPPED
+            generation = self.breaker.generation
+            started = self.start_bucket.take(lambda: not self.aborting)
+            # Registered before the check, so interrupt() either sees the job or has
+            # already set aborting
+            cancel = self.active_jobs[key] = threading.Event()
+            if not started or self.aborting:
+                # stop() came while the job waited to start: it stays queued in the journal
+                self.drop(url, key)
+                return SKIPPED
+            if key in self.cancelled:
+                cancel.set()
+
+            self.log(f"[>] Downloading [{url_id}]: {(title or url)[:50]}...")
+            self.history.mark(key, url, DOWNLOADING, title=title)
+            self.emit('started', url=url, key=key, title=title)
+
+            # Cached stream URLs still valid: the backend skips re-extraction
+            self.bandwidth.register(key)
+            result = self.backend.download(url, self.staging_dir,
+                                           lambda event: self.on_progress(url, key, event),
+                                           info=info if fresh else None,
+                                           rate_limit=self.bandwidth.share(), cancel=cancel)
+            if not result.ok and key in self.cancelled:
+                self.drop(url, key)
+                return SKIPPED
+            self.breaker.report(None if result.ok else result.kind, generation)
+            if result.info and video_id:
+                self.metadata.put(video_id, result.info)
+                title = title or result.info.get('title')
+
+            if result.ok:
+                self.emit('downloaded', url=url, key=key, bytes=result.downloaded)
+            if result.ok and result.filepath:
+                # Hand off to the transcode stage so this download slot is free again
+                folder = self.layout.folder(output_dir, key, result.info or info)
+                self.transcoding[key] = result.filepath
+                self.transcoder.submit(result.filepath,
+                                       lambda path, err: self.finish(url, key, path, err, title,
+                                                                     folder))
+                handed_off = True
+                if key in self.cancelled:
+                    self.transcoder.kill(result.filepath)
+            elif result.ok:
+                self.finish(url, key, None, None, title)
+            else:
+                self.retry_or_fail(url, key, result.error, result.kind or UNKNOWN)
+            return result
+
+        except Exception as e:
+            if key in self.cancelled:
+                self.drop(url, key)
+                return SKIPPED
+            self.retry_or_fail(url, key, f"Error: {e}", classify(str(e)))
+            return None
+        finally:
+            self.job_progress.pop(key, None)
+            self.active_jobs.pop(key, None)
+            self.bandwidth.unregister(key)
+            # Jobs waiting for a retry stay pending so they aren't queued twice
+            if not handed_off and key not in self.attempts:
+                self.pending.discard(key)
+                self.priority.pop(key, None)
+                self.cancelled.discard(key)
+
+    def already_on_disk(self, url, key, video_id, info, title):
+        """Finish a job without downloading if its final file already exists, in the
+        output tree or still in staging (stopped after transcoding, before publishing)"""
+        path = self.library.find(video_id)
+        if not path and info:
+            expected = self.backend.expected_path(info, self.staging_dir)
+            if expected:
+                target = self.transcoder.target(Path(expected))
+                folder = self.layout.folder(self.output_dir, key, info)
+                staged = self.staging_dir / target.name
+                if staged.exists():
+                    path = self.layout.publish(staged, folder)
+                    self.library.add(path)
+                elif (folder / target.name).exists():
+                    path = folder / target.name
+                else:
+                    # Files saved before IDs were in the name only match by title
+                    path = self.library.find(video_id,
+                                             target.stem.replace(f" [{video_id}]", ""))
+        if not path or not path.exists():
+            return False
+        size = path.stat().st_size
+        self.log(f"[*] Already on disk [{url_hash(url)}]: {path.name}")
+        self.history.mark(key, url, DONE, path, size, title)
+        self.leases.finish(key, DONE)
+        self.emit('done', url=url, key=key, path=str(path), size=size)
+        return True
+
+    def staging_folder(self):
+        """This instance's staging folder for the current output folder (created if
+        missing): one per instance when coordinating, named after its lease owner"""
+        folder = self.staging_base()
+        if self.leases.enabled:
+            folder = folder / safe_part(self.leases.owner)
+        folder.mkdir(parents=True, exist_ok=True)
+        return folder
+
+    def set_output_dir(self, folder):
+        """Switch the output folder (used by jobs started from now on)"""
+        self.output_dir = Path(folder)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.library.close()
+        self.library = OutputIndex(self.output_dir, log=self.log)
+        self.library.start()
+        self.leases.close()
+        self.leases = JobLeases(self.output_dir, log=self.log, on_lost=self.on_leases_lost,
+                                enabled=self.leases.enabled)
+        self.staging_dir = self.staging_folder()
+        if self.running:
+            self.leases.start()
+
+    def prefetch(self):
+        """Pre-extract metadata for queued videos so their downloads skip extraction"""
+        while self.running:
+            try:
+                url, key = self.prefetch_queue.get(timeout=1)
+            except Empty:
+                continue
+            video_id = key[len("video:"):]
+            if (key not in self.pending or key in self.cancelled or
+                    self.metadata.get(video_id, formats=True)):
+                continue
+            if not (self.breaker.wait(lambda: self.running) and
+                    self.start_bucket.take(lambda: self.running)):
+                continue
+            try:
+                self.metadata.put(video_id, self.backend.extract(url))
+            except Exception as e:
+                # The download extracts again and reports the real error
+                if classify(str(e)) == THROTTLED:
+                    self.breaker.trip()
+
+    def on_progress(self, url, key, event):
+        """Keep the latest progress per job; emit at most every PROGRESS_INTERVAL
+
+        Runs on the download's own thread, so sleeping here is what holds each job to
+        its share of the bandwidth budget.
+        """
+        if key in self.cancelled:
+            raise JobCancelled(key)
+        if event['phase'] == 'downloading':
+            self.bandwidth.throttle(key, event['downloaded'])
+        now = time.monotonic()
+        last = self.job_progress.get(key)
+        self.job_progress[key] = dict(event, emitted=now)
+        if last and last['phase'] == event['phase'] and now - last['emitted'] < PROGRESS_INTERVAL:
+            self.job_progress[key]['emitted'] = last['emitted']
+            return
+        self.emit('progress', url=url, key=key, **event)
+
+    def total_speed(self):
+        """Combined download speed of all active jobs, in bytes/s"""
+        return sum(e['speed'] or 0 for e in list(self.job_progress.values())
+                   if e['phase'] == 'downloading')
+
+    def retry_or_fail(self, url, key, error, kind):
+        """Re-queue a transient/throttled failure after a jittered backoff, else fail it"""
+        attempt = self.attempts.get(key, 0)
+        if attempt < RETRIES.get(kind, 0) and not self.running:
+            # Stopping: leave it queued in the journal for the next session
+            self.attempts.pop(key, None)
+            self.history.mark(key, url, QUEUED)
+            self.leases.release(key)
+            self.log(f"[*] [{url_hash(url)}] {kind}: {error[:50]} - kept for next start")
+            return
+        if attempt < RETRIES.get(kind, 0):
+            self.attempts[key] = attempt + 1
+            delay = backoff(attempt)
+            self.history.mark(key, url, QUEUED)
+            self.log(f"[*] [{url_hash(url)}] {kind}: {error[:50]} - "
+                     f"retry {attempt + 1}/{RETRIES[kind]} in {delay:.0f}s")
+            self.emit('retry', url=url, key=key, kind=kind, attempt=attempt + 1,
+                      delay=round(delay, 1), error=error)
+            self.scheduler.put_after(url, delay, self.priority.get(key, NORMAL))
+            return
+        self.attempts.pop(key, None)
+        self.fail(url, key, error, kind)
+
+    def cancel(self, key):
+        """Cancel a queued, waiting or running job; False if key isn't pending
+
+        A queued job (or one backing off before a retry) is dropped right away. A running
+        download's child process tree is killed within a second (in-process downloads stop
+        at their next progress update), and so is its transcode. A playlist being listed
+        finishes listing but queues nothing.
+        """
+        with self.pending_lock:
+            if key not in self.pending or key in self.cancelled:
+                return False
+            self.cancelled.add(key)
+        self.log(f"[*] Cancelling {key}")
+        removed = self.scheduler.discard(lambda url: (canonical_key(url) or url) == key)
+        if removed:
+            # No worker will see it: settle it here
+            self.pending.discard(key)
+            self.priority.pop(key, None)
+            self.drop(removed[0], key)
+            return True
+        cancel = self.active_jobs.get(key)
+        if cancel:
+            cancel.set()
+        src = self.transcoding.get(key)
+        if src:
+            self.transcoder.kill(src)
+        return True
+
+    def drop(self, url, key):
+        """Record a cancelled job as finished, or as still queued if stop() interrupted it"""
+        self.cancelled.discard(key)
+        self.attempts.pop(key, None)
+        if self.aborting:
+            self.history.mark(key, url, QUEUED)
+            self.leases.release(key)
+            self.log(f"[*] [{url_hash(url)}] Interrupted - resumes on next start")
+            self.emit('interrupted', url=url, key=key)
+            return
+        self.history.mark(key, url, CANCELLED)
+        self.leases.finish(key, CANCELLED)
+        self.log(f"[-] [{url_hash(url)}] Cancelled")
+        self.emit('cancelled', url=url, key=key)
+
+    def elsewhere(self, url, key, state):
+        """Another instance has downloaded (DONE) or is downloading (leased) this job"""
+        if state == DONE:
+            self.history.mark(key, url, DONE)
+            self.log(f"[*] Already downloaded by another instance [{url_hash(url)}]")
+        else:
+            # Stays queued in our journal: if that instance fails, a later start retries it
+            self.log(f"[*] Being downloaded by another instance [{url_hash(url)}]")
+        self.emit('elsewhere', url=url, key=key, state=state)
+
+    def on_leases_lost(self, keys):
+        """Our lease expired (e.g. we were suspended) and another instance took the job"""
+        for key in keys:
+            if self.cancel(key):
+                self.log(f"[!] Another instance took over {key}, stopping our download")
+
+    def share_work(self):
+        """Take over jobs from the shared table while our own queue can't keep workers busy"""
+        while self.running:
+            time.sleep(SHARE_INTERVAL)
+            free = self.scheduler.limit - self.qsize()
+            if free <= 0 or not self.running:
+                continue
+            claimed = self.leases.reclaim(free)
+            if not claimed:
+                continue
+            added = self.enqueue(claimed, BULK)
+            for url, key in claimed:
+                if key not in self.pending:
+                    # Done according to our history or the output folder
+                    self.leases.finish(key, DONE)
+            if added:
+                self.log(f"[*] Took over {added} jobs from other instances")
+
+    def job_status(self, key):
+        """History record of key plus its live state, or None for an unknown job"""
+        record = self.history.get(key)
+        if record is None and key not in self.pending:
+            return None
+        status = dict(record or {'key': key})
+        progress = self.job_progress.get(key)
+        if progress:
+            status['progress'] = {k: v for k, v in progress.items() if k != 'emitted'}
+        status['pending'] = key in self.pending
+        status['attempts'] = self.attempts.get(key, 0)
+        status['cancelling'] = key in self.cancelled
+        return status
+
+    def fail(self, url, key, error, kind=UNKNOWN):
+        self.history.mark(key, url, FAILED)
+        self.leases.finish(key, FAILED)
+        self.log(f"[-] [{url_hash(url)}] {error[:70]}")
+        self.emit('failed', url=url, key=key, error=error, kind=kind)
+
+    def finish(self, url, key, path, error, title=None, folder=None):
+        """Publish a job's downloaded and transcoded audio into folder and record it"""
+        src = self.transcoding.pop(key, None)
+        try:
+            if error and key in self.cancelled:
+                # Interrupted by stop(): the download stays in staging and the job is
+                # transcoded from it on the next start. Left behind after a cancel, it
+                # would pass for the finished file
+                if src and not self.aborting:
+                    Path(src).unlink(missing_ok=True)
+                self.drop(url, key)
+                return
+            if error:
+                self.fail(url, key, f"Transcode failed: {error}")
+                return
+            if path and folder is not None:
+                try:
+                    path = self.layout.publish(path, folder)
+                except OSError as e:
+                    self.fail(url, key, f"Publish failed: {str(e)[:60]}")
+                    return
+            size = os.path.getsize(path) if path and os.path.exists(path) else None
+            if size is not None:
+                self.library.add(path)
+            self.history.mark(key, url, DONE, path, size, title)
+            self.leases.finish(key, DONE)
+            self.download_count += 1
+            self.log(f"[+] Success! [{url_hash(url)}] Downloaded")
+            self.emit('done', url=url, key=key, path=str(path) if path else None, size=size)
+        finally:
+            self.attempts.pop(key, None)
+            self.cancelled.discard(key)
+            self.pending.discard(key)
+            self.priority.pop(key, None)
+
+    def expand_playlist(self, url, key):
+        """Fan a playlist out into one job per video, skipping videos we already have
+
+        A playlist cancelled while it is being listed queues none of its videos.
+        """
+        url_id = url_hash(url)
+        self.log(f"[>] Listing playlist [{url_id}]: {url[:50]}...")
+        if not self.breaker.wait(lambda: self.running):
+            return SKIPPED
+        if key in self.cancelled:
+            self.drop(url, key)
+            return SKIPPED
+        generation = self.breaker.generation
+        if not self.start_bucket.take(lambda: not self.aborting) or self.aborting:
+            self.drop(url, key)
+            return SKIPPED
+        try:
+            ids = self.backend.list_playlist(url)
+        except Exception as e:
+            kind = classify(str(e))
+            self.breaker.report(kind, generation)
+            if key in self.cancelled:
+                self.drop(url, key)
+                return SKIPPED
+            self.retry_or_fail(url, key, str(e), kind)
+            return DownloadResult(False, str(e), kind=kind)
+        self.breaker.report(None, generation)
+        if key in self.cancelled:
+            self.drop(url, key)
+            return SKIPPED
+
+        added = self.enqueue([(video_url(video_id), f"video:{video_id}") for video_id in ids],
+                             BULK)
+        self.history.mark_playlist(key, url, len(ids))
+        self.log(f"[+] Playlist [{url_id}]: {len(ids)} videos, {added} new queued")
+        return DownloadResult(True)
+
+    def sync_playlists(self):
+        """Re-list every followed playlist; only entries not in history get queued"""
+        playlists = self.history.playlists()
+        added = self.enqueue([(url, key) for key, url in playlists], BULK)
+        self.log(f"[*] Syncing {added} followed playlists")
+
+    def monitor(self):
+        """Clipboard monitor: reacts to clipboard changes instead of fixed-interval polling"""
+        watcher = make_clipboard_watcher(log=self.log)
+
+        self.log(f"[*] Monitor started ({watcher.name})")
+
+        watcher.run(self.on_clipboard, lambda: self.running)
+
+    def on_clipboard(self, clip):
+        """Queue every YouTube link in freshly copied clipboard text"""
+        try:
+            links = list(iter_unique_urls([clip]))
+            if not links:
+                return
+            added = self.enqueue(links, INTERACTIVE)
+            if len(links) > 1:
+                self.log(f"[+] Added {added} of {len(links)} links from clipboard to queue")
+                return
+            url, key = links[0]
+            if added:
+                self.log(f"[+] Added to queue [{url_hash(url)}]: {url[:50]}...")
+            elif key not in self.pending:
+                self.log(f"[*] Already downloaded [{url_hash(url)}]: {url[:50]}")
+
+        except Exception as e:
+            self.log(f"[!] Monitor error: {str(e)[:60]}")
+
+    def enqueue(self, links, priority=NORMAL):
+        """Queue (url, key) pairs not already pending, downloaded or on disk; returns how many
+
+        priority is a scheduler class: INTERACTIVE jobs run ahead of NORMAL and BULK ones
+        queued earlier (within the scheduler's aging window).
+        """
+        new, on_disk = [], []
+        with self.pending_lock:
+            for url, key in links:
+                if key in self.pending or self.history.have(key):
+                    continue
+                path = self.library.find(key[len("video:"):]) if key.startswith("video:") else None
+                if path:
+                    on_disk.append((key, url, path))
+                else:
+                    new.append((key, url))
+            # Fleet-wide dedup; playlists are re-listed by every instance that follows them
+            taken = self.leases.offer([(key, url) for key, url in new
+                                       if not key.startswith("playlist:")])
+            new = [(key, url) for key, url in new if key not in taken]
+            self.pending.update(key for key, url in new)
+        for key, url, path in on_disk:
+            # History lost or folder shared: the file is the record
+            self.history.mark(key, url, DONE, path)
+        done_elsewhere = [key for key, state in taken.items() if state == DONE]
+        if done_elsewhere:
+            urls = {key: url for url, key in links}
+            self.history.mark_many([(key, urls.get(key, key)) for key in done_elsewhere], DONE)
+        if taken:
+            self.log(f"[*] {len(taken)} links skipped: downloaded or in progress "
+                     f"on another instance")
+        if new:
+            self.history.mark_many(new, QUEUED)
+            for key, url in new:
+                self.priority[key] = priority
+                self.scheduler.put(url, priority)
+                self.emit('queued', url=url, key=key)
+                if key.startswith("video:"):
+                    try:
+                        self.prefetch_queue.put_nowait((url, key))
+                    except Full:
+                        pass
+        return len(new)
+
+    def ingest_async(self, path):
+        """Read links from a file or stdin ('-') in the background"""
+        thread = threading.Thread(target=self.ingest, args=(path,), daemon=True)
+        thread.start()
+        return thread
+
+    def ingest(self, path):
+        """Scan a .txt/.csv file line by line and queue every distinct video, in order"""
+        name = "stdin" if str(path) == '-' else Path(path).name
+        self.log(f"[*] Importing links from {name}...")
+        found = added = 0
+        try:
+            with open_url_source(path) as source:
+                batch = []
+                for link in iter_unique_urls(source):
+                    batch.append(link)
+                    if len(batch) >= INGEST_BATCH:
+                        found += len(batch)
+                        added += self.enqueue(batch, BULK)
+                        batch = []
+                found += len(batch)
+                added += self.enqueue(batch, BULK)
+        except Exception as e:
+            self.log(f"[!] Import error: {str(e)[:60]}")
+        self.log(f"[+] Imported {name}: {added} queued, {found - added} already known")
+
+    def start(self, clipboard=True):
+        """Start the workers (and the clipboard monitor); False if already running
+
+        After a stop(), the jobs it left queued in the journal are queued again.
+        """
+        if self.running:
+            return False
+        self.running = True
+        self.aborting = False
+        # Another instance takes over our staging folder while we're stopped
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        if clipboard:
+            self.monitor_thread = threading.Thread(target=self.monitor, daemon=True)
+            self.monitor_thread.start()
+
+        self.scheduler.start()
+        self.metrics.start_export()
+        self.leases.start()
+        if not (self.share_thread and self.share_thread.is_alive()):
+            self.share_thread = threading.Thread(target=self.share_work, daemon=True)
+            self.share_thread.start()
+        if self.backend and not (self.prefetch_thread and self.prefetch_thread.is_alive()):
+            self.prefetch_thread = threading.Thread(target=self.prefetch, daemon=True)
+            self.prefetch_thread.start()
+
+        self.log(f"[+] {self.scheduler.limit} download workers started "
+                 f"(adapts up to {self.scheduler.max_workers})!")
+        if self.stopped:
+            self.resume()
+        return True
+
+    def wait_idle(self):
+        """Block until every queued job (and pending retry) is downloaded and transcoded"""
+        while True:
+            self.scheduler.queue.join()
+            self.transcoder.wait()
+            if not self.scheduler.delayed:
+                return
+            time.sleep(0.5)
+
+    def interrupt(self):
+        """Stop every download now: queued jobs stay queued in the journal and running
+        ones are killed, to resume on the next start"""
+        self.aborting = True
+        queued = self.scheduler.discard(lambda url: True)
+        for url in queued:
+            key = canonical_key(url) or url
+            self.pending.discard(key)
+            self.priority.pop(key, None)
+            self.attempts.pop(key, None)
+        running = list(self.active_jobs.items())
+        for key, cancel in running:
+            self.cancelled.add(key)
+            cancel.set()
+        if queued or running:
+            self.log(f"[*] Interrupting {len(running)} downloads, "
+                     f"{len(queued)} queued jobs kept for next start")
+
+    def stop(self, drain=False, timeout=STOP_TIMEOUT):
+        """Stop monitoring and the workers; returns within about timeout seconds
+
+        By default running downloads are interrupted (see interrupt()) and transcodes get
+        until the deadline; drain=True first lets the queue finish, as far as the timeout
+        allows (None waits for everything). Returns False if jobs were still running at
+        the deadline; they are left to finish in the background.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0, deadline - time.monotonic())
+
+        self.running = False
+        self.stopped = True
+        if self.monitor_thread:
+            self.monitor_thread.join(remaining())
+            self.monitor_thread = None
+        if not (drain and self.scheduler.wait_idle(remaining())):
+            self.interrupt()
+        stopped = self.scheduler.stop(remaining())
+        if not self.transcoder.wait(remaining()):
+            self.aborting = True
+            for key in list(self.transcoding):
+                self.cancelled.add(key)
+            self.transcoder.abort()
+            stopped = self.transcoder.wait(KILL_GRACE) and stopped
+        self.leases.close()
+        self.metrics.stop_export()
+        self.history.flush()
+        if not stopped:
+            self.log("[!] Some jobs didn't stop in time")
+        return stopped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m yt_engine",
+                                     description="Headless YouTube audio downloader "
+                                                 "(events as JSON lines on stdout)")
+    parser.add_argument('sources', nargs='*',
+                        help="text/CSV files with YouTube links ('-' for stdin, "
+                             "default: stdin when piped)")
+    parser.add_argument('-o', '--output', default=str(OUTPUT_DIR), help="output folder")
+    parser.add_argument('--layout', type=parse_layout, default=LAYOUT,
+                        help="output subfolders: flat, hash, uploader (uploader/year) "
+                             "or a template over {hash}, {uploader}, {year}")
+    parser.add_argument('--staging', default=STAGING_DIR,
+                        help="folder for downloads in progress (default: .staging in "
+                             "the output folder)")
+    parser.add_argument('--format', choices=[MP3, NATIVE], default=AUDIO_FORMAT,
+                        help="mp3 re-encodes, native keeps the downloaded codec")
+    parser.add_argument('--loudness', choices=[TAG, APPLY], default=LOUDNESS,
+                        help="tag: ReplayGain tags, apply: also normalize MP3 encodes")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--max-workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--limit-rate', type=parse_rate, default=BANDWIDTH_LIMIT,
+                        help="total download budget, e.g. 2M (bytes/s)")
+    parser.add_argument('--job-rate', type=parse_rate, default=JOB_RATE_LIMIT,
+                        help="cap per download, e.g. 500K")
+    parser.add_argument('--schedule', type=parse_schedule, default=BANDWIDTH_SCHEDULE,
+                        help="time-of-day budgets, e.g. '09:00-18:00=500K,01:00-07:00=none'")
+    parser.add_argument('--clipboard', action='store_true', help="also watch the clipboard")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="don't replay jobs left unfinished by the last run")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running after the sources are done (until SIGINT/SIGTERM)")
+    parser.add_argument('--api-port', type=int, default=API_PORT,
+                        help=f"localhost HTTP API port in daemon mode (default {API_PORT})")
+    parser.add_argument('--no-api', action='store_true', help="don't serve the HTTP API")
+    args = parser.parse_args(argv)
+
+    out_lock = threading.Lock()
+
+    def report(event):
+        line = json.dumps(dict(event, time=round(time.time(), 3)))
+        with out_lock:
+            print(line, flush=True)
+
+    engine = DownloadEngine(args.output, args.format, args.workers, args.max_workers,
+                            on_event=report, resume=not args.no_resume,
+                            bandwidth=BandwidthBudget(args.limit_rate, args.job_rate,
+                                                      args.schedule),
+                            loudness=args.loudness, layout=args.layout,
+                            staging_dir=args.staging)
+    if not engine.backend:
+        engine.log("[!] yt-dlp not found! Install it with: pip install yt-dlp")
+        return 1
+
+    sources = args.sources
+    if not sources and sys.stdin is not None and not sys.stdin.isatty():
+        sources = ['-']
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    engine.start(clipboard=args.clipboard)
+    api = None
+    if (args.daemon or args.clipboard) and not args.no_api:
+        api = ApiServer(engine, port=args.api_port)
+        api.start()
+    for source in sources:
+        engine.ingest(source)
+
+    if args.daemon or args.clipboard:
+        while not stop.wait(1):
+            pass
+    else:
+        idle = threading.Thread(target=engine.wait_idle, daemon=True)
+        idle.start()
+        while idle.is_alive() and not stop.wait(0.5):
+            pass
+    if api:
+        api.stop()
+    engine.stop()
+    engine.history.close()
+    engine.metadata.close()
+    engine.library.close()
+    engine.transcoder.close(KILL_GRACE)
+    engine.backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
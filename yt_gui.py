@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""Tk front-end over the download engine (yt_engine.py)"""
+import multiprocessing
+import threading
+import tkinter as tk
+from tkinter import scrolledtext, filedialog, messagebox
+import sys
+import hashlib
+from queue import SimpleQueue, Empty
+from yt_api import ApiServer
+from yt_engine import DownloadEngine, KILL_GRACE
+from yt_tools import CACHE_DIR, missing_dependencies
+from yt_progress import format_bytes
+from yt_log import LogPipeline
+
+# Log widget keeps the last LOG_LINES lines; queued lines are flushed every LOG_FLUSH_MS
+LOG_LINES = 2000
+LOG_FLUSH_MS = 100
+LOG_BATCH = 500
+
+# Phase timings shown in the stats panel (label, yt_metrics phase)
+PHASE_NAMES = (("wait", "queue"), ("extract", "extract"), ("download", "download"),
+               ("post", "postprocess"), ("transcode", "transcode"))
+
+def create_icon():
+    """Create YouTube downloader icon programmatically"""
+    from PIL import Image, ImageDraw
+    
+    img = Image.new('RGBA', (256, 256), color=(0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    
+    # Background circle - light blue
+    draw.ellipse([20, 20, 236, 236], fill=(173, 216, 230, 255), outline=(0, 0, 0, 255), width=8)
+    
+    # YouTube play button - red/pink
+    draw.rectangle([50, 60, 150, 130], fill=(239, 83, 80, 255), outline=(0, 0, 0, 255), width=4)
+    draw.polygon([(85, 80), (85, 110), (125, 95)], fill=(255, 255, 255, 255))
+    
+    # Download arrow - orange/yellow
+    arrow_x, arrow_y = 128, 150
+    # Vertical bar
+    draw.rectangle([arrow_x - 15, arrow_y, arrow_x + 15, arrow_y + 40], 
+                   fill=(255, 200, 87, 255), outline=(0, 0, 0, 255), width=3)
+    # Arrow head
+    draw.polygon([
+        [arrow_x - 30, arrow_y + 30],
+        [arrow_x + 30, arrow_y + 30],
+        [arrow_x, arrow_y + 70]
+    ], fill=(255, 200, 87, 255), outline=(0, 0, 0, 255))
+    
+    # Music note - green
+    note_x, note_y = 190, 100
+    draw.ellipse([note_x - 12, note_y + 20, note_x + 12, note_y + 45], 
+                 fill=(76, 175, 80, 255), outline=(0, 0, 0, 255), width=3)
+    draw.line([note_x + 12, note_y + 20, note_x + 12, note_y - 10], 
+              fill=(0, 0, 0, 255), width=4)
+    draw.line([note_x + 12, note_y - 10, note_x + 25, note_y], 
+              fill=(0, 0, 0, 255), width=4)
+    
+    return img
+
+def icon_path():
+    """Cached icon PNG, drawn once: the name hashes the drawing code, so edits redraw it"""
+    code = create_icon.__code__
+    digest = hashlib.sha1(code.co_code + repr(code.co_consts).encode()).hexdigest()[:12]
+    path = CACHE_DIR / f"icon-{digest}.png"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        create_icon().save(tmp, format='PNG')
+        tmp.replace(path)
+    return path
+
+class YTDownloader:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("YouTube Audio Auto-Downloader")
+        self.root.geometry("900x700")
+        self.root.configure(bg="#1a1a1a")
+        self.root.resizable(True, True)
+        
+        # Set window icon
+        try:
+            self.icon = tk.PhotoImage(file=str(icon_path()))
+            self.root.iconphoto(False, self.icon)
+        except Exception as e:
+            print(f"Icon error: {e}")
+        
+        self.logs = LogPipeline()
+        self.ui_calls = SimpleQueue()
+        self.stats_dirty = True
+        self.engine = DownloadEngine(on_event=self.on_engine_event)
+        self.output_dir = self.engine.output_dir
+        self.api = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        
+        # ===== HEADER SECTION =====
+        header_frame = tk.Frame(root, bg="#0d0d0d", height=70)
+        header_frame.pack(fill=tk.X, padx=0, pady=0)
+        header_frame.pack_propagate(False)
+        
+        tk.Label(header_frame, text="YOUTUBE AUDIO AUTO-DOWNLOADER", 
+                font=("Impact", 16, "bold"), bg="#0d0d0d", fg="#00ff00").pack(pady=8)
+        
+        tk.Label(header_frame, text="Made by ULENAM & SONAPSY-TEAM | Portable Edition", 
+                font=("Arial", 8), bg="#0d0d0d", fg="#00aa00").pack(pady=2)
+        
+        # ===== STATS SECTION (Horizontal Bar) =====
+        stats_frame = tk.Frame(root, bg="#1f1f1f", height=50)
+        stats_frame.pack(fill=tk.X, padx=10, pady=8)
+        stats_frame.pack_propagate(False)
+        
+        self.status = tk.Label(stats_frame, text="Status: Ready", 
+                              font=("Arial", 11, "bold"), bg="#1f1f1f", fg="#00ff00")
+        self.status.pack(side=tk.LEFT, padx=15, pady=10)
+        
+        tk.Label(stats_frame, text="•", font=("Arial", 14), bg="#1f1f1f", fg="#00aa00").pack(side=tk.LEFT, padx=5)
+        
+        self.counter = tk.Label(stats_frame, text="Downloaded: 0", 
+                               font=("Arial", 11), bg="#1f1f1f", fg="#00aaff")
+        self.counter.pack(side=tk.LEFT, padx=15)
+        
+        tk.Label(stats_frame, text="•", font=("Arial", 14), bg="#1f1f1f", fg="#00aa00").pack(side=tk.LEFT, padx=5)
+        
+        self.queue_label = tk.Label(stats_frame, text="Queue: 0", 
+                                    font=("Arial", 11), bg="#1f1f1f", fg="#ffaa00")
+        self.queue_label.pack(side=tk.LEFT, padx=15)
+        
+        tk.Label(stats_frame, text="•", font=("Arial", 14), bg="#1f1f1f", fg="#00aa00").pack(side=tk.LEFT, padx=5)
+        
+        self.speed_label = tk.Label(stats_frame, text="Speed: -", 
+                                    font=("Arial", 11), bg="#1f1f1f", fg="#ff66cc")
+        self.speed_label.pack(side=tk.LEFT, padx=15)
+        
+        # ===== PHASE TIMING SECTION =====
+        phase_frame = tk.Frame(root, bg="#1f1f1f")
+        phase_frame.pack(fill=tk.X, padx=10, pady=(0, 8))
+        
+        self.failed_label = tk.Label(phase_frame, text="Failed: 0", 
+                                     font=("Arial", 9), bg="#1f1f1f", fg="#ff4444")
+        self.failed_label.pack(side=tk.LEFT, padx=15, pady=4)
+        
+        self.phase_label = tk.Label(phase_frame, text="Avg per job: -", 
+                                    font=("Courier", 9), bg="#1f1f1f", fg="#aaaaaa")
+        self.phase_label.pack(side=tk.LEFT, padx=15)
+        
+        self.bound_label = tk.Label(phase_frame, text="", 
+                                    font=("Arial", 9, "bold"), bg="#1f1f1f", fg="#ffaa00")
+        self.bound_label.pack(side=tk.RIGHT, padx=15)
+        
+        # ===== OUTPUT PATH SECTION =====
+        output_frame = tk.Frame(root, bg="#1a1a1a")
+        output_frame.pack(fill=tk.X, padx=15, pady=8)
+        
+        tk.Label(output_frame, text="📁 Output Folder:", 
+                font=("Arial", 9, "bold"), bg="#1a1a1a", fg="#00ff00").pack(anchor=tk.W)
+        
+        self.folder_label = tk.Label(output_frame, text=f"{self.output_dir}", 
+                               font=("Courier", 8), bg="#1a1a1a", fg="#888888", 
+                               wraplength=750, justify=tk.LEFT)
+        self.folder_label.pack(anchor=tk.W, pady=3)
+        
+        tk.Button(output_frame, text="Change Output Folder", command=self.change_path,
+                 bg="#0066cc", fg="white", font=("Arial", 8), padx=10, pady=2).pack(anchor=tk.W, pady=5)
+        
+        # ===== LOG SECTION =====
+        log_label = tk.Label(root, text="📺 Download Log", 
+                            font=("Arial", 10, "bold"), bg="#1a1a1a", fg="#00ff00")
+        log_label.pack(anchor=tk.W, padx=15, pady=(10, 3))
+        
+        log_frame = tk.Frame(root, bg="#1a1a1a")
+        log_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 10))
+        
+        self.log_box = scrolledtext.ScrolledText(log_frame, height=20, width=100,
+                                                 bg="#0d0d0d", fg="#00ff00",
+                                                 font=("Courier", 9),
+                                                 insertbackground="#00ff00",
+                                                 relief=tk.FLAT, bd=1)
+        self.log_box.pack(fill=tk.BOTH, expand=True)
+        self.log_box.config(state=tk.DISABLED)
+        
+        # ===== BUTTON SECTION =====
+        btn_frame = tk.Frame(root, bg="#1a1a1a")
+        btn_frame.pack(pady=15)
+        
+        self.start_btn = tk.Button(btn_frame, text="▶  START MONITORING", command=self.start,
+                                   bg="#00aa00", fg="#000000", font=("Arial", 11, "bold"),
+                                   padx=30, pady=8, relief=tk.RAISED, bd=2, cursor="hand2")
+        self.start_btn.pack(side=tk.LEFT, padx=8)
+        
+        self.stop_btn = tk.Button(btn_frame, text="⏹  STOP", command=self.stop,
+                                  bg="#aa0000", fg="white", font=("Arial", 11, "bold"),
+                                  padx=30, pady=8, relief=tk.RAISED, bd=2, state=tk.DISABLED, cursor="hand2")
+        self.stop_btn.pack(side=tk.LEFT, padx=8)
+        
+        tk.Button(btn_frame, text="🗑  Clear Log", command=self.clear_log,
+                 bg="#555555", fg="white", font=("Arial", 9), padx=15, pady=8, 
+                 relief=tk.RAISED, bd=2, cursor="hand2").pack(side=tk.LEFT, padx=8)
+        
+        tk.Button(btn_frame, text="📄  Import URLs", command=self.import_urls,
+                 bg="#0066cc", fg="white", font=("Arial", 9), padx=15, pady=8, 
+                 relief=tk.RAISED, bd=2, cursor="hand2").pack(side=tk.LEFT, padx=8)
+        
+        tk.Button(btn_frame, text="🔄  Sync Playlists", command=self.sync_playlists,
+                 bg="#0066cc", fg="white", font=("Arial", 9), padx=15, pady=8, 
+                 relief=tk.RAISED, bd=2, cursor="hand2").pack(side=tk.LEFT, padx=8)
+        
+        # ===== CHECK YT-DLP =====
+        if not self.engine.backend:
+            self.log("[!] WARNING: yt-dlp not found!")
+            self.log("[!] Install it with: pip install yt-dlp")
+            messagebox.showerror("Missing Dependency", 
+                "yt-dlp is not installed.\n\nRun: pip install yt-dlp")
+        else:
+            self.log(f"[+] yt-dlp found ({self.engine.backend.name} engine): Ready!")
+            # Links posted to the localhost API queue like copied ones (once started)
+            self.api = ApiServer(self.engine)
+            self.api.start()
+        
+        self.log("[*] PORTABLE EDITION - All bundled!")
+        self.log("[*] Ready! Copy YouTube links to download audio automatically.")
+        self.flush_ui()
+    
+    def log(self, msg):
+        """Thread-safe: queue the line, flush_ui() writes it on the Tk thread"""
+        self.logs.write(msg)
+    
+    def on_engine_event(self, event):
+        """Engine callback (any thread): log lines are queued, everything else marks stats dirty"""
+        if event['event'] == 'log':
+            self.logs.write(event['msg'])
+        else:
+            self.stats_dirty = True
+    
+    def ui(self, fn, *args, **kwargs):
+        """Run a widget update on the Tk thread (safe to call from any thread)"""
+        self.ui_calls.put((fn, args, kwargs))
+    
+    def flush_ui(self):
+        """Tk thread: apply queued widget updates and append queued log lines in one batch"""
+        try:
+            while True:
+                fn, args, kwargs = self.ui_calls.get_nowait()
+                fn(*args, **kwargs)
+        except Empty:
+            pass
+        
+        if self.stats_dirty:
+            self.stats_dirty = False
+            self.refresh_stats()
+        
+        lines = self.logs.drain(LOG_BATCH)
+        if lines:
+            self.log_box.config(state=tk.NORMAL)
+            self.log_box.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(self.log_box.index("end-1c").split(".")[0]) - 1 - LOG_LINES
+            if excess > 0:
+                self.log_box.delete("1.0", f"{excess + 1}.0")
+            self.log_box.see(tk.END)
+            self.log_box.config(state=tk.DISABLED)
+        
+        self.root.after(LOG_FLUSH_MS, self.flush_ui)
+    
+    def refresh_stats(self):
+        engine = self.engine
+        self.counter.config(text=f"Downloaded: {engine.download_count}")
+        self.queue_label.config(text=f"Queue: {engine.qsize()}")
+        active = len(engine.job_progress)
+        if active:
+            self.speed_label.config(text=f"Speed: {format_bytes(engine.total_speed())}/s "
+                                         f"({active} active)")
+        else:
+            self.speed_label.config(text="Speed: -")
+        
+        metrics = engine.metrics.snapshot()
+        self.failed_label.config(text=f"Failed: {metrics['counters']['failed']}")
+        means = [(name, metrics['phases'][phase]['mean'])
+                 for name, phase in PHASE_NAMES if metrics['phases'][phase]['mean'] is not None]
+        if means:
+            self.phase_label.config(text="Avg per job: " + "  ".join(
+                f"{name} {mean:.1f}s" for name, mean in means))
+        if metrics['bound_by']:
+            self.bound_label.config(text=f"Bound by: {metrics['bound_by']}")
+    
+    def clear_log(self):
+        self.log_box.config(state=tk.NORMAL)
+        self.log_box.delete(1.0, tk.END)
+        self.log_box.config(state=tk.DISABLED)
+        self.log("Log cleared.")
+    
+    def change_path(self):
+        folder = filedialog.askdirectory(title="Select Output Folder", 
+                                        initialdir=str(self.output_dir))
+        if folder:
+            self.engine.set_output_dir(folder)
+            self.output_dir = self.engine.output_dir
+            self.folder_label.config(text=f"{self.output_dir}")
+            self.log(f"[+] Output folder changed: {self.output_dir}")
+    
+    def import_urls(self):
+        path = filedialog.askopenfilename(title="Import URLs",
+                                          filetypes=[("URL lists", "*.txt *.csv"), ("All files", "*.*")])
+        if path:
+            self.engine.ingest_async(path)
+    
+    def sync_playlists(self):
+        self.engine.sync_playlists()
+    
+    def start(self):
+        if not self.engine.backend:
+            messagebox.showerror("Error", "yt-dlp is required to run this app.")
+            return
+        
+        if not self.engine.running:
+            self.status.config(text="Status: [*] Monitoring...", fg="#00ff00")
+            self.start_btn.config(state=tk.DISABLED)
+            self.stop_btn.config(state=tk.NORMAL)
+            self.log("="*80)
+            
+            self.engine.start()
+    
+    def stop(self):
+        if self.engine.running:
+            self.status.config(text="Status: Stopping...", fg="#ffaa00")
+            self.start_btn.config(state=tk.DISABLED)
+            self.stop_btn.config(state=tk.DISABLED)
+            self.log("[*] Stopping... (unfinished downloads resume on next start)")
+            
+            def wait_and_stop():
+                self.engine.stop()
+                self.ui(self.status.config, text="Status: Stopped", fg="#ff0000")
+                self.ui(self.start_btn.config, state=tk.NORMAL)
+                self.log("[+] Stopped.")
+            
+            threading.Thread(target=wait_and_stop, daemon=True).start()
+    
+    def close(self):
+        """Window closed: stop within the engine's deadline so no child outlives the app"""
+        self.status.config(text="Status: Closing...", fg="#ffaa00")
+        
+        def stop_and_close():
+            if self.api:
+                self.api.stop()
+            self.engine.stop()
+            self.engine.history.close()
+            self.engine.metadata.close()
+            self.engine.library.close()
+            self.engine.transcoder.close(KILL_GRACE)
+            if self.engine.backend:
+                self.engine.backend.close()
+            # Last, so the shutdown's own log lines reach the log file
+            self.logs.close()
+            self.ui(self.root.destroy)
+        
+        threading.Thread(target=stop_and_close, daemon=True).start()
+
+def main():
+    # Loudness analysis runs in spawned processes; frozen builds must route them here
+    multiprocessing.freeze_support()
+    missing = missing_dependencies()
+    if missing:
+        msg = f"Missing packages: {', '.join(missing)}\n\nRun: pip install {' '.join(missing)}"
+        print(msg, file=sys.stderr)
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showerror("Missing Dependency", msg)
+        sys.exit(1)
+    
+    root = tk.Tk()
+    app = YTDownloader(root)
+    # URL lists given on the command line or piped in: python yt_app.py links.txt < more.txt
+    for source in sys.argv[1:]:
+        app.engine.ingest_async(source)
+    if sys.stdin is not None and not sys.stdin.isatty():
+        app.engine.ingest_async('-')
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Persistent download history keyed by canonical video ID (SQLite, WAL mode)"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from yt_common import Database
+
+HISTORY_PATH = Path.home() / ".cache" / "yt_downloader" / "history.sqlite3"
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+SYNCED = "synced"
+
+# Status writes are buffered and committed in one transaction this often
+FLUSH_INTERVAL = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    path TEXT,
+    size INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    title TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS playlists (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    synced REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+UPSERT = (
+    "INSERT INTO history (key, url, status, path, size, created, updated, title) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET url = excluded.url, status = excluded.status, "
+    "path = COALESCE(excluded.path, path), size = COALESCE(excluded.size, size), "
+    "updated = excluded.updated, title = COALESCE(excluded.title, title)"
+)
+
+
+def _migrate(conn):
+    """Bring a history file from an older version up to SCHEMA"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+    if 'title' not in columns:
+        conn.execute("ALTER TABLE history ADD COLUMN title TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS history_status ON history (status) "
+                 "WHERE status IN ('queued', 'downloading')")
+
+
+class DownloadHistory:
+    """On-disk index of every video we've seen, doubling as the crash-safe job journal
+
+    Nothing is loaded into memory: the database is opened on first use and every
+    "already have it?" check is a single primary-key lookup, so startup and lookups
+    stay flat as the history grows to hundreds of thousands of rows.
+
+    Status writes go to an in-memory buffer that lookups consult first; a background
+    thread commits it every FLUSH_INTERVAL in one transaction, so enqueuing thousands
+    of URLs costs a handful of commits instead of one fsync each.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = Path(path)
+        self._db = Database(self.path, SCHEMA, setup=_migrate)
+        self._lock = threading.Lock()
+        self._buffer = {}
+        self._dirty = threading.Event()
+        self._flusher = None
+
+    def status(self, key):
+        """Return the recorded status for key, or None if never seen"""
+        with self._lock:
+            if key in self._buffer:
+                return self._buffer[key][2]
+            row = self._db().execute(
+                "SELECT status FROM history WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def have(self, key):
+        """True if key was already downloaded successfully"""
+        return self.status(key) == DONE
+
+    def get(self, key):
+        """Return the full record for key as a dict, or None"""
+        self.flush()
+        with self._lock:
+            cur = self._db().execute("SELECT * FROM history WHERE key = ?", (key,))
+            row = cur.fetchone()
+            if not row:
+                return None
+            return dict(zip([c[0] for c in cur.description], row))
+
+    def mark(self, key, url, status, path=None, size=None, title=None):
+        """Insert or update the record for key"""
+        self.mark_many([(key, url)], status, path, size, title)
+
+    def mark_many(self, items, status, path=None, size=None, title=None):
+        """Insert or update (key, url) pairs with one status, in a single transaction"""
+        now = time.time()
+        path = str(path) if path else None
+        with self._lock:
+            for key, url in items:
+                old = self._buffer.get(key)
+                if old:
+                    self._buffer[key] = (key, url, status, path or old[3],
+                                         size if size is not None else old[4], old[5], now,
+                                         title or old[7])
+                else:
+                    self._buffer[key] = (key, url, status, path, size, now, now, title)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True,
+                                                 name="history-flush")
+                self._flusher.start()
+        self._dirty.set()
+
+    def _flush_loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(FLUSH_INTERVAL)
+            self._dirty.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"History flush error: {e}")
+
+    def flush(self):
+        """Commit buffered status writes in a single transaction"""
+        with self._lock:
+            if not self._buffer:
+                return
+            rows = list(self._buffer.values())
+            db = self._db()
+            with db:
+                db.execute("BEGIN")
+                db.executemany(UPSERT, rows)
+            self._buffer.clear()
+
+    def unfinished(self):
+        """Return [(key, url)] of jobs that were queued or in flight, oldest first"""
+        self.flush()
+        with self._lock:
+            # Literal statuses so SQLite can use the partial index
+            return self._db().execute(
+                "SELECT key, url FROM history WHERE status IN ('queued', 'downloading') "
+                "ORDER BY created").fetchall()
+
+    def mark_playlist(self, key, url, entries):
+        """Remember a followed playlist and when it was last expanded"""
+        self.mark(key, url, SYNCED)
+        self.flush()
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO playlists (key, url, entries, synced) VALUES (?, ?, ?, ?)",
+                (key, url, entries, time.time()))
+
+    def playlists(self):
+        """Return [(key, url)] for every followed playlist, least recently synced first"""
+        self.flush()
+        with self._lock:
+            return self._db().execute(
+                "SELECT key, url FROM playlists ORDER BY synced").fetchall()
+
+    def count(self, status=DONE):
+        self.flush()
+        with self._lock:
+            return self._db().execute(
+                "SELECT COUNT(*) FROM history WHERE status = ?", (status,)).fetchone()[0]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
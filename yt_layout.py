@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Output layout: which subfolder each finished file goes to, and publishing it there
+
+Downloads and transcodes happen in a staging folder; only finished audio is moved into
+the output tree, so the folders people browse and sync never hold .part or .webm files
+and a file is either absent or complete. A layout is a folder template over a few
+fields, e.g. "{hash}" (256 evenly filled folders) or "{uploader}/{year}".
+"""
+import errno
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+
+FLAT = ""
+BY_HASH = "{hash}"
+BY_UPLOADER = "{uploader}/{year}"
+LAYOUTS = {'flat': FLAT, 'hash': BY_HASH, 'uploader': BY_UPLOADER}
+
+# Default staging folder name inside the output folder (a dot folder, so the library
+# index and sync tools that skip hidden files ignore it)
+STAGING_NAME = ".staging"
+
+# Numbered names tried when the target name is taken ("Title (2) [id].mp3")
+MAX_COLLISIONS = 100
+
+# Copies to another filesystem are written under this suffix next to the target first
+PUBLISH_SUFFIX = '.publish.part'
+
+UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+ID_SUFFIX = re.compile(r'( \[[\w-]{11}\])$')
+RESERVED = {'CON', 'PRN', 'AUX', 'NUL', *(f'COM{i}' for i in range(1, 10)),
+            *(f'LPT{i}' for i in range(1, 10))}
+UNKNOWN = "Unknown"
+SAMPLE = {'hash': '00', 'uploader': UNKNOWN, 'year': UNKNOWN}
+
+
+def parse_layout(text):
+    """Layout name (flat, hash, uploader) or template -> template; ValueError if invalid"""
+    template = LAYOUTS.get(text, text).strip('/')
+    try:
+        template.format(**SAMPLE)
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f"bad layout {text!r}: fields are {', '.join(SAMPLE)} ({e})")
+    return template
+
+
+def safe_part(text, limit=80):
+    """One path component that is valid on Windows, macOS and Linux"""
+    text = UNSAFE_CHARS.sub('_', str(text)).strip(' .')[:limit].strip(' .')
+    if text.split('.')[0].upper() in RESERVED:
+        text += '_'
+    return text or UNKNOWN
+
+
+def numbered(path, n):
+    """path for n == 1, else the same name with " (n)" before the ID and extension"""
+    if n == 1:
+        return path
+    stem, suffix = os.path.splitext(path.name)
+    match = ID_SUFFIX.search(stem)
+    if match:
+        stem = f"{stem[:match.start()]} ({n}){match.group(1)}"
+    else:
+        stem = f"{stem} ({n})"
+    return path.with_name(stem + suffix)
+
+
+class OutputLayout:
+    """Maps a video to its folder in the output tree and moves finished files there"""
+
+    def __init__(self, template=BY_HASH):
+        self.template = parse_layout(template)
+
+    def folder(self, output_dir, key, info=None):
+        """Output subfolder for a job (info supplies uploader and year when known)"""
+        if not self.template:
+            return Path(output_dir)
+        info = info or {}
+        video_id = info.get('id') or key.split(':', 1)[-1]
+        date = str(info.get('upload_date') or info.get('release_date') or '')
+        fields = {
+            # Hex, so case-insensitive filesystems can't merge two folders
+            'hash': hashlib.md5(video_id.encode()).hexdigest()[:2],
+            'uploader': safe_part(info.get('uploader') or info.get('channel')
+                                  or info.get('uploader_id') or UNKNOWN),
+            'year': date[:4] if date[:4].isdigit() else UNKNOWN,
+        }
+        return Path(output_dir).joinpath(*(safe_part(part) for part in
+                                           self.template.format(**fields).split('/')))
+
+    def publish(self, src, folder):
+        """Move src into folder under its own name, never replacing a file already there;
+        returns the final path
+
+        Within one filesystem this is a hard link plus unlink (or a rename where links
+        aren't supported), so the file appears complete in one step. From another
+        filesystem (staging on tmpfs or a local SSD) it is first copied next to the
+        target under a temporary name.
+        """
+        src = Path(src)
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        try:
+            return self._place(src, folder / src.name)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        temp = folder / f".{src.name}{PUBLISH_SUFFIX}"
+        try:
+            shutil.copyfile(src, temp)
+            shutil.copystat(src, temp)
+            path = self._place(temp, folder / src.name)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+        src.unlink(missing_ok=True)
+        return path
+
+    def _place(self, src, dst):
+        for n in range(1, MAX_COLLISIONS + 1):
+            candidate = numbered(dst, n)
+            try:
+                # Fails instead of replacing, unlike a rename
+                os.link(src, candidate)
+            except FileExistsError:
+                continue
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    raise
+                # No hard links here (FAT, some network shares): check, then rename
+                if candidate.exists():
+                    continue
+                os.replace(src, candidate)
+                return candidate
+            os.unlink(src)
+            return candidate
+        raise FileExistsError(errno.EEXIST, f"{MAX_COLLISIONS} files named like", str(dst))
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Shared job table for several instances (or hosts) writing to one output folder
+
+Every instance downloading into the same folder - another window, a daemon, a machine
+mounting it over NFS - opens the same SQLite file there. A video is downloaded by the
+instance holding its lease; leases are renewed by a heartbeat and expire when their
+holder dies, after which any instance may reclaim the job. The same heartbeat keeps a
+row per running instance, so others know whose staging files are still in use.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from yt_common import Database
+from yt_history import QUEUED, DONE
+
+LEASED = "leased"
+
+# Lives in the output folder, so everyone writing there shares it
+LEASES_NAME = ".yt_jobs.sqlite3"
+
+# A lease not renewed for LEASE_TTL seconds is considered abandoned. Hosts compare
+# lease_until against their own clocks, so keep them roughly in sync (NTP)
+LEASE_TTL = 90
+RENEW_INTERVAL = 30
+
+# Writers wait this long for another instance's transaction before giving up
+BUSY_TIMEOUT = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    owner TEXT,
+    lease_until REAL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, updated);
+CREATE TABLE IF NOT EXISTS instances (
+    owner TEXT PRIMARY KEY,
+    alive_until REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class JobLeases:
+    """This instance's view of the fleet-wide job table
+
+    offer() publishes newly queued jobs and reports the ones another instance has or
+    had; claim() takes a job's lease before downloading; finish() records the outcome.
+    If the database can't be used (e.g. a filesystem without working locks) the error
+    is logged once and every call behaves as if this were the only instance.
+    """
+
+    def __init__(self, folder, log=print, on_lost=None, enabled=True):
+        self.path = Path(folder) / LEASES_NAME
+        self.log = log
+        self.on_lost = on_lost
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.held = set()
+        # Rollback journal, not WAL: WAL needs shared memory, which NFS clients can't share
+        self._db = Database(self.path, SCHEMA, wal=False, timeout=BUSY_TIMEOUT)
+        self._disabled = not enabled
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return not self._disabled
+
+    def _run(self, work, default=None):
+        """Run work(db) in one immediate transaction; default if coordination is off"""
+        with self._lock:
+            if self._disabled:
+                return default
+            try:
+                db = self._db()
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    result = work(db, time.time())
+                except BaseException:
+                    if db.in_transaction:
+                        db.execute("ROLLBACK")
+                    raise
+                db.execute("COMMIT")
+                return result
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    return self._disable(e, default)
+                # Contention beyond BUSY_TIMEOUT: carry on alone for this one call
+                self.log(f"[!] Shared job table busy: {str(e)[:50]}")
+                return default
+            except sqlite3.Error as e:
+                return self._disable(e, default)
+
+    def _disable(self, error, default):
+        self._disabled = True
+        self.log(f"[!] Shared job table unavailable ({str(error)[:50]}): "
+                 f"not coordinating with other instances")
+        return default
+
+    def offer(self, links):
+        """Publish (key, url) jobs; returns {key: state} for those another instance
+        holds a live lease on or has finished"""
+        def work(db, now):
+            taken = {}
+            for key, url in links:
+                row = db.execute("SELECT state, owner, lease_until FROM jobs WHERE key = ?",
+                                 (key,)).fetchone()
+                if row is None:
+                    db.execute("INSERT INTO jobs (key, url, state, owner, updated) "
+                               "VALUES (?, ?, ?, ?, ?)", (key, url, QUEUED, self.owner, now))
+                elif row[0] == DONE:
+                    taken[key] = DONE
+                elif row[0] == LEASED and row[1] != self.owner and row[2] > now:
+                    taken[key] = LEASED
+                elif row[0] != LEASED:
+                    # Failed or cancelled elsewhere: an explicit new request tries again
+                    db.execute("UPDATE jobs SET state = ?, owner = ?, updated = ? WHERE key = ?",
+                               (QUEUED, self.owner, now, key))
+            return taken
+        return self._run(work, {}) if links else {}
+
+    def claim(self, key, url):
+        """Take key's lease; None on success, else the state that prevented it"""
+        def work(db, now):
+            row = db.execute("SELECT state, owner, lease_until FROM jobs WHERE key = ?",
+                             (key,)).fetchone()
+            if row and row[0] == DONE:
+                return DONE
+            if row and row[0] == LEASED and row[1] != self.owner and row[2] > now:
+                return LEASED
+            db.execute("INSERT OR REPLACE INTO jobs (key, url, state, owner, lease_until, updated) "
+                       "VALUES (?, ?, ?, ?, ?, ?)",
+                       (key, url, LEASED, self.owner, now + LEASE_TTL, now))
+            return None
+        blocked = self._run(work)
+        if blocked is None:
+            self.held.add(key)
+        return blocked
+
+    def reclaim(self, limit):
+        """Claim up to limit jobs nobody is working on: queued by another instance (which
+        skips them when its worker gets there) or leased by one that died; returns [(url, key)]"""
+        def work(db, now):
+            rows = db.execute(
+                "SELECT key, url FROM jobs WHERE owner IS NOT ? AND "
+                "(state = ? OR (state = ? AND lease_until < ?)) ORDER BY updated LIMIT ?",
+                (self.owner, QUEUED, LEASED, now, limit)).fetchall()
+            for key, url in rows:
+                db.execute("UPDATE jobs SET state = ?, owner = ?, lease_until = ?, updated = ? "
+                           "WHERE key = ?", (LEASED, self.owner, now + LEASE_TTL, now, key))
+            return [(url, key) for key, url in rows]
+        claimed = self._run(work, []) if limit > 0 else []
+        self.held.update(key for url, key in claimed)
+        return claimed
+
+    def finish(self, key, state):
+        """Record a job's final state (done, failed, cancelled) and drop its lease"""
+        self.held.discard(key)
+        self._run(lambda db, now: db.execute(
+            "UPDATE jobs SET state = ?, owner = NULL, lease_until = NULL, updated = ? "
+            "WHERE key = ? AND (owner = ? OR state != ?)", (state, now, key, self.owner, LEASED)))
+
+    def release(self, key):
+        """Give a job back to the fleet unfinished (we're stopping)"""
+        self.held.discard(key)
+        self._run(lambda db, now: db.execute(
+            "UPDATE jobs SET state = ?, owner = NULL, lease_until = NULL, updated = ? "
+            "WHERE key = ? AND owner = ?", (QUEUED, now, key, self.owner)))
+
+    def renew(self):
+        """Extend our heartbeat and every lease we hold; leases lost meanwhile go to on_lost"""
+        def work(db, now):
+            db.execute("INSERT OR REPLACE INTO instances (owner, alive_until) VALUES (?, ?)",
+                       (self.owner, now + LEASE_TTL))
+            if not self.held:
+                return set()
+            db.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND state = ?",
+                       (now + LEASE_TTL, self.owner, LEASED))
+            return {row[0] for row in db.execute(
+                "SELECT key FROM jobs WHERE owner = ? AND state = ?", (self.owner, LEASED))}
+        ours = self._run(work)
+        if ours is None:
+            return
+        lost = self.held - ours
+        self.held &= ours
+        if lost and self.on_lost:
+            self.on_lost(lost)
+
+    def live_owners(self):
+        """Owners of every instance whose heartbeat hasn't expired, ours included; None if
+        coordination is off or the table can't be read"""
+        return self._run(lambda db, now: {row[0] for row in db.execute(
+            "SELECT owner FROM instances WHERE alive_until > ?", (now,))})
+
+    def start(self):
+        """Renew our heartbeat and leases every RENEW_INTERVAL until close()"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                self.renew()
+                self._stop.wait(RENEW_INTERVAL)
+
+        self._thread = threading.Thread(target=loop, daemon=True, name="lease-heartbeat")
+        self._thread.start()
+
+    def close(self):
+        """Stop the heartbeat and hand back every lease still held"""
+        self._stop.set()
+        for key in list(self.held):
+            self.release(key)
+        self._run(lambda db, now: db.execute("DELETE FROM instances WHERE owner = ?",
+                                             (self.owner,)))
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""Index of the audio already in the output tree, keyed by the video ID in each filename"""
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+
+from yt_common import STOP_CHECK
+from yt_layout import PUBLISH_SUFFIX
+from yt_segments import TEMP_SUFFIX, STATE_SUFFIX
+
+# "Title [dQw4w9WgXcQ].mp3" - the ID the output template puts before the extension
+ID_IN_NAME = re.compile(r'\[([\w-]{11})\]\.[^.]+$')
+
+# Work files are not finished audio: yt-dlp's, the segmented downloader's and interrupted
+# publishes'. Only name endings count, so a title with ".part" or ".temp." in it is
+# still audio
+TEMP_SUFFIXES = ('.part', '.ytdl', TEMP_SUFFIX, STATE_SUFFIX, PUBLISH_SUFFIX)
+# ...plus yt-dlp's fragments ("x.part-Frag3") and ffmpeg's outputs ("x.temp.mp3")
+TEMP_ENDINGS = re.compile(r'\.part-Frag\d+(?:\.part)?$|\.temp\.[^.]+$')
+
+# Without inotify the folder's mtime is checked this often; it only changes when
+# entries are added, removed or renamed, so an unchanged folder is never rescanned
+POLL_INTERVAL = 5.0
+
+# Subfolder levels indexed below the output folder (layouts like uploader/year use two)
+MAX_DEPTH = 3
+
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_temp(name):
+    """True for a download, transcode or publish work file (by name)"""
+    return name.endswith(TEMP_SUFFIXES) or TEMP_ENDINGS.search(name) is not None
+
+
+def video_id_of(name):
+    """Video ID embedded in a filename, or None"""
+    if is_temp(name):
+        return None
+    match = ID_IN_NAME.search(name)
+    return match.group(1) if match else None
+
+
+class _Inotify:
+    """Minimal ctypes binding for inotify watches on a set of folders (Linux)"""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, path):
+        """Watch path; returns its watch descriptor (the same one if already watched)"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        return wd
+
+    def read(self, timeout):
+        """Return [(wd, mask, name)] for pending events, waiting up to timeout"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _depth(rel):
+    return rel.count('/') + 1 if rel else 0
+
+
+def _ignored(name):
+    # Dot files are ours (the shared job table, the staging folder) or the OS's, never audio
+    return name.startswith('.') or is_temp(name)
+
+
+class OutputIndex:
+    """video ID -> file for one output tree, kept current in the background
+
+    The first scan only lists names (no per-file stat), so 100k files take a fraction
+    of a second, and it runs on its own thread. Subfolders of a sharded layout are
+    walked down to MAX_DEPTH; paths are stored relative to the output folder. After
+    that, inotify events (Linux, one watch per folder) or a check of the folders'
+    mtimes apply changes; polling re-lists only the folders that changed. Files from before IDs were put in filenames are indexed by
+    name stem for title matching.
+    """
+
+    def __init__(self, folder, log=print):
+        self.folder = Path(folder)
+        self.log = log
+        self.ids = {}
+        self.stems = {}
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._mtimes = {}
+        self._watch = None
+        self._dirs = {}
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="output-index").start()
+
+    def close(self):
+        self._stop.set()
+
+    def find(self, video_id, stem=None):
+        """Path of the file for video_id (or a legacy file named stem), or None"""
+        name = self.ids.get(video_id)
+        if name:
+            return self.folder / name
+        name = self.stems.get(stem) if stem else None
+        if name:
+            return self.folder / name
+        return None
+
+    def add(self, path):
+        """Record a file we just wrote, without waiting for the watcher"""
+        try:
+            rel = Path(path).relative_to(self.folder).as_posix()
+        except ValueError:
+            return
+        self._apply(IN_CREATE, rel, self.ids, self.stems)
+
+    def _apply(self, mask, rel, ids, stems):
+        name = rel.rsplit('/', 1)[-1]
+        if _ignored(name):
+            return
+        video_id = video_id_of(name)
+        present = not mask & (IN_DELETE | IN_MOVED_FROM)
+        if video_id:
+            if present:
+                ids[video_id] = rel
+            elif ids.get(video_id) == rel:
+                del ids[video_id]
+        elif present:
+            stems[os.path.splitext(name)[0]] = rel
+        else:
+            stems.pop(os.path.splitext(name)[0], None)
+
+    def _forget(self, prefix):
+        """Drop everything under a folder that was moved or deleted"""
+        prefix += '/'
+        for table in (self.ids, self.stems):
+            for key in [k for k, rel in list(table.items()) if rel.startswith(prefix)]:
+                del table[key]
+        for rel in [rel for rel in self._mtimes if rel.startswith(prefix)]:
+            del self._mtimes[rel]
+
+    def _walk(self, rel, ids, stems):
+        """Index one folder (rel '' is the output folder) and its subfolders"""
+        path = self.folder / rel if rel else self.folder
+        if self._watch:
+            try:
+                # Watch before listing, so nothing created meanwhile is missed
+                self._dirs[self._watch.add(path)] = rel
+            except OSError as e:
+                # Usually fs.inotify.max_user_watches: fall back to polling
+                self.log(f"[!] Output folder watch failed, polling instead: {str(e)[:50]}")
+                self._watch = None
+        self._mtimes[rel] = os.stat(path).st_mtime_ns
+        depth = _depth(rel)
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                child = f"{rel}/{name}" if rel else name
+                if name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    if depth < MAX_DEPTH:
+                        try:
+                            self._walk(child, ids, stems)
+                        except OSError:
+                            pass
+                    continue
+                self._apply(IN_CREATE, child, ids, stems)
+
+    def scan(self):
+        """Rebuild the index from a listing of the output tree"""
+        ids, stems = {}, {}
+        self._mtimes, self._dirs = {}, {}
+        try:
+            self._walk('', ids, stems)
+        except OSError as e:
+            self.log(f"[!] Output folder scan failed: {str(e)[:60]}")
+        self.ids, self.stems = ids, stems
+        self.ready.set()
+
+    def _run(self):
+        if sys.platform.startswith('linux'):
+            try:
+                self._watch = _Inotify()
+            except (OSError, AttributeError, TypeError):
+                self._watch = None
+        watch = self._watch
+        self.scan()
+        self.log(f"[*] Output folder indexed: {len(self.ids)} tagged files, "
+                 f"{len(self.stems)} others")
+        try:
+            if self._watch:
+                self._watch_events()
+            if not self._stop.is_set() and self._watch is None:
+                self._poll()
+        finally:
+            if watch:
+                watch.close()
+
+    def _watch_events(self):
+        while self._watch and not self._stop.is_set():
+            for wd, mask, name in self._watch.read(STOP_CHECK):
+                if mask & IN_Q_OVERFLOW:
+                    self.scan()
+                    continue
+                rel = self._dirs.get(wd)
+                if rel is None:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    if not rel:
+                        self.log(f"[!] Output folder went away: {self.folder}")
+                        self._stop.set()
+                        return
+                    del self._dirs[wd]
+                    continue
+                if not name or name.startswith('.'):
+                    continue
+                child = f"{rel}/{name}" if rel else name
+                if not mask & IN_ISDIR:
+                    self._apply(mask, child, self.ids, self.stems)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._forget(child)
+                elif _depth(rel) < MAX_DEPTH:
+                    # A new shard folder: it may already hold files
+                    try:
+                        self._walk(child, self.ids, self.stems)
+                    except OSError:
+                        pass
+
+    def _refresh(self, rel):
+        """Re-list one folder whose mtime changed: its files, and subfolders that came or went"""
+        path = self.folder / rel if rel else self.folder
+        prefix = f"{rel}/" if rel else ''
+        try:
+            # Read before listing, so a change made meanwhile is seen on the next check
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as entries:
+                listing = {entry.name: entry.is_dir() for entry in entries
+                           if not entry.name.startswith('.')}
+        except OSError:
+            if rel:
+                self._forget(rel)
+                self._mtimes.pop(rel, None)
+            return
+        self._mtimes[rel] = mtime
+        for table in (self.ids, self.stems):
+            for key, child in list(table.items()):
+                name = child[len(prefix):]
+                if child.startswith(prefix) and '/' not in name and name not in listing:
+                    del table[key]
+        for child in [c for c in self._mtimes if c.startswith(prefix) and c != rel
+                      and '/' not in c[len(prefix):] and c[len(prefix):] not in listing]:
+            self._forget(child)
+            del self._mtimes[child]
+        for name, is_dir in listing.items():
+            child = prefix + name
+            if not is_dir:
+                self._apply(IN_CREATE, child, self.ids, self.stems)
+            elif child not in self._mtimes and _depth(rel) < MAX_DEPTH:
+                try:
+                    self._walk(child, self.ids, self.stems)
+                except OSError:
+                    pass
+
+    def _poll(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            for rel, mtime in list(self._mtimes.items()):
+                try:
+                    changed = os.stat(self.folder / rel).st_mtime_ns != mtime
+                except OSError:
+                    changed = True
+                if changed:
+                    self._refresh(rel)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Thread-safe log pipeline: lines queued for batched UI drains plus a rotating log file"""
+import logging
+import logging.handlers
+from datetime import datetime
+from pathlib import Path
+from queue import SimpleQueue, Empty
+
+LOG_PATH = Path.home() / ".cache" / "yt_downloader" / "yt_downloader.log"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+
+class LogPipeline:
+    """Any thread may write(); the UI thread drain()s lines in batches
+
+    The full log goes to a rotating file through a QueueHandler, so the disk write
+    happens on the listener thread, never on a worker or the Tk thread.
+    """
+
+    def __init__(self, path=LOG_PATH, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.lines = SimpleQueue()
+        self._logger = logging.getLogger("yt_downloader")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._listener = None
+        if path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+            except OSError as e:
+                print(f"Log file error: {e}")
+            else:
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                file_queue = SimpleQueue()
+                self._logger.addHandler(logging.handlers.QueueHandler(file_queue))
+                self._listener = logging.handlers.QueueListener(file_queue, handler)
+                self._listener.start()
+
+    def write(self, msg):
+        time_str = datetime.now().strftime("%H:%M:%S")
+        self.lines.put(f"[{time_str}] {msg}")
+        self._logger.info(msg)
+
+    def drain(self, limit):
+        """Return up to limit queued lines without blocking"""
+        batch = []
+        try:
+            while len(batch) < limit:
+                batch.append(self.lines.get_nowait())
+        except Empty:
+            pass
+        return batch
+
+    def close(self):
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Loudness stage: EBU R128 measurement and ReplayGain tags, cached by file content
+
+Each file is decoded once: ffmpeg resamples to 48 kHz and applies the BS.1770
+K-weighting filters, and the gated block loudness is computed with vectorized NumPy
+in a process pool. The result becomes ReplayGain tags written by the transcode pass
+that runs anyway (or, for MP3, a gain applied in that same encode). Tag an existing
+library - only files not analyzed before are decoded:
+
+    python -m yt_loudness [folder]
+"""
+import hashlib
+import math
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from yt_common import Database
+from yt_tools import has_module
+
+LOUDNESS_PATH = Path.home() / ".cache" / "yt_downloader" / "loudness.sqlite3"
+
+OFF = None
+TAG = "tag"
+APPLY = "apply"
+
+# ReplayGain 2.0 reference level; Opus R128 gain tags are relative to EBU R128's -23 LUFS
+TARGET_LUFS = -18.0
+R128_LUFS = -23.0
+
+# BS.1770: 400 ms blocks every 100 ms, absolute gate -70 LUFS, relative gate -10 LU
+RATE = 48000
+STEP_FRAMES = RATE // 10
+ABS_GATE = -70.0
+REL_GATE = -10.0
+
+# K-weighting at 48 kHz (ITU-R BS.1770-4): high shelf, then high pass
+K_WEIGHTING = (
+    "biquad=b0=1.53512485958697:b1=-2.69169618940638:b2=1.19839281085285"
+    ":a0=1:a1=-1.69065929318241:a2=0.73248077421585,"
+    "biquad=b0=1:b1=-2:b2=1:a0=1:a1=-1.99004745483398:a2=0.99007225036621"
+)
+# Mono and surround are measured as stereo (how they are played back here): channels
+# 0-1 carry the plain samples for the peak, 2-3 the K-weighted ones
+FILTER = (f"[0:a:0]aresample={RATE},aformat=sample_fmts=flt:channel_layouts=stereo,"
+          f"asplit[raw][k];[k]{K_WEIGHTING}[kw];[raw][kw]amerge=inputs=2[out]")
+CHANNELS = 4
+
+# Decoded audio is read this many 100 ms steps at a time (about 4 MB)
+READ_STEPS = 50
+ANALYSIS_TIMEOUT = 600
+
+# Audio the library scan tags
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.opus', '.ogg', '.webm', '.flac', '.mka')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS loudness (
+    hash TEXT PRIMARY KEY,
+    lufs REAL,
+    peak REAL NOT NULL,
+    tagged INTEGER NOT NULL,
+    analyzed REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def gated_loudness(powers):
+    """Integrated loudness (LUFS) from per-100 ms K-weighted mean squares, or None if silent"""
+    import numpy as np
+    if len(powers) < 4:
+        return None
+    total = np.concatenate(([0.0], np.cumsum(powers)))
+    blocks = (total[4:] - total[:-4]) / 4
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(blocks)
+    blocks, loudness = blocks[loudness > ABS_GATE], loudness[loudness > ABS_GATE]
+    if not len(blocks):
+        return None
+    relative = -0.691 + 10 * np.log10(blocks.mean()) + REL_GATE
+    return float(-0.691 + 10 * np.log10(blocks[loudness > relative].mean()))
+
+
+# The ffmpeg decoding in this pool process, if any
+_decoder = None
+
+
+def _init_worker():
+    """Pool process setup: when abort() terminates the process, take its ffmpeg along"""
+    def terminated(signum, frame):
+        if _decoder is not None:
+            _decoder.kill()
+        os._exit(1)
+
+    if hasattr(signal, 'SIGTERM') and os.name != 'nt':
+        signal.signal(signal.SIGTERM, terminated)
+
+
+def analyze(ffmpeg, path):
+    """Decode path once; returns (integrated LUFS or None, sample peak). Runs in the pool"""
+    import numpy as np
+    cmd = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin', '-i', str(path),
+           '-filter_complex', FILTER, '-map', '[out]', '-f', 'f32le', '-c:a', 'pcm_f32le', '-']
+    global _decoder
+    proc = _decoder = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       stdin=subprocess.DEVNULL)
+    errors = deque(maxlen=5)
+    stderr_thread = threading.Thread(target=errors.extend, args=(proc.stderr,), daemon=True)
+    stderr_thread.start()
+    timer = threading.Timer(ANALYSIS_TIMEOUT, proc.kill)
+    timer.start()
+
+    step_bytes = STEP_FRAMES * CHANNELS * 4
+    powers, peak, rest = [], 0.0, b''
+    try:
+        while True:
+            data = proc.stdout.read(step_bytes * READ_STEPS)
+            if not data:
+                break
+            buf = rest + data
+            usable = len(buf) // step_bytes * step_bytes
+            rest = buf[usable:]
+            if not usable:
+                continue
+            steps = np.frombuffer(buf, dtype='<f4', count=usable // 4).reshape(
+                -1, STEP_FRAMES, CHANNELS)
+            peak = max(peak, float(np.abs(steps[:, :, :2]).max()))
+            weighted = steps[:, :, 2:].astype(np.float64)
+            # Mean square per 100 ms step, summed over both channels (weight 1.0 each)
+            powers.append(np.einsum('sfc,sfc->s', weighted, weighted) / STEP_FRAMES)
+    finally:
+        proc.wait()
+        _decoder = None
+        timer.cancel()
+        stderr_thread.join()
+    if proc.returncode != 0:
+        error = errors[-1].decode('utf-8', 'replace').strip() if errors else "ffmpeg failed"
+        raise RuntimeError(error[:70])
+    return gated_loudness(np.concatenate(powers) if powers else np.empty(0)), peak
+
+
+def content_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Loudness:
+    """Measure files in a process pool and turn the results into ffmpeg arguments
+
+    Results are cached by content hash. Files this stage wrote its tags into are cached
+    too (tagged), so a library scan skips them without decoding anything.
+    """
+
+    def __init__(self, ffmpeg, mode=TAG, workers=None, path=LOUDNESS_PATH, log=print):
+        self.ffmpeg = ffmpeg
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 2
+        self.path = Path(path)
+        self.log = log
+        self._pool = None
+        self._db = Database(self.path, SCHEMA)
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: forking a process full of threads can deadlock the child
+                self._pool = ProcessPoolExecutor(self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker)
+            return self._pool
+
+    def cached(self, digest):
+        """(lufs, peak, tagged) for a content hash, or None"""
+        with self._lock:
+            row = self._db().execute("SELECT lufs, peak, tagged FROM loudness WHERE hash = ?",
+                                     (digest,)).fetchone()
+        return (row[0], row[1], bool(row[2])) if row else None
+
+    def remember(self, digest, lufs, peak, tagged=False):
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO loudness VALUES (?, ?, ?, ?, ?)",
+                               (digest, lufs, peak, int(tagged), time.time()))
+
+    def measure(self, path):
+        """(lufs, peak) for path - from the cache, else decoded in the pool"""
+        digest = content_hash(path)
+        hit = self.cached(digest)
+        if hit:
+            return hit[:2]
+        lufs, peak = self._executor().submit(analyze, self.ffmpeg, str(path)).result()
+        self.remember(digest, lufs, peak)
+        return lufs, peak
+
+    def gain(self, lufs, peak, reencode):
+        """(gain to apply in the encode, gain left for the tags) in dB"""
+        if lufs is None:
+            return 0.0, 0.0
+        gain = TARGET_LUFS - lufs
+        if self.mode != APPLY or not reencode:
+            return 0.0, gain
+        # Never push the loudest sample past full scale
+        applied = min(gain, -20 * math.log10(peak)) if peak > 0 else gain
+        return applied, gain - applied
+
+    def ffmpeg_args(self, lufs, peak, suffix, reencode):
+        """(filter and metadata arguments, gain applied in dB) for the transcode pass
+        that writes suffix"""
+        applied, remaining = self.gain(lufs, peak, reencode)
+        applied = round(applied, 2)
+        args = ['-af', f"volume={applied:.2f}dB"] if applied else []
+        if lufs is None:
+            return args, applied
+        peak *= 10 ** (applied / 20)
+        args += ['-metadata', f"REPLAYGAIN_TRACK_GAIN={remaining:+.2f} dB",
+                 '-metadata', f"REPLAYGAIN_TRACK_PEAK={peak:.6f}"]
+        if suffix == '.opus':
+            # RFC 7845: Q7.8 fixed point, relative to -23 LUFS
+            r128 = round((R128_LUFS - lufs - applied) * 256)
+            args += ['-metadata', f"R128_TRACK_GAIN={max(-32768, min(32767, r128))}"]
+        if suffix in ('.m4a', '.mp4'):
+            # Otherwise the MP4 muxer drops keys it doesn't know
+            args += ['-movflags', 'use_metadata_tags']
+        return args, applied
+
+    def written(self, path, lufs, peak, applied):
+        """Cache a file just written with this stage's tags, so it is never re-analyzed"""
+        try:
+            self.remember(content_hash(path), None if lufs is None else lufs + applied,
+                          peak * 10 ** (applied / 20), tagged=True)
+        except OSError:
+            pass
+
+    def tag(self, path):
+        """Write ReplayGain tags into an existing file (stream copy, no re-encode);
+        returns False if it was already tagged"""
+        path = Path(path)
+        hit = self.cached(content_hash(path))
+        if hit and hit[2]:
+            return False
+        lufs, peak = hit[:2] if hit else self.measure(path)
+        args, _ = self.ffmpeg_args(lufs, peak, path.suffix.lower(), reencode=False)
+        tmp = path.with_name(f"{path.stem}.temp{path.suffix}")
+        cmd = [self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+               '-i', str(path), '-map', '0', '-map_metadata', '0', '-c', 'copy', *args, str(tmp)]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=ANALYSIS_TIMEOUT)
+        if result.returncode != 0:
+            tmp.unlink(missing_ok=True)
+            err = result.stderr.strip().split('\n')[-1][:70] if result.stderr else "ffmpeg failed"
+            raise RuntimeError(err)
+        os.replace(tmp, path)
+        self.written(path, lufs, peak, 0.0)
+        return True
+
+    def abort(self):
+        """Cancel queued analyses and terminate running ones (their measure() raises);
+        the next measure() starts a new pool"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            # No public way to stop a running task: its worker process is terminated
+            processes = list((pool._processes or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+
+    def close(self, timeout=None):
+        """Shut the pool down; analyses still running after timeout seconds are terminated"""
+        with self._lock:
+            pool = self._pool
+        if pool and timeout is not None:
+            processes = list((pool._processes or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            deadline = time.monotonic() + timeout
+            for process in processes:
+                process.join(max(0, deadline - time.monotonic()))
+            if any(process.is_alive() for process in processes):
+                self.abort()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
+
+
+def make_loudness(mode, ffmpeg, log=print):
+    """The loudness stage for mode (TAG/APPLY), or None if off or unavailable"""
+    if mode is OFF:
+        return None
+    if not ffmpeg:
+        log("[!] ffmpeg not found: loudness normalization disabled")
+        return None
+    if not has_module('numpy'):
+        log("[!] numpy not installed: loudness normalization disabled (pip install numpy)")
+        return None
+    return Loudness(ffmpeg, mode, log=log)
+
+
+def main(argv=None):
+    import argparse
+    from yt_engine import OUTPUT_DIR
+    from yt_transcode import find_ffmpeg
+
+    parser = argparse.ArgumentParser(prog="python -m yt_loudness",
+                                     description="Write ReplayGain tags into a folder of audio "
+                                                 "(and its subfolders)")
+    parser.add_argument('folder', nargs='?', default=str(OUTPUT_DIR))
+    args = parser.parse_args(argv)
+
+    stage = make_loudness(TAG, find_ffmpeg())
+    if not stage:
+        return 1
+    folder = Path(args.folder)
+    # The whole output tree (sharded layouts), minus dot files and folders like .staging
+    files = sorted(p for p in folder.rglob('*')
+                   if p.suffix.lower() in AUDIO_EXTENSIONS and p.is_file()
+                   and not any(part.startswith('.') for part in p.relative_to(folder).parts))
+    tagged = skipped = failed = 0
+    started = time.monotonic()
+    try:
+        # Threads only hash files, wait on the pool and run the tag remux
+        with ThreadPoolExecutor(stage.workers) as threads:
+            futures = {threads.submit(stage.tag, path): path for path in files}
+            for future, path in futures.items():
+                try:
+                    if future.result():
+                        tagged += 1
+                    else:
+                        skipped += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"[-] {path.name}: {str(e)[:70]}")
+    finally:
+        stage.close()
+    print(f"[+] {tagged} tagged, {skipped} already tagged, {failed} failed "
+          f"in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""On-disk cache of extracted video info, keyed by video ID (TTL + size-bounded LRU)"""
+import json
+import threading
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from yt_common import Database
+
+METADATA_PATH = Path.home() / ".cache" / "yt_downloader" / "metadata.sqlite3"
+
+# Title/duration/uploader stay valid for a long time; stream URLs expire within hours
+METADATA_TTL = 30 * 24 * 3600
+FORMAT_TTL = 5 * 3600
+FORMAT_EXPIRY_MARGIN = 10 * 60
+MAX_BYTES = 64 * 1024 * 1024
+
+# Bulky fields an audio download never needs
+DROP_FIELDS = ('automatic_captions', 'subtitles', 'thumbnails', 'heatmap', 'storyboards',
+               'requested_formats', 'requested_downloads', 'requested_subtitles')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    id TEXT PRIMARY KEY,
+    info BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched REAL NOT NULL,
+    formats_expire REAL NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed);
+"""
+
+
+def slim_info(info):
+    """Keep only what an audio download needs: drop captions/thumbnails and video formats"""
+    info = {k: v for k, v in info.items() if k not in DROP_FIELDS}
+    formats = info.get('formats')
+    if formats:
+        info['formats'] = [f for f in formats if f.get('vcodec') in (None, 'none')] or formats
+    return info
+
+
+def formats_expire(info, fetched):
+    """When the stream URLs in info stop working (YouTube puts expire= in each URL)"""
+    expires = fetched + FORMAT_TTL
+    for fmt in info.get('formats') or [info]:
+        url = fmt.get('url')
+        if not url:
+            continue
+        try:
+            expire = int(parse_qs(urlparse(url).query).get('expire', ['0'])[0])
+        except ValueError:
+            continue
+        if expire:
+            expires = min(expires, expire - FORMAT_EXPIRY_MARGIN)
+    return expires
+
+
+class MetadataCache:
+    """Extracted info dicts, zlib-compressed in SQLite
+
+    get() serves title/duration for METADATA_TTL; get(formats=True) only returns info
+    whose stream URLs are still valid, so a download can skip re-extraction. Total size
+    is capped at max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, path=METADATA_PATH, ttl=METADATA_TTL, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._db = Database(self.path, SCHEMA)
+        self._lock = threading.Lock()
+        self._total = None
+
+    def get(self, video_id, formats=False):
+        """Return the cached info for video_id, or None if missing/expired"""
+        info, fresh = self.lookup(video_id)
+        return info if fresh or not formats else None
+
+    def lookup(self, video_id):
+        """Return (info, formats_fresh); info is None if missing or past the TTL"""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT info, fetched, formats_expire FROM metadata WHERE id = ?",
+                             (video_id,)).fetchone()
+            if not row or now - row[1] > self.ttl:
+                return None, False
+            db.execute("UPDATE metadata SET accessed = ? WHERE id = ?", (now, video_id))
+        return json.loads(zlib.decompress(row[0])), now < row[2]
+
+    def put(self, video_id, info):
+        """Store a (JSON-serializable) info dict, evicting LRU entries past max_bytes"""
+        info = slim_info(info)
+        now = time.time()
+        blob = zlib.compress(json.dumps(info, separators=(',', ':')).encode(), 6)
+        with self._lock:
+            db = self._db()
+            if self._total is None:
+                self._total = db.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+            old = db.execute("SELECT size FROM metadata WHERE id = ?", (video_id,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)",
+                       (video_id, blob, len(blob), now, formats_expire(info, now), now))
+            self._total += len(blob) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict(db)
+
+    def _evict(self, db):
+        """Drop least recently used rows until the cache is back under 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        with db:
+            db.execute("BEGIN")
+            for video_id, size in db.execute(
+                    "SELECT id, size FROM metadata ORDER BY accessed").fetchall():
+                if self._total <= target:
+                    break
+                db.execute("DELETE FROM metadata WHERE id = ?", (video_id,))
+                self._total -= size
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Per-job phase timing aggregated into counters and histograms (Prometheus text / JSON)"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+METRICS_DIR = Path.home() / ".cache" / "yt_downloader"
+EXPORT_INTERVAL = 10
+
+# Phase durations in seconds
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# queue: enqueue -> worker picks it up; extract: -> first media byte;
+# download: -> last byte; postprocess: yt-dlp's own fixups/moves; transcode: our ffmpeg stage
+PHASES = ('queue', 'extract', 'download', 'postprocess', 'transcode', 'total')
+
+# Which phases point at which bottleneck
+BOUND_BY = {'queue': ('queue',), 'network': ('extract', 'download'),
+            'ffmpeg': ('postprocess', 'transcode')}
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+
+class Metrics:
+    """Engine event listener that timestamps each job's phases
+
+    Subscribe on_event to a DownloadEngine. gauges() is called at export time and
+    returns current values (queue length, active jobs, ...) as a dict.
+    """
+
+    def __init__(self, gauges=None):
+        self.gauges = gauges or dict
+        self.jobs = {}
+        self.counters = {'done': 0, 'failed': 0, 'skipped': 0, 'cancelled': 0, 'bytes': 0,
+                         'retries': 0}
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_event(self, event):
+        kind = event['event']
+        if kind == 'log':
+            return
+        now = time.monotonic()
+        key = event.get('key')
+        with self._lock:
+            if kind == 'queued':
+                # Playlists fan out into video jobs instead of finishing themselves
+                if not key.startswith("playlist:"):
+                    self.jobs[key] = {'queued': now, 'retries': 0}
+                return
+            job = self.jobs.get(key)
+            if job is None:
+                return
+            if kind == 'started':
+                # A second start of the same job is a retry
+                if 'started' in job:
+                    job['retries'] += 1
+                    self.counters['retries'] += 1
+                job['started'] = now
+                for mark in ('extracted', 'downloaded', 'postprocessed'):
+                    job.pop(mark, None)
+            elif kind == 'progress':
+                if event['phase'] == 'downloading':
+                    job.setdefault('extracted', now)
+                elif event['phase'] == 'post-processing':
+                    job.setdefault('extracted', now)
+                    job.setdefault('downloaded', now)
+            elif kind == 'downloaded':
+                job.setdefault('extracted', now)
+                job.setdefault('downloaded', now)
+                job['postprocessed'] = now
+                self.counters['bytes'] += event.get('bytes') or 0
+            elif kind == 'cancelled':
+                # Not a completed job: counted, but kept out of the phase timings
+                del self.jobs[key]
+                self.counters['cancelled'] += 1
+            elif kind in ('elsewhere', 'interrupted'):
+                # Another instance's job now, or ours again after a restart
+                del self.jobs[key]
+            elif kind in ('done', 'failed'):
+                del self.jobs[key]
+                job['finished'] = now
+                self._record(job, kind)
+
+    def _record(self, job, kind):
+        if kind == 'done' and 'started' not in job:
+            kind = 'skipped'
+        self.counters[kind] += 1
+        marks = ('queued', 'started', 'extracted', 'downloaded', 'postprocessed', 'finished')
+        for phase, (begin, end) in zip(PHASES, zip(marks, marks[1:])):
+            if begin in job and end in job:
+                self.phases[phase].observe(job[end] - job[begin])
+        self.phases['total'].observe(job['finished'] - job['queued'])
+
+    def bound_by(self):
+        """'queue', 'network' or 'ffmpeg': where finished jobs spent most of their time"""
+        with self._lock:
+            totals = {name: sum(self.phases[p].sum for p in phases)
+                      for name, phases in BOUND_BY.items()}
+        name = max(totals, key=totals.get)
+        return name if totals[name] > 0 else None
+
+    def snapshot(self):
+        """JSON-ready dict of every counter, gauge and histogram"""
+        with self._lock:
+            data = {
+                'counters': dict(self.counters),
+                'in_flight': len(self.jobs),
+                'phases': {name: {'count': h.count, 'sum': round(h.sum, 3),
+                                  'mean': round(h.mean(), 3) if h.count else None,
+                                  'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'],
+                                                      h.counts))}
+                           for name, h in self.phases.items()},
+            }
+        data['gauges'] = self.gauges()
+        data['bound_by'] = self.bound_by()
+        return data
+
+    def prometheus(self):
+        """Prometheus text exposition format"""
+        snap = self.snapshot()
+        c = snap['counters']
+        lines = ["# TYPE yt_jobs_total counter"]
+        for status in ('done', 'failed', 'skipped', 'cancelled'):
+            lines.append(f'yt_jobs_total{{status="{status}"}} {c[status]}')
+        lines += ["# TYPE yt_downloaded_bytes_total counter",
+                  f"yt_downloaded_bytes_total {c['bytes']}",
+                  "# TYPE yt_retries_total counter",
+                  f"yt_retries_total {c['retries']}"]
+        for name, value in snap['gauges'].items():
+            lines += [f"# TYPE yt_{name} gauge", f"yt_{name} {value}"]
+        lines.append("# TYPE yt_phase_seconds histogram")
+        for phase, h in snap['phases'].items():
+            cumulative = 0
+            for bound, count in h['buckets'].items():
+                cumulative += count
+                lines.append(f'yt_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+            lines.append(f'yt_phase_seconds_sum{{phase="{phase}"}} {h["sum"]}')
+            lines.append(f'yt_phase_seconds_count{{phase="{phase}"}} {h["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=METRICS_DIR):
+        """Atomically write metrics.prom (textfile-collector format) and metrics.json"""
+        directory = Path(directory)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            for name, text in (("metrics.prom", self.prometheus()),
+                               ("metrics.json", json.dumps(self.snapshot(), indent=1))):
+                tmp = directory / (name + ".tmp")
+                tmp.write_text(text, encoding='utf-8')
+                os.replace(tmp, directory / name)
+        except OSError as e:
+            print(f"Metrics export error: {e}")
+
+    def start_export(self, directory=METRICS_DIR, interval=EXPORT_INTERVAL):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.export(directory)
+            self.export(directory)
+
+        self._thread = threading.Thread(target=loop, daemon=True, name="metrics-export")
+        self._thread.start()
+
+    def stop_export(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Incremental yt-dlp progress parsing: structured per-job events with bounded memory"""
+import time
+
+EXTRACTING = "extracting"
+DOWNLOADING = "downloading"
+POSTPROCESSING = "post-processing"
+
+# Machine-readable progress lines; "NA" is printed for unknown fields
+PROGRESS_PREFIX = "PROGRESS "
+PROGRESS_TEMPLATE = ("download:" + PROGRESS_PREFIX + "%(progress.downloaded_bytes)s "
+                     "%(progress.total_bytes,progress.total_bytes_estimate)s "
+                     "%(progress.speed)s %(progress.eta)s")
+FILEPATH_PREFIX = "FILEPATH "
+FILEPATH_TEMPLATE = "after_move:" + FILEPATH_PREFIX + "%(filepath)s"
+
+POSTPROCESS_TAGS = {'ExtractAudio', 'FixupM4a', 'FixupWebm', 'FixupStretched', 'FixupDuplicateMoov',
+                    'FixupTimestamp', 'FixupDuration', 'Merger', 'Metadata', 'EmbedThumbnail',
+                    'MoveFiles', 'ModifyChapters', 'SponsorBlock', 'VideoConvertor',
+                    'VideoRemuxer', 'FFmpegFixup'}
+
+# Kill a job when it has shown no progress for this long (replaces the flat 600s timeout)
+STALL_TIMEOUT = 120
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{int(n)} B"
+        n /= 1024
+
+
+class ProgressParser:
+    """Turn yt-dlp output lines into progress events, one line at a time
+
+    Only the latest state is kept, so memory stays flat however chatty yt-dlp is.
+    Each event is a dict: phase, downloaded, total, speed (bytes/s) and eta (s).
+    """
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.phase = EXTRACTING
+        self.downloaded = 0
+        self.total = None
+        self.speed = None
+        self.eta = None
+        self.filepath = None
+        self.last_activity = time.monotonic()
+
+    def event(self):
+        return {'phase': self.phase, 'downloaded': self.downloaded, 'total': self.total,
+                'speed': self.speed, 'eta': self.eta}
+
+    def stalled(self, timeout=STALL_TIMEOUT):
+        return time.monotonic() - self.last_activity > timeout
+
+    def update(self, phase=None, downloaded=None, total=None, speed=None, eta=None):
+        """Apply new state; activity only counts if the phase or byte count moved"""
+        moved = False
+        if phase and phase != self.phase:
+            self.phase = phase
+            moved = True
+        if downloaded is not None and downloaded != self.downloaded:
+            self.downloaded = int(downloaded)
+            moved = True
+        if total is not None:
+            self.total = int(total)
+        self.speed = speed
+        self.eta = eta
+        if moved:
+            self.last_activity = time.monotonic()
+        if self.on_event:
+            self.on_event(self.event())
+
+    def feed(self, line):
+        """Parse one stdout line from yt-dlp"""
+        line = line.rstrip('\r\n')
+        if line.startswith(PROGRESS_PREFIX):
+            parts = line[len(PROGRESS_PREFIX):].split()
+            parts += ["NA"] * (4 - len(parts))
+            self.update(DOWNLOADING, _number(parts[0]), _number(parts[1]),
+                        _number(parts[2]), _number(parts[3]))
+        elif line.startswith(FILEPATH_PREFIX):
+            self.filepath = line[len(FILEPATH_PREFIX):]
+        elif line.startswith('['):
+            tag = line[1:line.find(']')]
+            if tag == 'download':
+                self.update(DOWNLOADING)
+            elif tag in POSTPROCESS_TAGS:
+                self.update(POSTPROCESSING)
+            elif self.phase == EXTRACTING:
+                # Extractor chatter ("[youtube] ...: Downloading webpage") is progress too
+                self.last_activity = time.monotonic()
+
+    def hook(self, d):
+        """yt-dlp progress_hooks entry point (in-process engine)"""
+        if d.get('status') == 'downloading':
+            self.update(DOWNLOADING, d.get('downloaded_bytes'),
+                        d.get('total_bytes') or d.get('total_bytes_estimate'),
+                        d.get('speed'), d.get('eta'))
+        elif d.get('status') == 'finished':
+            self.update(DOWNLOADING, d.get('downloaded_bytes') or d.get('total_bytes'),
+                        d.get('total_bytes'))
+
+    def postprocessor_hook(self, d):
+        """yt-dlp postprocessor_hooks entry point (in-process engine)"""
+        if d.get('status') == 'started':
+            self.update(POSTPROCESSING, speed=None, eta=None)
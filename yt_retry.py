@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Failure classification, jittered backoff and a shared throttling circuit breaker"""
+import random
+import re
+import threading
+import time
+
+from yt_common import STOP_CHECK
+
+TRANSIENT = "transient"
+THROTTLED = "throttled"
+UNAVAILABLE = "unavailable"
+EXTRACTOR = "extractor"
+UNKNOWN = "unknown"
+
+# Checked in this order against yt-dlp's error output
+PATTERNS = (
+    (THROTTLED, re.compile(
+        r"HTTP Error 429|Too Many Requests|HTTP Error 403|rate.?limit|"
+        r"Sign in to confirm you.re not a bot|unusual traffic", re.I)),
+    (UNAVAILABLE, re.compile(
+        r"Video unavailable|Private video|video is private|has been removed|"
+        r"account .*terminated|copyright|not available in your country|"
+        r"members.only|Join this channel|confirm your age|age.restricted|"
+        r"Premieres in|live event will begin|This video is not available", re.I)),
+    (EXTRACTOR, re.compile(
+        r"Unable to extract|Failed to parse|nsig extraction failed|Signature extraction failed|"
+        r"Unsupported URL|please report this issue|Requested format is not available|"
+        r"KeyError|JSONDecodeError", re.I)),
+    (TRANSIENT, re.compile(
+        r"timed out|timeout|Connection (reset|refused|aborted)|Remote end closed|"
+        r"Temporary failure in name resolution|Name or service not known|getaddrinfo|"
+        r"Network is unreachable|HTTP Error 5\d\d|IncompleteRead|EOF occurred|"
+        r"Unable to download (webpage|API page)|SSL|Stalled|Errno (104|110|111)", re.I)),
+)
+
+# Retries per failure kind; unavailable videos and broken extractors won't fix themselves
+RETRIES = {TRANSIENT: 4, THROTTLED: 6, UNKNOWN: 1, UNAVAILABLE: 0, EXTRACTOR: 0}
+
+# Retry delay: exponential from BACKOFF_BASE, capped, with half of it randomized
+BACKOFF_BASE = 5
+BACKOFF_MAX = 300
+
+# Throttling pauses every worker for BREAKER_COOLDOWN, doubling per repeat trip
+BREAKER_COOLDOWN = 60
+BREAKER_MAX_COOLDOWN = 30 * 60
+# A probe job that never reports back frees its slot after this long
+PROBE_TIMEOUT = 10 * 60
+
+# Job starts are paced so a big queue can't burst requests at YouTube
+START_RATE = 2.0
+START_BURST = 4
+
+
+def classify(error):
+    """Failure kind for an error message (yt-dlp stderr or exception text)"""
+    for kind, pattern in PATTERNS:
+        if error and pattern.search(error):
+            return kind
+    return UNKNOWN
+
+
+def backoff(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Delay before retry number attempt+1: exponential with equal jitter"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """Pause every worker while YouTube is throttling us
+
+    trip() opens the breaker for a cooldown that doubles with each consecutive trip.
+    When it expires a single probe job is let through; its report() closes the breaker
+    if it wasn't throttled, or trips it again for longer. Successes of jobs that started
+    before the last trip (read `generation` when a job starts) prove nothing and are ignored.
+    """
+
+    def __init__(self, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN, log=print):
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.log = log
+        self.trips = 0
+        self.generation = 0
+        self.open_until = 0
+        self._probe_started = None
+        self._cond = threading.Condition()
+
+    @property
+    def paused(self):
+        return self.trips > 0
+
+    def report(self, kind, generation=None):
+        """Feed every attempt's outcome (kind None for success)"""
+        if kind == THROTTLED:
+            self.trip()
+            return
+        with self._cond:
+            if not self.trips or generation != self.generation:
+                return
+            self.trips = 0
+            self._probe_started = None
+            self._cond.notify_all()
+        self.log("[+] No longer throttled, resuming downloads")
+
+    def trip(self):
+        with self._cond:
+            now = time.monotonic()
+            if now < self.open_until:
+                return
+            delay = min(self.max_cooldown, self.cooldown * 2 ** self.trips)
+            self.trips += 1
+            self.generation += 1
+            self.open_until = now + delay
+            self._probe_started = None
+            self._cond.notify_all()
+        self.log(f"[!] Throttled by YouTube: pausing all downloads for {delay:.0f}s")
+
+    def wait(self, is_running):
+        """Block until a job may start; False if is_running() turned false meanwhile"""
+        with self._cond:
+            while True:
+                if not self.trips:
+                    return True
+                if not is_running():
+                    return False
+                now = time.monotonic()
+                if now < self.open_until:
+                    self._cond.wait(min(self.open_until - now, STOP_CHECK))
+                elif self._probe_started is None or now - self._probe_started > PROBE_TIMEOUT:
+                    self._probe_started = now
+                    return True
+                else:
+                    self._cond.wait(STOP_CHECK)
+
+
+class TokenBucket:
+    """Allow `rate` job starts per second on average, bursts of up to `burst`"""
+
+    def __init__(self, rate=START_RATE, burst=START_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, is_running=None):
+        """Block until a token is available, then consume it; False (nothing consumed) if
+        is_running() turned false meanwhile"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if is_running is not None and not is_running():
+                return False
+            time.sleep(min(wait, STOP_CHECK))
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""Download job scheduler: priority worker pool with AIMD concurrency and a bandwidth budget"""
+import heapq
+import itertools
+import re
+import threading
+import time
+from datetime import datetime
+from queue import Queue
+
+from yt_common import STOP_CHECK
+
+
+class _Stop:
+    """Stop marker for the workers started by one start() call"""
+
+    def __init__(self, generation):
+        self.generation = generation
+
+
+# Priority classes, most urgent first
+INTERACTIVE = 0   # a link someone just copied
+NORMAL = 1
+BULK = 2          # playlists, imports, resumed jobs
+
+# Aging: a job waiting this long counts as one priority class more urgent, so bulk
+# work still gets through while interactive links keep arriving
+AGING = 300
+
+# A handler returns this for a job that did no work (cancelled, stopped, taken by another
+# instance): it counts neither as a success nor as a failure for the concurrency limit
+SKIPPED = object()
+
+
+class AgingQueue(Queue):
+    """Queue.Queue ordered by priority class, with waiting time as the tie breaker
+
+    Every job ages at the same rate, so "priority minus age" orders the same way as
+    "priority * AGING + enqueue time" - a constant per job, which lets a plain heap work.
+    """
+
+    def _init(self, maxsize):
+        self.queue = []
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, entry):
+        heapq.heappush(self.queue, entry)
+
+    def _get(self):
+        return heapq.heappop(self.queue)[-1]
+
+    def remove(self, match):
+        """Take every queued item for which match(item) is true out of the queue"""
+        with self.mutex:
+            removed = [entry[-1] for entry in self.queue if match(entry[-1])]
+            if not removed:
+                return []
+            self.queue = [entry for entry in self.queue if not match(entry[-1])]
+            heapq.heapify(self.queue)
+            # They will never be get() + task_done(): settle them for join()
+            self.unfinished_tasks -= len(removed)
+            if not self.unfinished_tasks:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+        return removed
+
+
+def parse_rate(text):
+    """'500K', '2M', '1.5MB' or plain bytes/s -> bytes/s (None for '', 'none', 'unlimited')"""
+    text = re.sub(r'/S$', '', str(text).strip().upper()).rstrip('B')
+    if text in ('', 'NONE', 'UNLIMITED'):
+        return None
+    match = re.fullmatch(r'([\d.]+)\s*([KMG]?)I?', text)
+    if not match:
+        raise ValueError(f"Bad rate: {text!r}")
+    return float(match.group(1)) * 1024 ** ' KMG'.index(match.group(2) or ' ')
+
+
+def parse_schedule(text):
+    """'01:00-07:00=unlimited,09:00-18:00=500K' -> [(start_min, end_min, bytes/s or None)]"""
+    windows = []
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        span, rate = part.split('=')
+        start, end = (int(h) * 60 + int(m) for h, m in
+                      (t.strip().split(':') for t in span.split('-')))
+        windows.append((start, end, parse_rate(rate)))
+    return windows
+
+
+class BandwidthBudget:
+    """Global download budget split evenly across active jobs
+
+    `total` applies unless a time-of-day window in `schedule` overrides it (a rate of
+    0 pauses downloads); `per_job` caps every job. Jobs call throttle() with their byte
+    count as they go and are slowed down to their current share, which is recomputed
+    whenever jobs start or finish.
+    """
+
+    def __init__(self, total=None, per_job=None, schedule=(), now=datetime.now):
+        self.total = total
+        self.per_job = per_job
+        self.schedule = list(schedule)
+        self.now = now
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def limit(self):
+        """Total budget right now (bytes/s), None when unlimited"""
+        now = self.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            inside = start <= minute < end if start <= end else minute >= start or minute < end
+            if inside:
+                return rate
+        return self.total
+
+    def share(self):
+        """Rate each active job may use right now, None when unlimited"""
+        limit = self.limit()
+        with self._lock:
+            active = max(len(self._jobs), 1)
+        rates = [r for r in (None if limit is None else limit / active, self.per_job)
+                 if r is not None]
+        return min(rates) if rates else None
+
+    def wait_allowed(self, is_running):
+        """Block while the schedule pauses downloads; False if stopped meanwhile"""
+        while self.limit() == 0:
+            if not is_running():
+                return False
+            time.sleep(STOP_CHECK)
+        return True
+
+    def register(self, key):
+        with self._lock:
+            self._jobs[key] = None
+
+    def unregister(self, key):
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def throttle(self, key, downloaded):
+        """Sleep until a job that has downloaded this many bytes is back within its share"""
+        rate = self.share()
+        with self._lock:
+            if key not in self._jobs:
+                return
+            window = self._jobs[key]
+            now = time.monotonic()
+            # Measure over a fresh window whenever the share changes (or every 5s)
+            if window is None or window[2] != rate or now - window[0] > 5:
+                self._jobs[key] = (now, downloaded, rate)
+                return
+            started, base, _ = window
+        if rate is None:
+            return
+        if rate == 0:
+            time.sleep(STOP_CHECK)
+            return
+        ahead = (downloaded - base) / rate - (now - started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease concurrency limit
+
+    Every `window` finished jobs the controller looks at the error rate and throughput
+    (bytes/s when sizes are known, jobs/s otherwise). A high error rate halves the limit,
+    a throughput drop after growing backs off by one, anything else grows by one.
+    """
+
+    def __init__(self, initial=2, minimum=1, maximum=8, error_threshold=0.25, log=None):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = min(max(initial, minimum), self.maximum)
+        self.error_threshold = error_threshold
+        self.log = log
+        self._lock = threading.Lock()
+        self._reset_window()
+        self._last_rate = None
+        self._grew = False
+
+    @property
+    def window(self):
+        return max(4, self.limit * 2)
+
+    def _reset_window(self):
+        self._started = time.monotonic()
+        self._done = 0
+        self._failed = 0
+        self._bytes = 0
+
+    def record(self, ok, size=None, backlog=True):
+        """Record one finished job; returns the (possibly updated) limit"""
+        with self._lock:
+            self._done += 1
+            if not ok:
+                self._failed += 1
+            self._bytes += size or 0
+            if self._done >= self.window:
+                self._adjust(backlog)
+            return self.limit
+
+    def _adjust(self, backlog):
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        error_rate = self._failed / self._done
+        rate = (self._bytes or self._done) / elapsed
+        old = self.limit
+
+        if error_rate > self.error_threshold:
+            self.limit = max(self.minimum, self.limit // 2)
+            reason = f"error rate {error_rate:.0%}"
+        elif self._grew and self._last_rate and rate < self._last_rate * 0.8:
+            self.limit = max(self.minimum, self.limit - 1)
+            reason = "throughput dropped"
+        elif backlog:
+            self.limit = min(self.maximum, self.limit + 1)
+            reason = "throughput ok"
+        else:
+            reason = None
+
+        self._grew = self.limit > old
+        self._last_rate = rate
+        self._reset_window()
+        if self.log and self.limit != old:
+            self.log(f"[*] Parallel downloads {old} -> {self.limit} ({reason})")
+
+
+class Scheduler:
+    """Run handler(item) for queued items on a pool of blocking worker threads
+
+    The pool has `max_workers` threads; the controller decides how many of them may run
+    a job at once, from the results (anything with an ok attribute, else its truth value;
+    SKIPPED results are ignored). start()/stop() can be called repeatedly: stop() joins every worker,
+    so no threads are left behind between START/STOP cycles.
+    """
+
+    def __init__(self, handler, workers=2, max_workers=4, min_workers=1, adaptive=True,
+                 log=print):
+        self.handler = handler
+        self.max_workers = max(max_workers, workers)
+        self.log = log
+        self.controller = AIMDController(workers, min_workers, self.max_workers if adaptive
+                                         else workers, log=log)
+        self.queue = AgingQueue()
+        self._seq = itertools.count()
+        self.active = 0
+        self._threads = []
+        self._generation = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._delayed = []
+        self._delay_seq = itertools.count()
+        self._delay_cond = threading.Condition()
+        self._delay_thread = None
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    @property
+    def limit(self):
+        return self.controller.limit
+
+    def put(self, item, priority=NORMAL):
+        self.queue.put((priority * AGING + time.monotonic(), next(self._seq), item))
+
+    def put_after(self, item, delay, priority=NORMAL):
+        """Queue item once delay seconds have passed (retries with backoff)"""
+        with self._delay_cond:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._delay_seq),
+                                           (item, priority)))
+            if self._delay_thread is None:
+                self._delay_thread = threading.Thread(target=self._release_delayed, daemon=True,
+                                                      name="scheduler-delay")
+                self._delay_thread.start()
+            self._delay_cond.notify()
+
+    def _release_delayed(self):
+        with self._delay_cond:
+            while True:
+                if not self._delayed:
+                    self._delay_cond.wait()
+                    continue
+                wait = self._delayed[0][0] - time.monotonic()
+                if wait > 0:
+                    self._delay_cond.wait(wait)
+                    continue
+                self.put(*heapq.heappop(self._delayed)[2])
+
+    @property
+    def delayed(self):
+        return len(self._delayed)
+
+    def qsize(self):
+        """Jobs waiting to run, including retries still backing off"""
+        return self.queue.qsize() + len(self._delayed)
+
+    def discard(self, match):
+        """Drop waiting items (queued or backing off) where match(item); returns them"""
+        removed = self.queue.remove(lambda item: not isinstance(item, _Stop) and match(item))
+        with self._delay_cond:
+            kept = [entry for entry in self._delayed if not match(entry[2][0])]
+            if len(kept) != len(self._delayed):
+                removed += [entry[2][0] for entry in self._delayed if match(entry[2][0])]
+                heapq.heapify(kept)
+                self._delayed = kept
+        return removed
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued item has been handled; False on timeout"""
+        queue = self.queue
+        with queue.all_tasks_done:
+            return queue.all_tasks_done.wait_for(lambda: not queue.unfinished_tasks, timeout)
+
+    def start(self):
+        """Spawn the worker pool (no-op if it is already running)"""
+        if self._threads and not self._stopping:
+            return False
+        # Workers still busy after a stop() that timed out quit when their job is done
+        self._stopping = False
+        self._generation += 1
+        self._threads = [threading.Thread(target=self._worker, args=(self._generation,),
+                                          daemon=True, name=f"download-worker-{i}")
+                         for i in range(self.max_workers)]
+        for t in self._threads:
+            t.start()
+        return True
+
+    def stop(self, timeout=None):
+        """Let workers finish the queued jobs (discard() them first to skip that), then
+        join them
+
+        Returns True once every worker thread has exited, False if some were still busy
+        at the timeout; those exit when their current job returns.
+        """
+        if not self._threads:
+            return True
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for _ in self._threads:
+            # Sorts after every job, so the queue drains first
+            self.queue.put((float('inf'), next(self._seq), _Stop(self._generation)))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        if any(t.is_alive() for t in self._threads):
+            return False
+        self._threads = []
+        return True
+
+    def _acquire(self):
+        with self._cond:
+            # While stopping every worker drains, so each one reaches its stop marker
+            while self.active >= self.controller.limit and not self._stopping:
+                self._cond.wait()
+            self.active += 1
+
+    def _release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def _worker(self, generation):
+        """Background worker that blocks on the queue instead of polling
+
+        A worker left busy by a stop() that timed out exits once its job returns, when a
+        later start() has replaced it.
+        """
+        while generation == self._generation:
+            self._acquire()
+            try:
+                item = self.queue.get()
+                try:
+                    if isinstance(item, _Stop):
+                        # A marker left over from a stop() that timed out isn't ours
+                        if item.generation == generation:
+                            return
+                        continue
+                    result = self.handler(item)
+                except Exception as e:
+                    result = None
+                    self.log(f"[-] Worker error: {str(e)[:60]}")
+                finally:
+                    self.queue.task_done()
+                if not isinstance(item, _Stop) and result is not SKIPPED:
+                    ok = getattr(result, 'ok', bool(result))
+                    self.controller.record(ok, getattr(result, 'size', None),
+                                           backlog=self.queue.qsize() > 0)
+            finally:
+                self._release()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""Segmented downloader: one large media stream fetched as parallel byte ranges
+
+YouTube throttles each connection, so a multi-hour mix over a single connection holds a
+worker slot for many minutes. Here the stream is split into SEGMENT_SIZE ranges fetched
+by CONNECTIONS threads over pooled keep-alive connections, each range retried on its
+own, and written in place into a preallocated, memory-mapped file (nothing to stitch
+together afterwards). The backends use it for streams of SEGMENT_MIN_SIZE and up; an
+interrupted download resumes from the ranges already on disk.
+"""
+import http.client
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Smaller streams aren't worth the extra requests: yt-dlp downloads them as usual
+SEGMENT_MIN_SIZE = 32 * 1024 * 1024
+SEGMENT_SIZE = 8 * 1024 * 1024
+
+# Parallel connections per download (0 turns segmented downloads off)
+CONNECTIONS = 4
+
+# Each range is retried on its own before the whole download fails
+SEGMENT_RETRIES = 3
+RETRY_DELAY = 1.0
+
+TIMEOUT = 30
+CHUNK = 256 * 1024
+MAX_REDIRECTS = 5
+
+# Idle keep-alive connections kept per host, shared by all downloads
+POOL_SIZE = 8
+
+PROGRESS_INTERVAL = 0.5
+
+# yt_library.TEMP_SUFFIXES lists both, so the index and orphan cleanup skip them
+TEMP_SUFFIX = '.seg.part'
+STATE_SUFFIX = '.seg.part.json'
+
+CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-\d+/(\d+)')
+
+# Containers yt-dlp repairs after a plain download (FixupM4a remuxes DASH m4a into a
+# normal MP4); those streams are left to yt-dlp so the fixup still runs
+FIXUP_CONTAINERS = {'m4a_dash'}
+
+
+class SegmentError(Exception):
+    """A segmented download failed (after retries) or was cancelled"""
+
+
+class RangesUnavailable(SegmentError):
+    """The stream can't be fetched in ranges (no 206, stale URL): use another downloader"""
+
+
+def stream_of(info):
+    """(url, http headers, approximate size) of info's selected single-file HTTP stream,
+    or None for anything else (DASH/HLS fragments, merged formats, no URL, containers
+    yt-dlp fixes up)"""
+    if not info or not info.get('url') or info.get('protocol') not in ('http', 'https'):
+        return None
+    if info.get('container') in FIXUP_CONTAINERS:
+        return None
+    size = info.get('filesize') or info.get('filesize_approx')
+    if not size and info.get('tbr') and info.get('duration'):
+        # tbr is kbit/s
+        size = info['tbr'] * info['duration'] * 125
+    return info['url'], info.get('http_headers') or {}, int(size or 0)
+
+
+class ConnectionPool:
+    """Idle keep-alive HTTP(S) connections by (scheme, host)"""
+
+    def __init__(self, size=POOL_SIZE, timeout=TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme, host):
+        with self._lock:
+            idle = self._idle.get((scheme, host))
+            if idle:
+                return idle.pop()
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def put(self, scheme, host, conn):
+        """Return a connection whose last response was read to the end"""
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host), [])
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+
+class SegmentedDownloader:
+    """Fetch one URL as parallel byte ranges into a preallocated file"""
+
+    def __init__(self, connections=CONNECTIONS, segment_size=SEGMENT_SIZE,
+                 min_size=SEGMENT_MIN_SIZE, pool=None):
+        self.connections = connections
+        self.segment_size = segment_size
+        self.min_size = min_size
+        self.pool = pool or ConnectionPool()
+
+    def _request(self, url, headers, start, end):
+        """GET bytes start-end (inclusive) over a pooled connection; returns
+        (scheme, host, conn, response)"""
+        parts = urlsplit(url)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        conn = self.pool.get(parts.scheme, parts.netloc)
+        try:
+            conn.request('GET', target, headers=dict(headers, Range=f"bytes={start}-{end}"))
+            return parts.scheme, parts.netloc, conn, conn.getresponse()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+
+    def probe(self, url, headers):
+        """(final url, total size) after redirects; RangesUnavailable if ranges don't work"""
+        for _ in range(MAX_REDIRECTS):
+            try:
+                scheme, host, conn, response = self._request(url, headers, 0, 0)
+            except (OSError, http.client.HTTPException) as e:
+                raise RangesUnavailable(f"probe failed: {str(e)[:50]}")
+            location = response.getheader('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                conn.close()
+                url = location
+                continue
+            match = CONTENT_RANGE.match(response.getheader('Content-Range') or '')
+            if response.status != 206 or not match or int(match.group(1)) != 0:
+                # Don't read what may be the whole stream
+                conn.close()
+                raise RangesUnavailable(f"HTTP {response.status} to a range request")
+            try:
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise RangesUnavailable(f"probe failed: {str(e)[:50]}")
+            self.pool.put(scheme, host, conn)
+            return url, int(match.group(2))
+        raise RangesUnavailable("too many redirects")
+
+    def fetch(self, url, path, headers=None, on_progress=None, rate_limit=None, cancel=None):
+        """Download url to path; returns path
+
+        on_progress(downloaded, total, speed, eta) is called from this thread every
+        PROGRESS_INTERVAL (an exception from it aborts the download). rate_limit caps the
+        combined speed in bytes/s; setting the cancel event stops every connection.
+        Raises RangesUnavailable before writing anything if the server can't do ranges,
+        SegmentError if a range still fails after its retries (what was fetched stays on
+        disk for the next attempt).
+        """
+        path = Path(path)
+        headers = headers or {}
+        url, total = self.probe(url, headers)
+        if not total:
+            raise RangesUnavailable("empty stream")
+        temp = path.with_name(path.name + TEMP_SUFFIX)
+        state_path = path.with_name(path.name + STATE_SUFFIX)
+        count = -(-total // self.segment_size)
+        done = self._load_state(state_path, temp, total)
+        todo = [i for i in range(count) if i not in done]
+
+        with open(temp, 'r+b' if done else 'w+b') as f:
+            if not done and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, total)
+                except OSError:
+                    pass
+            f.truncate(total)
+            view = mmap.mmap(f.fileno(), total)
+            try:
+                self._run(url, headers, view, total, todo, done, state_path, on_progress,
+                          rate_limit, cancel)
+            finally:
+                view.close()
+        os.replace(temp, path)
+        state_path.unlink(missing_ok=True)
+        return path
+
+    def _run(self, url, headers, view, total, todo, done, state_path, on_progress,
+             rate_limit, cancel):
+        lock = threading.Lock()
+        halt = threading.Event()
+        errors = []
+        received = [sum(min(self.segment_size, total - i * self.segment_size) for i in done)]
+        started = time.monotonic()
+        resumed = received[0]
+
+        def halted():
+            return halt.is_set() or (cancel is not None and cancel.is_set())
+
+        def progress(n):
+            with lock:
+                received[0] += n
+                fetched = received[0] - resumed
+            if rate_limit:
+                ahead = fetched / rate_limit - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        def worker():
+            while not halted():
+                with lock:
+                    if not todo:
+                        return
+                    index = todo.pop(0)
+                start = index * self.segment_size
+                end = min(start + self.segment_size, total) - 1
+                try:
+                    if not self._segment(url, headers, view, start, end, progress, halted):
+                        return
+                except Exception as e:
+                    errors.append(e)
+                    halt.set()
+                    return
+                with lock:
+                    done.add(index)
+                    self._save_state(state_path, total, done)
+
+        threads = [threading.Thread(target=worker, daemon=True, name=f"segment-{i}")
+                   for i in range(min(self.connections, len(todo)) or 1)]
+        for t in threads:
+            t.start()
+        try:
+            last, last_bytes = started, received[0]
+            while any(t.is_alive() for t in threads):
+                deadline = time.monotonic() + PROGRESS_INTERVAL
+                for t in threads:
+                    t.join(max(0, deadline - time.monotonic()))
+                if on_progress:
+                    now = time.monotonic()
+                    speed = (received[0] - last_bytes) / max(now - last, 1e-6)
+                    last, last_bytes = now, received[0]
+                    on_progress(received[0], total, speed,
+                                (total - received[0]) / speed if speed else None)
+        finally:
+            halt.set()
+            for t in threads:
+                t.join()
+        if errors:
+            raise SegmentError(str(errors[0])[:70])
+        if cancel is not None and cancel.is_set():
+            raise SegmentError("Cancelled")
+        if on_progress:
+            on_progress(total, total, None, 0)
+
+    def _segment(self, url, headers, view, start, end, progress, halted):
+        """Fetch bytes start-end into view, resuming within the range on retries;
+        False if halted first"""
+        offset = start
+        for attempt in range(SEGMENT_RETRIES + 1):
+            conn = None
+            try:
+                scheme, host, conn, response = self._request(url, headers, offset, end)
+                if response.status != 206:
+                    raise SegmentError(f"HTTP {response.status} for bytes {offset}-{end}")
+                match = CONTENT_RANGE.match(response.getheader('Content-Range') or '')
+                if not match or int(match.group(1)) != offset:
+                    raise SegmentError(f"wrong range {response.getheader('Content-Range')} "
+                                       f"for bytes {offset}-{end}")
+                while offset <= end:
+                    if halted():
+                        conn.close()
+                        return False
+                    chunk = response.read(min(CHUNK, end - offset + 1))
+                    if not chunk:
+                        raise SegmentError(f"connection closed at byte {offset}")
+                    view[offset:offset + len(chunk)] = chunk
+                    offset += len(chunk)
+                    progress(len(chunk))
+                self.pool.put(scheme, host, conn)
+                return True
+            except (OSError, http.client.HTTPException, SegmentError):
+                if conn is not None:
+                    conn.close()
+                if attempt == SEGMENT_RETRIES or halted():
+                    raise
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+        return False
+
+    def _load_state(self, state_path, temp, total):
+        """Ranges already on disk from an interrupted attempt (empty set to start over)"""
+        try:
+            state = json.loads(state_path.read_text(encoding='utf-8'))
+            if (state['total'] == total and state['segment'] == self.segment_size
+                    and temp.stat().st_size == total):
+                return set(state['done'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return set()
+
+    def _save_state(self, state_path, total, done):
+        """Record the finished ranges; replaced in one step, so a crash mid-write leaves
+        the previous state rather than a truncated one"""
+        # Ends in .part, so it is a temp file to the index and orphan cleanup as well
+        temp = state_path.with_name(state_path.name + '.part')
+        try:
+            temp.write_text(json.dumps({'total': total, 'segment': self.segment_size,
+                                        'done': sorted(done)}), encoding='utf-8')
+            os.replace(temp, state_path)
+        except OSError:
+            pass
+
+    def close(self):
+        self.pool.close()
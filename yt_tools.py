@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Fast-start helpers: dependency check without installs, cached tool discovery"""
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path.home() / ".cache" / "yt_downloader"
+TOOLS_CACHE = CACHE_DIR / "tools.json"
+
+# import name -> pip package
+REQUIRED_MODULES = {'pyperclip': 'pyperclip'}
+
+_lock = threading.Lock()
+_found = {}
+
+
+def _load_cache():
+    try:
+        return json.loads(TOOLS_CACHE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    try:
+        TOOLS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = TOOLS_CACHE.with_suffix('.tmp')
+        tmp.write_text(json.dumps(cache), encoding='utf-8')
+        os.replace(tmp, TOOLS_CACHE)
+    except OSError:
+        pass
+
+
+def _bundled(name):
+    """Executable shipped next to the frozen EXE, if any"""
+    if getattr(sys, 'frozen', False):
+        bundled = Path(sys.executable).parent / f"{name}.exe"
+        if bundled.exists():
+            return str(bundled)
+    return None
+
+
+def find_tool(name):
+    """Find an executable - bundled first, then the on-disk cache, then PATH
+
+    The cached path is trusted as long as the file still exists, so a normal start does
+    a single stat() per tool instead of a PATH search. Works on Windows, Linux and macOS.
+    """
+    with _lock:
+        if name in _found:
+            return _found[name]
+
+        path = _bundled(name)
+        if not path:
+            cache = _load_cache()
+            cached = cache.get(name)
+            if cached and os.path.isfile(cached) and os.access(cached, os.X_OK):
+                path = cached
+            else:
+                path = shutil.which(name)
+                if path and path != cached:
+                    cache[name] = path
+                    _save_cache(cache)
+        _found[name] = path
+        return path
+
+
+def has_module(name):
+    """True if a module can be imported, without importing it"""
+    return importlib.util.find_spec(name) is not None
+
+
+def missing_dependencies():
+    """Pip package names the app needs but can't find (nothing is installed)"""
+    missing = [pip for module, pip in REQUIRED_MODULES.items() if not has_module(module)]
+    if not has_module('yt_dlp') and not find_tool('yt-dlp'):
+        missing.append('yt-dlp')
+    return missing
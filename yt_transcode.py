@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Transcode stage: turn downloaded native audio (opus/m4a) into the final file"""
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from yt_backends import kill_tree, POPEN_GROUP
+from yt_loudness import make_loudness, OFF
+from yt_tools import find_tool
+
+MP3 = "mp3"
+NATIVE = "native"
+
+# Remux targets for "no re-encode" mode: the audio stream is copied, never re-encoded
+NATIVE_CONTAINERS = {'.webm': '.opus', '.mp4': '.m4a', '.mkv': '.mka'}
+TRANSCODE_TIMEOUT = 600
+
+
+def find_ffmpeg():
+    """Find ffmpeg - check bundled first, then system (cached)"""
+    return find_tool('ffmpeg')
+
+
+class Transcoder:
+    """CPU-bound stage, separate from the network-bound download slots
+
+    Each job is one ffmpeg child process; the pool only bounds how many run at once
+    (one per core by default), so downloads never wait for encoding and vice versa.
+    With a loudness mode, each file is measured first and its gain goes into the same
+    ffmpeg pass as tags (or, re-encoding to MP3 in APPLY mode, as a volume filter).
+    kill() aborts one file's job, abort() all of them.
+    """
+
+    def __init__(self, mode=MP3, workers=None, log=print, loudness=OFF):
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 2
+        self.log = log
+        self.ffmpeg = find_ffmpeg()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="transcode")
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._jobs = set()
+        self._killed = set()
+        self._procs = {}
+        if not self.ffmpeg and mode == MP3:
+            self.log("[!] ffmpeg not found: keeping native audio (no MP3 conversion)")
+        self.loudness = make_loudness(loudness, self.ffmpeg, log=log)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, src, on_done):
+        """Queue src for transcoding; on_done(path, error) is called from the pool"""
+        src = Path(src)
+        with self._cond:
+            self._pending += 1
+            self._jobs.add(src)
+        future = self._executor.submit(self.transcode, src)
+
+        def finished(f):
+            try:
+                path, error = f.result(), None
+            except Exception as e:
+                path, error = None, str(e)[:70]
+            try:
+                on_done(path, error)
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self._jobs.discard(src)
+                    self._killed.discard(src)
+                    self._cond.notify_all()
+
+        future.add_done_callback(finished)
+
+    def wait(self, timeout=None):
+        """Block until every submitted file is done; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def kill(self, src):
+        """Abort src's transcode, queued or running (its on_done gets an error)
+
+        Returns False if src isn't being transcoded.
+        """
+        src = Path(src)
+        with self._cond:
+            if src not in self._jobs:
+                return False
+            self._killed.add(src)
+            proc = self._procs.get(src)
+        if proc:
+            kill_tree(proc)
+        return True
+
+    def abort(self):
+        """Kill every queued and running transcode, loudness analyses included"""
+        with self._cond:
+            jobs = list(self._jobs)
+        for src in jobs:
+            self.kill(src)
+        if self.loudness and jobs:
+            self.loudness.abort()
+
+    def _ffmpeg(self, src, cmd):
+        """Run one ffmpeg command for src, killable through kill(src); returns (code, stderr)"""
+        with self._cond:
+            if src in self._killed:
+                raise RuntimeError("Cancelled")
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE, text=True, errors='replace',
+                                    **POPEN_GROUP)
+            self._procs[src] = proc
+        try:
+            try:
+                stderr = proc.communicate(timeout=TRANSCODE_TIMEOUT)[1]
+            except subprocess.TimeoutExpired:
+                kill_tree(proc)
+                proc.communicate()
+                return -1, f"ffmpeg timed out after {TRANSCODE_TIMEOUT}s"
+        finally:
+            with self._cond:
+                self._procs.pop(src, None)
+        if src in self._killed:
+            raise RuntimeError("Cancelled")
+        return proc.returncode, stderr
+
+    def target(self, src):
+        if not self.ffmpeg:
+            return src
+        if self.mode == MP3:
+            return src.with_suffix('.mp3')
+        return src.with_suffix(NATIVE_CONTAINERS.get(src.suffix.lower(), src.suffix))
+
+    def transcode(self, src):
+        """Convert or remux src, delete it, and return the final path
+
+        ffmpeg writes to a '.temp.' name that is renamed once complete, so a file with
+        the final name is never a partial encode.
+        """
+        dst = self.target(src)
+        if dst == src:
+            if self.loudness:
+                try:
+                    self.loudness.tag(src)
+                except Exception as e:
+                    self.log(f"[!] Loudness tagging failed for {src.name[:40]}: {str(e)[:50]}")
+            return src
+
+        with self._cond:
+            if src in self._killed:
+                raise RuntimeError("Cancelled")
+        reencode = dst.suffix == '.mp3'
+        if reencode:
+            codec = ['-c:a', 'libmp3lame', '-q:a', '0']
+        else:
+            codec = ['-c:a', 'copy']
+        gain = []
+        measured = None
+        applied = 0.0
+        if self.loudness:
+            try:
+                measured = self.loudness.measure(src)
+                gain, applied = self.loudness.ffmpeg_args(*measured, dst.suffix, reencode)
+            except Exception as e:
+                # The file gets no tags: not cached as tagged
+                measured = None
+                if src in self._killed:
+                    raise RuntimeError("Cancelled")
+                # Untagged audio beats no audio
+                self.log(f"[!] Loudness analysis failed for {src.name[:40]}: {str(e)[:50]}")
+        temp = dst.with_name(f"{dst.stem}.temp{dst.suffix}")
+        cmd = [self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+               '-i', str(src), '-vn', '-map_metadata', '0', *gain, *codec, str(temp)]
+        try:
+            returncode, stderr = self._ffmpeg(src, cmd)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+        if returncode != 0:
+            temp.unlink(missing_ok=True)
+            err = stderr.strip().split('\n')[-1][:70] if stderr else "ffmpeg failed"
+            raise RuntimeError(err)
+        os.replace(temp, dst)
+        src.unlink(missing_ok=True)
+        if measured:
+            self.loudness.written(dst, *measured, applied)
+        return dst
+
+    def close(self, timeout=None):
+        """Shut the pool down; whatever is still running after timeout seconds is killed"""
+        if not self.wait(timeout):
+            self.abort()
+        self._executor.shutdown(wait=True)
+        if self.loudness:
+            self.loudness.close(timeout)
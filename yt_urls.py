@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""YouTube URL parsing: every supported link form maps to one canonical 'kind:id' key
+
+The key is what dedup, the history journal and the job queue go by; the URL handed to
+yt-dlp is rebuilt from it, so tracking parameters (si=, feature=, pp=...) never reach
+a job.
+"""
+import re
+import sys
+
+VIDEO_ID = re.compile(r'[\w-]{11}')
+
+# Every supported link form as one alternation, so a link (or a large blob of text) is
+# scanned in a single pass: youtube.com on any subdomain (www., m., music.), the
+# youtube-nocookie.com embed host and youtu.be; v= and list= may come after other query
+# parameters (feature=share&v=..., or &amp;v=... in links pasted from HTML). The scheme
+# and subdomain aren't part of the match (links are rebuilt in canonical form), so the
+# scan can skip ahead to each "youtu"; hosts match in any case (YouTube.com), and the
+# lookarounds reject lookalike hosts (notyoutube.com) and 12+ character IDs
+YT_SCANNER = re.compile(
+    r'youtu(?<![\w-]youtu)(?:'
+    r'be(?:-nocookie)?\.com/(?:'
+    r'watch/?\?(?:[^\s#&]*&(?:amp;)?)*?v=(?P<watch>[\w-]{11})'
+    r'|(?:shorts|live|embed|v)/(?P<path>[\w-]{11})'
+    r'|playlist\?(?:[^\s#&]*&(?:amp;)?)*?list=(?P<playlist>[\w-]+))'
+    r'|\.be/(?P<short>[\w-]{11}))'
+    r'(?![\w-])',
+    re.IGNORECASE
+)
+
+
+def _key(match):
+    kind = match.lastgroup
+    return f"{'playlist' if kind == 'playlist' else 'video'}:{match.group(kind)}"
+
+
+def key_url(key):
+    """Canonical URL for a 'kind:id' key"""
+    kind, _, value = key.partition(':')
+    return playlist_url(value) if kind == 'playlist' else video_url(value)
+
+
+def canonical_key(url):
+    """Map a YouTube URL to a 'kind:id' key, so youtu.be/X, /shorts/X and
+    m.youtube.com/watch?feature=share&v=X all dedupe"""
+    match = YT_SCANNER.search(url)
+    return _key(match) if match else None
+
+
+def iter_unique_urls(chunks, seen=None):
+    """Yield (canonical url, key) for each distinct video across an iterable of text
+    chunks/lines"""
+    seen = set() if seen is None else seen
+    for chunk in chunks:
+        for match in YT_SCANNER.finditer(chunk):
+            key = _key(match)
+            if key not in seen:
+                seen.add(key)
+                yield key_url(key), key
+
+
+def extract_urls(text):
+    """Return every distinct (url, key) in text, in order"""
+    return list(iter_unique_urls([text]))
+
+
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def playlist_url(playlist_id):
+    return f"https://www.youtube.com/playlist?list={playlist_id}"
+
+
+def open_url_source(path):
+    """Open a .txt/.csv file of links for line-by-line reading ('-' means stdin)"""
+    if str(path) == '-':
+        return sys.stdin
+    return open(path, encoding='utf-8', errors='replace', newline='')